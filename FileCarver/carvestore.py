@@ -0,0 +1,86 @@
+# Content addressed storage for carved images.
+#
+# The same image is often embedded in many parents: a logo in every document made from
+# one template, an icon in every build of a program, a thumbnail in every copy of a
+# database. Rather than a folder of copies per parent, every carved image is stored once
+# under its MD5, in folders sharded by the first two hex digits of the hash:
+#
+#   Carved-Foremost/images/3f/3f2a...9c.jpg
+#
+# put() moves a newly carved file into the store, or deletes it when the store already
+# holds the same content, and returns the stored path relative to the Carved-Foremost
+# folder. The derived files of every parent the image was carved from point at that one
+# copy. Carvers that write their own files can write them to incoming_dir, which is on
+# the same volume as the store so putting them is a rename.
+#
+# This is free and unencumbered software released into the public domain.
+
+import hashlib
+import os
+import shutil
+import threading
+
+STORE_FOLDER = "images"
+INCOMING_FOLDER = "incoming"
+
+# One lock for every store, so parallel data source jobs sharing a case never move the
+# same image into place at once
+_store_lock = threading.Lock()
+
+
+def file_md5(path):
+    md5 = hashlib.md5()
+    with open(path, "rb") as content:
+        while True:
+            data = content.read(1024 * 1024)
+            if not data:
+                break
+            md5.update(data)
+    return md5.hexdigest()
+
+
+# The images stored by one ingest job, with counts of what was written and what was
+# shared with an image already in the store.
+class CarveStore(object):
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.root = os.path.join(directory, STORE_FOLDER)
+        self.incoming_dir = os.path.join(self.root, INCOMING_FOLDER)
+        self._shards = set()
+        self.stored_count = 0
+        self.stored_bytes = 0
+        self.shared_count = 0
+        self.saved_bytes = 0
+        if not os.path.exists(self.incoming_dir):
+            os.makedirs(self.incoming_dir)
+
+    # Path of a stored image, given the relative path put() returned.
+    def local_path(self, relative):
+        return os.path.join(self.directory, relative)
+
+    # Move the carved file at 'path' into the store. md5 may be given when the carver
+    # already hashed what it wrote. Returns the stored path relative to the store's
+    # directory, and the size of the image.
+    def put(self, path, extension, md5=None):
+        if md5 is None:
+            md5 = file_md5(path)
+        size = os.path.getsize(path)
+        shard = md5[:2]
+        relative = os.path.join(STORE_FOLDER, shard, md5 + "." + extension)
+        target = os.path.join(self.directory, relative)
+        with _store_lock:
+            if os.path.exists(target):
+                os.remove(path)
+                self.shared_count += 1
+                self.saved_bytes += size
+                return relative, size
+            if shard not in self._shards:
+                shard_dir = os.path.join(self.root, shard)
+                if not os.path.exists(shard_dir):
+                    os.mkdir(shard_dir)
+                self._shards.add(shard)
+            shutil.move(path, target)
+            self.stored_count += 1
+            self.stored_bytes += size
+        return relative, size
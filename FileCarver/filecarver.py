@@ -35,16 +35,39 @@
 #   Version 1.0 - Initial version - August 24, 2020
 #   Version 1.1 - Added GUI to include default mime types, all files or slack space - Aug 27, 2020
 #   version 1.2 - Added Linux Support - August 30, 2020
+#   version 1.4 - Added in-process streaming carving engine as an alternative to foremost - October 2026
+#   version 1.5 - Signatures matched in a single pass by one automaton built from foremost.conf - October 2026
+#   version 1.6 - Carve several files at once on a configurable number of worker threads - October 2026
+#   version 1.7 - Option to carve small files in batches with one foremost run per batch - October 2026
+#   version 1.8 - In-process carver streams through a bounded read-ahead pipe, temp copies always cleaned up - October 2026
+#   version 1.9 - Per case manifest so a rerun only carves new, changed or failed files - October 2026
+#   version 2.0 - Option to carve files with identical content only once - October 2026
+#   version 2.1 - Derived files added in batched database transactions, artifacts posted in bulk - October 2026
+#   version 2.2 - Files selected by a paged case database query instead of loading every file - October 2026
+#   version 2.3 - Option to skip known files and files in a known hash list - October 2026
+#   version 2.4 - Option to carve unallocated space, large objects carved by foremost in overlapping windows - October 2026
+#   version 2.5 - Stage timings and throughput reported to the inbox and a JSON report, per file logging only at FINE - October 2026
+#   version 2.6 - In-process carver ends images where their structure ends and rejects invalid headers - October 2026
+#   version 2.7 - Per file time and size limits, foremost stopped on cancel or overrun, size aware carving order - October 2026
+#   version 2.8 - Carved images stored once by content hash and shared by every parent they were carved from - October 2026
+#   version 2.9 - Option to carve files in the file ingest pipeline as they are ingested - October 2026
 # 
 
 import jarray
-import inspect
+import hashlib
 import os
 import subprocess
 import shutil
+import sys
+import threading
+import time
+import Queue
 from subprocess import Popen, PIPE
 
 from javax.swing import JCheckBox
+from javax.swing import JComboBox
+from javax.swing import JButton
+from javax.swing import JFileChooser
 from javax.swing import JLabel
 from javax.swing import JList
 from javax.swing import JTextArea
@@ -94,6 +117,56 @@ from org.sleuthkit.autopsy.casemodule.services import Blackboard
 from org.sleuthkit.datamodel import TskData
 from org.sleuthkit.autopsy.ingest import IngestServices
 from org.sleuthkit.autopsy.ingest import ModuleContentEvent
+from org.sleuthkit.autopsy.modules.filetypeid import FileTypeDetector
+
+from carvestore import CarveStore
+from foremostbatch import BatchOffsetMap, parse_audit
+from hashset import KnownHashSet
+from manifest import COMPLETE, FAILED, PARTIAL, get_manifest
+from metrics import CarveMetrics
+from sigmatch import load_foremost_conf
+from streamcarver import ReadAheadPipe, StreamCarver
+
+# Image types carved by both backends (foremost -t names)
+CARVE_TYPES = ["jpeg", "png", "bmp", "gif"]
+
+# Read size used by the in-process carver and the number of chunks it may read ahead
+CHUNK_SIZE = 4 * 1024 * 1024
+READ_AHEAD_CHUNKS = 2
+
+# Files no bigger than this are not worth carving
+MIN_FILE_SIZE = 1000
+
+# Number of files fetched from the case database per query
+FILE_QUERY_PAGE_SIZE = 1000
+
+# Default number of derived files added to the case database per transaction
+COMMIT_BATCH_SIZE = 200
+
+# CarveResult state for a file whose content is identical to a file already being carved
+DUPLICATE = "duplicate"
+
+# CarveResult state for a file skipped because it is known
+KNOWN = "known"
+
+# Batch mode packs files up to BATCH_FILE_MAX_SIZE into one foremost input of at most
+# BATCH_MAX_BYTES / BATCH_MAX_FILES
+BATCH_FILE_MAX_SIZE = 1024 * 1024
+BATCH_MAX_BYTES = 64 * 1024 * 1024
+BATCH_MAX_FILES = 1000
+
+# How often a running foremost is checked for a cancelled job or an overrun time limit
+PROCESS_POLL_SECONDS = 0.5
+
+# Orders files can be carved in. Carving small files first, or alternating small and
+# large, gets most results into the case before the largest files are done.
+ORDER_OBJECT_ID = "Object Id"
+ORDER_SMALL_FIRST = "Smallest First"
+ORDER_INTERLEAVE = "Interleave Small And Large"
+
+# foremost carves objects bigger than a window plus the overlap one window at a time, so
+# the staged copy never grows past WINDOW_SIZE plus the largest max carve size in foremost.conf
+WINDOW_SIZE = 256 * 1024 * 1024
 
 # Factory that defines the name and details of the module and allows Autopsy
 # to create instances of the modules that will do the analysis.
@@ -111,7 +184,7 @@ class CarverFilesIngestModuleFactory(IngestModuleFactoryAdapter):
         return "Carves Images embedded in files"
     
     def getModuleVersionNumber(self):
-        return "1.3"
+        return "2.9"
 
     def getDefaultIngestJobSettings(self):
         return GenericIngestModuleJobSettings()
@@ -133,19 +206,34 @@ class CarverFilesIngestModuleFactory(IngestModuleFactoryAdapter):
     def createDataSourceIngestModule(self, ingestOptions):
         return CarverFilesIngestModule(self.settings)
 
+    # The file-level module only carves when the file pipeline option is on, and the data
+    # source module only when it is off
+    def isFileIngestModuleFactory(self):
+        return True
+
+    def createFileIngestModule(self, ingestOptions):
+        return CarverFilesFileIngestModule(self.settings)
+
+_logger = Logger.getLogger(CarverFilesIngestModuleFactory.moduleName)
+
+# The log() method of the classes below, logging msg against the class and the method
+# that called it. sys._getframe is used rather than inspect.stack(), which builds the
+# whole stack with source lines on every call
+def _log(self, level, msg):
+    _logger.logp(level, self.__class__.__name__, sys._getframe(1).f_code.co_name, msg)
+
 # Data Source-level ingest module.  One gets created per data source.
 class CarverFilesIngestModule(DataSourceIngestModule):
 
-    
-    _logger = Logger.getLogger(CarverFilesIngestModuleFactory.moduleName)
-
-    def log(self, level, msg):
-        self._logger.logp(level, self.__class__.__name__, inspect.stack()[1][3], msg)
+    log = _log
 
     def __init__(self, settings):
         self.context = None
         self.local_settings = settings
         self.List_Of_tables = []
+        self.knownFilter = None
+        # Per file messages are only built when the logger is at FINE or lower
+        self.verbose = _logger.isLoggable(Level.FINE)
 
     # Where any setup and configuration is done
     # 'context' is an instance of org.sleuthkit.autopsy.ingest.IngestJobContext.
@@ -153,21 +241,100 @@ class CarverFilesIngestModule(DataSourceIngestModule):
     def startUp(self, context):
         self.context = context
 
-        # Get path to EXE based on where this script is run from.
-        # Assumes EXE is in same folder as script
-        # Verify it is there before any ingest starts
- 
+        moduleDir = os.path.dirname(os.path.abspath(__file__))
+        self.useNativeCarver = self.local_settings.getSetting('Native_Carver') == 'true'
+
+        # The in-process carver reads its signatures from the same foremost.conf, and the window
+        # overlap for large objects is the largest max carve size in it
+        confPath = os.path.join(moduleDir, "foremost.conf")
+        if not os.path.exists(confPath):
+            raise IngestModuleException("foremost.conf was not found in module folder")
+        self.signatures = load_foremost_conf(confPath, CARVE_TYPES)
+        self.windowOverlap = max([signature.max_size for signature in self.signatures])
+
+        if self.useNativeCarver:
+            self.carverName = CarverFilesIngestModuleFactory.moduleName
+            self.carverVersion = CarverFilesIngestModuleFactory().getModuleVersionNumber()
+            self.log(Level.INFO, "Using in-process carver with " + str(len(self.signatures)) + " signatures from " + confPath)
+        else:
+            # Get path to EXE based on where this script is run from.
+            # Assumes EXE is in same folder as script
+            # Verify it is there before any ingest starts
+            if PlatformUtil.isWindowsOS():
+                self.path_to_exe_foremost = os.path.join(moduleDir, "foremost.exe")
+                if not os.path.exists(self.path_to_exe_foremost):
+                    raise IngestModuleException("Windows Executable was not found in module folder")
+            elif PlatformUtil.getOSName() == 'Linux':
+                self.path_to_exe_foremost = os.path.join(moduleDir, 'foremost')
+                if not os.path.exists(self.path_to_exe_foremost):
+                    raise IngestModuleException("Linux Executable was not found in module folder")
+            self.carverName = "foremost"
+            self.carverVersion = "1.5"
+
+        self.deduplicate = self.local_settings.getSetting('Deduplicate_Files') == 'true'
+        self.carveUnallocated = self.local_settings.getSetting('Carve_Unallocated') == 'true'
+
+        # Known files (NSRL / known good) are skipped before carving. Autopsy's own known
+        # status is always used, a user hash list is indexed once and looked up on disk.
+        self.knownFilter = None
+        if self.local_settings.getSetting('Skip_Known_Files') == 'true':
+            knownHashes = None
+            hashListPath = self.local_settings.getSetting('Known_Hash_List')
+            if hashListPath:
+                if not os.path.exists(hashListPath):
+                    raise IngestModuleException("Known hash list " + hashListPath + " was not found")
+                # The index is built in the module output folder of the case, the list itself
+                # may be on read only media
+                indexDir = os.path.join(Case.getCurrentCase().getModulesOutputDirAbsPath(), "Carved-Foremost", "known-hashes")
+                try:
+                    knownHashes = KnownHashSet.load(hashListPath, indexDir)
+                except (IOError, OSError):
+                    raise IngestModuleException("Unable to index known hash list " + hashListPath + " in " + indexDir + " ==> " + str(sys.exc_info()[1]))
+                self.log(Level.INFO, "Loaded " + str(len(knownHashes)) + " known hashes from " + hashListPath)
+            self.knownFilter = KnownFileFilter(knownHashes)
+
+        # Carve each file in the file ingest pipeline rather than querying for them afterwards
+        self.filePipeline = self.local_settings.getSetting('File_Pipeline') == 'true'
+
+        # Batching only applies to foremost, the in-process carver has no per file start up cost.
+        # The file pipeline hands over one file at a time, so there is nothing to batch.
+        self.batchSmallFiles = (not self.useNativeCarver) and (not self.filePipeline) and self.local_settings.getSetting('Batch_Small_Files') == 'true'
+
+        # Fingerprint of everything that changes what gets carved. It is stored in the manifest
+        # so files are carved again after a change of engine or signatures. The module version
+        # and batching are left out: carving a file again over them would add its images twice.
+        fingerprint = hashlib.md5()
+        fingerprint.update(" ".join([self.carverName, ",".join(CARVE_TYPES)]))
+        if self.useNativeCarver:
+            confFile = open(confPath, "rb")
+            try:
+                fingerprint.update(confFile.read())
+            finally:
+                confFile.close()
+        self.configFingerprint = fingerprint.hexdigest()
+
+        try:
+            self.numWorkers = max(1, int(self.local_settings.getSetting('Worker_Threads')))
+        except:
+            self.numWorkers = 1
+        try:
+            self.commitBatchSize = max(1, int(self.local_settings.getSetting('Commit_Batch_Size')))
+        except:
+            self.commitBatchSize = COMMIT_BATCH_SIZE
+
+        # Limits on the time spent on and the bytes read from any one file, 0 for none
+        try:
+            self.fileTimeLimit = max(0, int(self.local_settings.getSetting('File_Time_Limit')))
+        except:
+            self.fileTimeLimit = 0
+        try:
+            self.fileByteLimit = max(0, int(self.local_settings.getSetting('File_MB_Limit'))) * 1024 * 1024
+        except:
+            self.fileByteLimit = 0
+        self.carveOrder = self.local_settings.getSetting('Carve_Order') or ORDER_OBJECT_ID
+        # Stored with files the limits stopped, which are only carved again once they change
+        self.limitsFingerprint = "time=%d size=%d" % (self.fileTimeLimit, self.fileByteLimit)
 
-        if PlatformUtil.isWindowsOS():
-            self.path_to_exe_foremost = os.path.join(os.path.dirname(os.path.abspath(__file__)), "foremost.exe")
-            if not os.path.exists(self.path_to_exe_foremost):
-                raise IngestModuleException("Windows Executable was not found in module folder")
-        elif PlatformUtil.getOSName() == 'Linux':
-            self.path_to_exe_foremost = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'foremost')
-            if not os.path.exists(self.path_to_exe_foremost):
-                raise IngestModuleException("Linux Executable was not found in module folder")
-            
-            
         if self.local_settings.getSetting('Default_Mime_Types') == 'true':
             self.List_Of_tables.append('Default_Mime_Types')
         if self.local_settings.getSetting('All_Mime_Types') == 'true':
@@ -179,14 +346,18 @@ class CarverFilesIngestModule(DataSourceIngestModule):
         #self.logger.logp(Level.INFO, Process_EVTX1WithUI.__name__, "startUp", str(self.List_Of_Events))
         self.log(Level.INFO, str(self.List_Of_tables) + " >> " + str(len(self.List_Of_tables)))
 
-        if "Default_Mime_Types" in self.List_Of_tables:
-            self.mimeTypesToFind =  ["application/octet-stream","application/x-sqlite3", "application/vnd.ms-excel.sheet.4",  "application/x-msoffice","application/msword", "application/msoffice", "application/vnd.ms-excel", "application/vnd.ms-powerpoint" ]
+        # Used unless All Mime Types is selected
+        self.mimeTypesToFind =  ["application/octet-stream","application/x-sqlite3", "application/vnd.ms-excel.sheet.4",  "application/x-msoffice","application/msword", "application/msoffice", "application/vnd.ms-excel", "application/vnd.ms-powerpoint" ]
 
         
         # Throw an IngestModule.IngestModuleException exception if there was a problem setting up
         # raise IngestModuleException(IngestModule(), "Oh No!")
         pass
 
+    def shutDown(self):
+        if self.knownFilter is not None:
+            self.knownFilter.close()
+
     # Where the analysis is done.
     # The 'dataSource' object being passed in is of type org.sleuthkit.datamodel.Content.
     # See: http://www.sleuthkit.org/sleuthkit/docs/jni-docs/interfaceorg_1_1sleuthkit_1_1datamodel_1_1_content.html
@@ -204,159 +375,157 @@ class CarverFilesIngestModule(DataSourceIngestModule):
         # Use blackboard class to index blackboard artifacts for keyword search
         blackboard = Case.getCurrentCase().getServices().getBlackboard()
 
-        # For our example, we will use FileManager to get all
-        # files with the word "test"
-        # in the name and then count and read them
-        # FileManager API: http://sleuthkit.org/autopsy/docs/api-docs/latest/classorg_1_1sleuthkit_1_1autopsy_1_1casemodule_1_1services_1_1_file_manager.html
-        skCase = Case.getCurrentCase().getSleuthkitCase()
-        fileManager = Case.getCurrentCase().getServices().getFileManager()
+        # When carving as files are ingested, CarverFilesFileIngestModule does the work
+        if self.filePipeline:
+            self.log(Level.INFO, "Files are carved by the file ingest module as they are ingested")
+            return IngestModule.ProcessResult.OK
 
-        if "All_Mime_Types" in self.List_Of_tables:
-            files = fileManager.findFiles(dataSource, "%")
-            if "Include_Slack_Space" in self.List_Of_tables:
-                files=[i for i in files if (i.getSize() > 500)]
-                numFiles = len(files)
-            else:
-                files=[i for i in files if (i.getSize() > 500) and not i.getName().endswith("-slack") ]			
-                numFiles = len(files)		
-        else:
-            files = fileManager.findFilesByMimeType(self.mimeTypesToFind)
-            if "Include_Slack_Space" in self.List_Of_tables:
-                files=[i for i in files if (i.getSize() > 500)]
-                numFiles = len(files)
-            else:
-                files=[i for i in files if (i.getSize() > 500) and not i.getName().endswith("-slack") ]			
-                numFiles = len(files)       
-
- #       if "Default_Mime_Types" in self.List_Of_tables:
- #           files = fileManager.findFilesByMimeType(self.mimeTypesToFind)
- #           if "Include_Slack_Space" in self.List_Of_tables:
- #               files=[i for i in files if (i.getSize() > 1000)]
- #               numFiles = len(files)
- #           else:
- #               files=[i for i in files if (i.getSize() > 1000) and not i.getName().endswith("-slack") ]			
- #               numFiles = len(files)
- #       else:
- #           files = fileManager.findFiles(dataSource, "%")
- #           if "Include_Slack_Space" in self.List_Of_tables:
- #               files=[i for i in files if (i.getSize() > 1000)]
- #               numFiles = len(files)
- #           else:
- #               files=[i for i in files if (i.getSize() > 1000) and not i.getName().endswith("-slack") ]			
- #               numFiles = len(files)			
-		self.log(Level.INFO, "found " + str(numFiles) + " files")
+        # Export and carving run on the worker threads, everything that touches the case
+        # database or the blackboard is done on this thread by the committer
+        committer = self.startOutput()
+        manifest = self.manifest
+
+        # The selection is done by the case database and the files are read a page at a time,
+        # so nothing is loaded up front however many files the data source holds. Pages are
+        # read while derived files are being added, so the query is limited to the files that
+        # existed when the job started or the module would go on to carve its own output.
+        skCase = Case.getCurrentCase().getSleuthkitCase()
+        with self.metrics.stage("query"):
+            lastFileId = self.findLastFileId(skCase, dataSource)
+        fileQuery = self.buildFileQuery(dataSource, lastFileId)
+        with self.metrics.stage("query"):
+            numFiles = skCase.countFilesWhere(fileQuery)
+        files = self.findFilesOrdered(skCase, fileQuery)
+        self.log(Level.INFO, "found " + str(numFiles) + " files matching " + fileQuery)
         progressBar.switchToDeterminate(numFiles)
         fileCount = 0
-        FileExtractCount=0
-        Temp_Dir = Case.getCurrentCase().getModulesOutputDirAbsPath()
-        tmp_dir = Case.getCurrentCase().getTempDirectory()
-        if PlatformUtil.isWindowsOS():
-            self.log(Level.INFO, "create Directory " + Temp_Dir)
-            try:
-		os.mkdir(Temp_Dir + "\Carved-Foremost")
-            except:
-                self.log(Level.INFO, "Carved-Foremost Directory already exists " + Temp_Dir)
-        else:
-            self.log(Level.INFO, "create Directory " + Temp_Dir)
-            try:
-		os.mkdir(Temp_Dir + "/Carved-Foremost")
-            except:
-                self.log(Level.INFO, "Carved-Foremost Directory already exists " + Temp_Dir)
-        for file in files:
+        skippedCount = 0
 
-            fileCount += 1
+        pool = CarvingWorkerPool(self, self.numWorkers)
+        self.log(Level.INFO, "Carving with " + str(self.numWorkers) + " worker threads")
+        batch = []
+        batchBytes = 0
+        try:
+            for file in files:
 
-            # Check if the user pressed cancel while we were busy
-            if self.context.isJobCancelled():
+                # Check if the user pressed cancel while we were busy
+                if self.context.isJobCancelled():
+                    return IngestModule.ProcessResult.OK
+
+                if manifest.is_complete(file.getId(), file.getSize(), file.getMd5Hash(), self.configFingerprint, self.limitsFingerprint):
+                    skippedCount += 1
+                    fileCount += 1
+                    progressBar.progress(fileCount)
+                    continue
+                if self.isKnown(file, file.getMd5Hash()):
+                    fileCount += 1
+                    progressBar.progress(fileCount)
+                    continue
+                # Files the hash lookup module has already hashed can be matched up before carving
+                if self.isDuplicate(file, file.getMd5Hash()):
+                    result = CarveResult(file, DUPLICATE)
+                    result.md5 = file.getMd5Hash()
+                    committer.commit(result)
+                    fileCount += 1
+                    progressBar.progress(fileCount)
+                    continue
+                if self.batchSmallFiles and file.getSize() <= BATCH_FILE_MAX_SIZE:
+                    batch.append(file)
+                    batchBytes += file.getSize()
+                    if batchBytes >= BATCH_MAX_BYTES or len(batch) >= BATCH_MAX_FILES:
+                        if not pool.submit(batch):
+                            return IngestModule.ProcessResult.OK
+                        batch = []
+                        batchBytes = 0
+                elif not pool.submit([file]):
+                    return IngestModule.ProcessResult.OK
+
+                for result in pool.completed():
+                    committer.commit(result)
+                    fileCount += 1
+                # Update the progress bar
+                progressBar.progress(fileCount)
+
+            if len(batch) > 0 and not pool.submit(batch):
                 return IngestModule.ProcessResult.OK
-             
-
-            if ((file.getSize() > 1000) and (file.getType() != TskData.TSK_DB_FILES_TYPE_ENUM.UNALLOC_BLOCKS) and (file.getType() != TskData.TSK_DB_FILES_TYPE_ENUM.UNUSED_BLOCKS) and (file.isFile() != False)):
-                self.log(Level.INFO, "Processing file: " + file.getName())
-
-            # Make an artifact on the blackboard.  TSK_INTERESTING_FILE_HIT is a generic type of
-            # artfiact.  Refer to the developer docs for other examples.
-
-
-                fileGetName=file.getName()
-				
-                if ":" in fileGetName:
-                    fileGetName=fileGetName.replace(":","_")
-                else:
-                    fileGetName=file.getName()
-                    if PlatformUtil.isWindowsOS():				
-                        out_dir = os.path.join(Temp_Dir + "\Carved-Foremost", str(file.getId()))
-                        try:
-                           os.mkdir(Temp_Dir + "\Carved-Foremost\\" + str(file.getId()))
-                        except:
-                           self.log(Level.INFO, str(file.getId()) + " Directory already exists " + Temp_Dir)
-                    else:
-                        out_dir = os.path.join(Temp_Dir + "/Carved-Foremost", str(file.getId()))
-                        try:
-                            os.mkdir(Temp_Dir + "/Carved-Foremost/" + str(file.getId()))
-                        except:
-                            self.log(Level.INFO, str(file.getId()) + " Directory already exists " + Temp_Dir)
-                lclDbPath=os.path.join(tmp_dir, str(file.getId()))
-                try:
-                    ContentUtils.writeToFile(file, File(lclDbPath))
-                except:
-                    pass
-                # Check if output directory exists and if it does then delete it, this may happen with a rerun
-                if os.path.exists(out_dir):
-                    shutil.rmtree(out_dir)
-		if os.path.exists(lclDbPath):
-                    self.log(Level.INFO, "Running prog ==> " + self.path_to_exe_foremost + " -t " + "jpeg,png,bmp,gif" + " -o " + out_dir + " -i " + lclDbPath)
-                    pipe = Popen([self.path_to_exe_foremost, "-t" + "jpeg,png,bmp,gif", "-o", out_dir, "-i", lclDbPath], stdout=PIPE, stderr=PIPE)
-                    out_text = pipe.communicate()[0]
-                    self.log(Level.INFO, "Output from run is ==> " + out_text)
-                
-                    if len(os.listdir(out_dir)) == 1:
-                        shutil.rmtree(out_dir)
-			os.remove(lclDbPath)
-                    else:
-                        art = file.newArtifact(BlackboardArtifact.ARTIFACT_TYPE.TSK_INTERESTING_FILE_HIT)
-                        att = BlackboardAttribute(BlackboardAttribute.ATTRIBUTE_TYPE.TSK_SET_NAME, CarverFilesIngestModuleFactory.moduleName, "New Carved Data and Sqlite Files")
-                        art.addAttribute(att)
-                        try:
-                # index the artifact for keyword search
-                            skCase.getBlackboard().postArtifact(art, moduleName)
-                        except Blackboard.BlackboardException as e:
-                            self.log(Level.SEVERE, "Error indexing artifact " + art.getDisplayName())
-                        
-                        redactresults = out_dir  
-                        auditLog = os.path.join(redactresults,"audit.txt")
-                        if os.path.exists(auditLog):
-                            os.remove(auditLog)			
-                        imagedirs = os.listdir(redactresults)
-                        for imagedir in imagedirs:
-                            jpgpath=os.path.join(redactresults,imagedir)
-                            imagejpgs=os.listdir(jpgpath)
-                            for imagejpg in imagejpgs:
-                                srcfile=os.path.join(jpgpath,imagejpg)
-                                dstfile=os.path.join(redactresults,imagejpg)
-                                shutil.move(srcfile,dstfile)
-                            shutil.rmtree(jpgpath)
-                        extractedfiles = next(os.walk(out_dir))[2]
-                        for extractfile in extractedfiles:
-                            FileExtractCount=FileExtractCount+1					
-                            self.log(Level.INFO, " File Name is ==> " + extractfile)
-                            if PlatformUtil.isWindowsOS():
-                                 relativeModulepath=Case.getCurrentCase().getModuleOutputDirectoryRelativePath() + "\Carved-Foremost"
-                            else:
-                                 relativeModulepath=Case.getCurrentCase().getModuleOutputDirectoryRelativePath() + "/Carved-Foremost"
-                            relativeCarvedpath=os.path.join(relativeModulepath, str(file.getId())) 
-                            relativelocal_file = os.path.join(relativeCarvedpath, extractfile)
-                            local_file = os.path.join(out_dir,extractfile)						
-                            self.log(Level.INFO, " Local File Name is ==> " + local_file)
-               
-                            derived_file=skCase.addDerivedFile(extractfile, relativelocal_file, os.path.getsize(local_file), 0, 0, 0, 0, True, file, "", "foremost", "1.5", "", TskData.EncodingType.NONE)
-                        
-                            IngestServices.getInstance().fireModuleContentEvent(ModuleContentEvent(derived_file))
-                        os.remove(lclDbPath)
-
-            # Update the progress bar
-            progressBar.progress(fileCount)
-            
+
+            while pool.pending > 0:
+                if self.context.isJobCancelled():
+                    return IngestModule.ProcessResult.OK
+                for result in pool.completed(True):
+                    committer.commit(result)
+                    fileCount += 1
+                progressBar.progress(fileCount)
+        finally:
+            # The workers are waited for, so none is still carving when shutDown closes the
+            # known file filter. Whatever was carved before a cancel is still added to the case.
+            for result in pool.shutdown():
+                committer.commit(result)
+                fileCount += 1
+            committer.flush()
+        self.postSummary(dataSource.getId(), committer, fileCount, skippedCount)
+		
+        return IngestModule.ProcessResult.OK              
+
+    # Set up the output shared by everything this job carves: the Carved-Foremost folder, the
+    # manifest of files already carved, the image store, the duplicate index and the metrics.
+    # Returns the committer that adds the results to the case.
+    def startOutput(self):
+        # Stage timings, byte counts and carves per type for the summary and the JSON report
+        self.metrics = CarveMetrics()
+        skCase = Case.getCurrentCase().getSleuthkitCase()
+        Temp_Dir = Case.getCurrentCase().getModulesOutputDirAbsPath()
+        self.tmp_dir = Case.getCurrentCase().getTempDirectory()
+        self.carvedDir = os.path.join(Temp_Dir, "Carved-Foremost")
+        relativeModulepath = os.path.join(Case.getCurrentCase().getModuleOutputDirectoryRelativePath(), "Carved-Foremost")
+        self.log(Level.INFO, "create Directory " + Temp_Dir)
+        try:
+            os.mkdir(self.carvedDir)
+        except:
+            self.log(Level.INFO, "Carved-Foremost Directory already exists " + Temp_Dir)
+
+        # Files carved completely by an earlier run with the same configuration are skipped
+        self.manifest = get_manifest(self.carvedDir)
+        # Carved images are stored once by content hash, however many parents they come from
+        self.store = CarveStore(self.carvedDir)
+        if self.deduplicate:
+            self.duplicates = DuplicateIndex()
+        else:
+            self.duplicates = None
+        return CarvedFileCommitter(skCase, CarverFilesIngestModuleFactory.moduleName, relativeModulepath, self.carverName, self.carverVersion, self.manifest, self.configFingerprint, self.duplicates, self.commitBatchSize, self.metrics, self.store, self.limitsFingerprint)
+
+    # Post what the job found to the ingest inbox and save the metrics report.
+    def postSummary(self, dataSourceId, committer, fileCount, skippedCount):
+        FileExtractCount = committer.extractCount
+        self.metrics.count("files", fileCount)
+        self.metrics.count("images", FileExtractCount)
+        self.metrics.count("files_already_carved", skippedCount)
+        self.metrics.count("files_partial", committer.partialCount)
+        self.metrics.count("images_stored", self.store.stored_count)
+        self.metrics.count("images_shared", self.store.shared_count)
+        self.metrics.count("bytes_stored", self.store.stored_bytes)
+        self.metrics.count("bytes_saved", self.store.saved_bytes)
+        self.metrics.finish()
+        if self.duplicates is not None and self.duplicates.avoidedCount > 0:
+            message = IngestMessage.createMessage(IngestMessage.MessageType.DATA,
+                "File Carver Module", "Carved %d files with identical copies only once, avoiding %d carves of %d bytes" % (self.duplicates.sharedCount, self.duplicates.avoidedCount, self.duplicates.avoidedBytes))
+            IngestServices.getInstance().postMessage(message)
+        if self.knownFilter is not None and self.knownFilter.skippedCount > 0:
+            message = IngestMessage.createMessage(IngestMessage.MessageType.DATA,
+                "File Carver Module", "Skipped %d known files (%d bytes)" % (self.knownFilter.skippedCount, self.knownFilter.skippedBytes))
+            IngestServices.getInstance().postMessage(message)
+        if skippedCount > 0:
+            message = IngestMessage.createMessage(IngestMessage.MessageType.DATA,
+                "File Carver Module", "Skipped %d files already carved by a previous run" % skippedCount)
+            IngestServices.getInstance().postMessage(message)
+        if self.store.shared_count > 0:
+            message = IngestMessage.createMessage(IngestMessage.MessageType.DATA,
+                "File Carver Module", "Stored %d unique images (%d bytes), %d more were identical to a stored image, saving %d bytes" % (self.store.stored_count, self.store.stored_bytes, self.store.shared_count, self.store.saved_bytes))
+            IngestServices.getInstance().postMessage(message)
+        if committer.partialCount > 0:
+            message = IngestMessage.createMessage(IngestMessage.MessageType.DATA,
+                "File Carver Module", "%d files were only partly carved because of the time or size limit per file" % committer.partialCount)
+            IngestServices.getInstance().postMessage(message)
 
         #Post a message to the ingest messages in box.
         message = IngestMessage.createMessage(IngestMessage.MessageType.DATA,
@@ -366,9 +535,993 @@ class CarverFilesIngestModule(DataSourceIngestModule):
         message2 = IngestMessage.createMessage(IngestMessage.MessageType.DATA,
             "File Carver Module", "Found %d images in %d files " % (FileExtractCount,fileCount))
         IngestServices.getInstance().postMessage(message2)
-		
-        return IngestModule.ProcessResult.OK              
-		
+
+        reportPath = os.path.join(self.carvedDir, "carve-metrics-%d-%s.json" % (dataSourceId, time.strftime("%Y%m%d-%H%M%S")))
+        try:
+            self.metrics.write_report(reportPath)
+        except:
+            self.log(Level.WARNING, "Unable to write metrics report " + reportPath + " ==> " + str(sys.exc_info()[1]))
+        summary = self.metrics.summary()
+        message3 = IngestMessage.createMessage(IngestMessage.MessageType.DATA,
+            "File Carver Module", "Carving summary: " + summary[0], "<br>".join(summary + ["Report: " + reportPath]))
+        IngestServices.getInstance().postMessage(message3)
+
+    # True when known files are being skipped and file is known to Autopsy or its MD5 is in
+    # the known hash list.
+    def isKnown(self, file, md5):
+        return self.knownFilter is not None and self.knownFilter.isKnown(file, md5)
+
+    # True when deduplication is on and another file with the same content hash has already
+    # been claimed for carving in this job.
+    def isDuplicate(self, file, md5):
+        return self.duplicates is not None and not self.duplicates.claim(file, md5)
+
+    # Copy the content of file to the open output file outFile, returning the number of
+    # bytes copied and their MD5.
+    # A budget, if given, is checked before every chunk and stops the copy early.
+    def copyContent(self, file, outFile, buffer, budget=None):
+        md5 = hashlib.md5()
+        length = 0
+        with self.metrics.stage("export"):
+            inputStream = ReadContentInputStream(file)
+            try:
+                while True:
+                    readSize = len(buffer) if budget is None else budget.allowedRead(length, file.getSize(), len(buffer))
+                    if readSize <= 0:
+                        break
+                    readLen = inputStream.read(buffer, 0, readSize)
+                    if readLen <= 0:
+                        break
+                    data = buffer[:readLen].tostring()
+                    outFile.write(data)
+                    md5.update(data)
+                    length += readLen
+            finally:
+                inputStream.close()
+        self.metrics.count("bytes_read", length)
+        self.metrics.count("bytes_staged", length)
+        return length, md5.hexdigest()
+
+    # The highest object id of any file in the data source, or None if it has no files.
+    def findLastFileId(self, skCase, dataSource):
+        files = skCase.findAllFilesWhere("data_source_obj_id = " + str(dataSource.getId()) + " ORDER BY obj_id DESC LIMIT 1")
+        if len(files) == 0:
+            return None
+        return files[0].getId()
+
+    # SQL where clause on tsk_files selecting the files to carve: regular files in this data
+    # source big enough to hold an image, limited by the slack space and mime type options.
+    # Unallocated and unused blocks are only carved when that option is on, and then
+    # whatever their mime type. With lastFileId, files added after it, such as the derived
+    # files this job adds, are left out.
+    def buildFileQuery(self, dataSource, lastFileId=None):
+        blockTypes = "(" + str(TskData.TSK_DB_FILES_TYPE_ENUM.UNALLOC_BLOCKS.getFileType()) + ", " + str(TskData.TSK_DB_FILES_TYPE_ENUM.UNUSED_BLOCKS.getFileType()) + ")"
+        fileWhere = ["meta_type = " + str(TskData.TSK_FS_META_TYPE_ENUM.TSK_FS_META_TYPE_REG.getValue()),
+                     "type NOT IN " + blockTypes]
+        if "Include_Slack_Space" not in self.List_Of_tables:
+            fileWhere.append("name NOT LIKE '%-slack'")
+        if "All_Mime_Types" not in self.List_Of_tables:
+            fileWhere.append("mime_type IN (" + ", ".join(["'" + mimeType + "'" for mimeType in self.mimeTypesToFind]) + ")")
+        where = ["data_source_obj_id = " + str(dataSource.getId()),
+                 "size > " + str(MIN_FILE_SIZE)]
+        if lastFileId is not None:
+            where.append("obj_id <= " + str(lastFileId))
+        if self.carveUnallocated:
+            where.append("((" + " AND ".join(fileWhere) + ") OR type IN " + blockTypes + ")")
+        else:
+            where.extend(fileWhere)
+        return " AND ".join(where)
+
+    # The selection buildFileQuery makes, for one file coming through the file ingest
+    # pipeline. A file the File Type Identification module hasn't typed yet is typed with
+    # detector, if one is given.
+    def isCarvable(self, file, detector=None):
+        if file.getSize() <= MIN_FILE_SIZE:
+            return False
+        if file.getType() in (TskData.TSK_DB_FILES_TYPE_ENUM.UNALLOC_BLOCKS, TskData.TSK_DB_FILES_TYPE_ENUM.UNUSED_BLOCKS):
+            return self.carveUnallocated
+        if file.getMetaType() != TskData.TSK_FS_META_TYPE_ENUM.TSK_FS_META_TYPE_REG:
+            return False
+        if "Include_Slack_Space" not in self.List_Of_tables and file.getName().lower().endswith("-slack"):
+            return False
+        if "All_Mime_Types" in self.List_Of_tables:
+            return True
+        mimeType = file.getMIMEType()
+        if mimeType is None and detector is not None:
+            mimeType = detector.getMIMEType(file)
+        return mimeType in self.mimeTypesToFind
+
+    # Yield the files matching the where clause in the carving order chosen in the settings.
+    def findFilesOrdered(self, skCase, where):
+        if self.carveOrder == ORDER_SMALL_FIRST:
+            return self.findFilesPaged(skCase, where, True)
+        if self.carveOrder == ORDER_INTERLEAVE:
+            return self.interleaveBySize(skCase, where)
+        return self.findFilesPaged(skCase, where)
+
+    # Yield the files matching the where clause a page at a time, in object id order or,
+    # with bySize, smallest first (largest first when descending). Each page query starts
+    # after the last file of the previous one.
+    def findFilesPaged(self, skCase, where, bySize=False, descending=False):
+        last = None
+        while True:
+            if not bySize:
+                after = "" if last is None else " AND obj_id > " + str(last.getId())
+                order = " ORDER BY obj_id"
+            else:
+                compare = "<" if descending else ">"
+                after = "" if last is None else " AND (size %s %d OR (size = %d AND obj_id %s %d))" % (compare, last.getSize(), last.getSize(), compare, last.getId())
+                order = " ORDER BY size DESC, obj_id DESC" if descending else " ORDER BY size, obj_id"
+            with self.metrics.stage("query"):
+                page = skCase.findAllFilesWhere(where + after + order + " LIMIT " + str(FILE_QUERY_PAGE_SIZE))
+            for file in page:
+                yield file
+            if len(page) < FILE_QUERY_PAGE_SIZE:
+                return
+            last = page[len(page) - 1]
+
+    # Yield the smallest and the largest file left in turn until the two ends meet.
+    def interleaveBySize(self, skCase, where):
+        smallest = self.findFilesPaged(skCase, where, True)
+        largest = self.findFilesPaged(skCase, where, True, True)
+        low = None
+        high = None
+        while True:
+            file = next(smallest, None)
+            if file is None or (high is not None and (file.getSize(), file.getId()) >= high):
+                return
+            low = (file.getSize(), file.getId())
+            yield file
+            file = next(largest, None)
+            if file is None or (file.getSize(), file.getId()) <= low:
+                return
+            high = (file.getSize(), file.getId())
+            yield file
+
+    # Carve a list of files and return a CarveResult for each of them.
+    # Runs on a carving worker thread so it must not touch the case database.
+    def carveEntries(self, entries):
+        started = time.time()
+        if len(entries) > 1:
+            results = self.carveBatchForemost(entries)
+            self.metrics.file_done(entries[0].getId(), "batch of " + str(len(entries)) + " files from " + entries[0].getName(),
+                                   sum([file.getSize() for file in entries]), time.time() - started)
+        else:
+            file = entries[0]
+            results = [self.carveFile(file)]
+            self.metrics.file_done(file.getId(), file.getName(), file.getSize(), time.time() - started)
+        for result in results:
+            if result.state in (COMPLETE, PARTIAL):
+                for extractfile in result.extractedfiles:
+                    self.metrics.carved(extractfile.rsplit(".", 1)[-1], result.sizes[extractfile])
+        return results
+
+    # Carve one file into the store and return a CarveResult naming the carved images.
+    # Images stored before a failure are left in the store, where a rerun finds them again.
+    def carveFile(self, file):
+        if self.verbose:
+            self.log(Level.FINE, "Processing file: " + file.getName())
+        result = CarveResult(file)
+        result.budget = self.newBudget()
+        if self.useNativeCarver:
+            result.extractedfiles = self.carveFileNative(file, result)
+        elif file.getSize() > WINDOW_SIZE + self.windowOverlap:
+            result.extractedfiles = self.carveFileForemostWindows(file, self.tmp_dir, result)
+        else:
+            result.extractedfiles = self.carveFileForemost(file, self.tmp_dir, result)
+        self.applyBudget(result)
+        return result
+
+    def newBudget(self):
+        return CarveBudget(self.context, self.fileTimeLimit, self.fileByteLimit)
+
+    # A file stopped by a cancel gets no result. One stopped by its time or size limit keeps
+    # what was carved but is recorded as partial, without an MD5 as not all of it was read.
+    def applyBudget(self, result):
+        stopped = result.budget.stopped
+        if stopped == CarveBudget.CANCELLED:
+            result.state = None
+        elif stopped is not None and result.state == COMPLETE:
+            self.log(Level.INFO, "Stopped carving " + result.file.getName() + " at its " + stopped + " limit")
+            result.state = PARTIAL
+            result.md5 = None
+
+    # Export the file to the case temp directory and run foremost over the copy. Returns the
+    # names of the carved images, which are moved from foremost's per type folders into the store.
+    def carveFileForemost(self, file, tmp_dir, result):
+        # foremost seeks around its input, so it can't read from a pipe and needs a staged copy.
+        # The copy and foremost's output folder are removed however the run ends.
+        # The MD5 is worked out while staging, and foremost isn't run at all if another file
+        # with the same content has already been claimed.
+        lclDbPath=os.path.join(tmp_dir, str(file.getId()))
+        foremost_out = lclDbPath + "-out"
+        try:
+            try:
+                stagedFile = open(lclDbPath, "wb")
+                try:
+                    length, result.md5 = self.copyContent(file, stagedFile, jarray.zeros(CHUNK_SIZE, "b"), result.budget)
+                finally:
+                    stagedFile.close()
+            except:
+                self.log(Level.WARNING, "Unable to export " + file.getName() + " ==> " + str(sys.exc_info()[1]))
+                return []
+            # A copy cut short by the size limit is still carved, but its MD5 isn't the file's
+            if result.budget.expired():
+                return []
+            if result.budget.stopped is None and self.isKnown(file, result.md5):
+                result.state = KNOWN
+                return []
+            if result.budget.stopped is None and self.isDuplicate(file, result.md5):
+                result.state = DUPLICATE
+                return []
+            for imagejpg, offset, srcfile in self.runForemost(lclDbPath, foremost_out, result.budget):
+                # An image running to the end of a copy cut short by the size limit is cut short too
+                if result.budget.stopped is not None and offset + os.path.getsize(srcfile) >= length:
+                    continue
+                # foremost names images by the block they start in, so name them by their offset
+                self.addCarve(result, srcfile, "%08d.%s" % (offset, imagejpg.rsplit(".", 1)[-1]), offset)
+        finally:
+            if os.path.exists(lclDbPath):
+                os.remove(lclDbPath)
+            if os.path.exists(foremost_out):
+                shutil.rmtree(foremost_out)
+        return result.extractedfiles
+
+    # Carve a file too big to stage whole, such as unallocated space, one window at a time.
+    # Each window is WINDOW_SIZE bytes plus an overlap of the largest max carve size, so an
+    # image that starts inside a window is carved whole from it. Images that start in the
+    # overlap are dropped because the next window starts there and carves them again.
+    # Only one window is ever staged; carved images are named by their offset in the file.
+    def carveFileForemostWindows(self, file, tmp_dir, result):
+        size = file.getSize()
+        windowPath = os.path.join(tmp_dir, str(file.getId()) + "-window")
+        foremost_out = windowPath + "-out"
+        buffer = jarray.zeros(CHUNK_SIZE, "b")
+        md5 = hashlib.md5()
+        start = 0
+        try:
+            while start < size:
+                if result.budget.expired():
+                    break
+                length = min(WINDOW_SIZE + self.windowOverlap, size - start)
+                last = start + length >= size
+                windowStarted = time.time()
+                windowFile = open(windowPath, "wb")
+                try:
+                    offset = 0
+                    while offset < length:
+                        readSize = result.budget.allowedRead(start + offset, size, min(CHUNK_SIZE, length - offset))
+                        if readSize <= 0:
+                            break
+                        readLen = file.read(buffer, start + offset, readSize)
+                        if readLen <= 0:
+                            break
+                        data = buffer[:readLen].tostring()
+                        windowFile.write(data)
+                        # The parts of each window before its overlap follow on from each other,
+                        # so hashing just those gives the MD5 of the whole file
+                        if last:
+                            md5.update(data)
+                        elif offset < WINDOW_SIZE:
+                            md5.update(data[:WINDOW_SIZE - offset])
+                        offset += readLen
+                finally:
+                    windowFile.close()
+                self.metrics.add_time("export", time.time() - windowStarted)
+                self.metrics.count("bytes_read", offset)
+                self.metrics.count("bytes_staged", offset)
+                if result.budget.expired():
+                    break
+                # Past the size limit the window is carved as it is and is the last one
+                last = last or result.budget.stopped is not None
+                if self.verbose:
+                    self.log(Level.FINE, "Carving " + file.getName() + " window at offset " + str(start) + " (" + str(offset) + " bytes)")
+                for imagejpg, carveOffset, srcfile in self.runForemost(windowPath, foremost_out, result.budget):
+                    if carveOffset >= WINDOW_SIZE and not last:
+                        continue
+                    # as is one running to the end of a window cut short by it
+                    if result.budget.stopped is not None and carveOffset + os.path.getsize(srcfile) >= offset:
+                        continue
+                    self.addCarve(result, srcfile, "%08d.%s" % (start + carveOffset, imagejpg.rsplit(".", 1)[-1]), start + carveOffset)
+                os.remove(windowPath)
+                if os.path.exists(foremost_out):
+                    shutil.rmtree(foremost_out)
+                if last:
+                    break
+                start += WINDOW_SIZE
+            result.md5 = md5.hexdigest()
+        finally:
+            if os.path.exists(windowPath):
+                os.remove(windowPath)
+            if os.path.exists(foremost_out):
+                shutil.rmtree(foremost_out)
+        return result.extractedfiles
+
+    # Run foremost over inputPath with its output in foremost_out, which is replaced if it
+    # exists. Returns (name, offset in the input, path) for every image in its audit.txt,
+    # or nothing if foremost had to be stopped because of the budget.
+    def runForemost(self, inputPath, foremost_out, budget):
+        if os.path.exists(foremost_out):
+            shutil.rmtree(foremost_out)
+        if budget.expired():
+            return []
+        if self.verbose:
+            self.log(Level.FINE, "Running prog ==> " + self.path_to_exe_foremost + " -t " + ",".join(CARVE_TYPES) + " -o " + foremost_out + " -i " + inputPath)
+        with self.metrics.stage("foremost"):
+            pipe = Popen([self.path_to_exe_foremost, "-t" + ",".join(CARVE_TYPES), "-o", foremost_out, "-i", inputPath], stdout=PIPE, stderr=PIPE)
+            out_text = self.waitForProcess(pipe, budget)
+        if out_text is None:
+            self.log(Level.INFO, "Stopped foremost on " + inputPath + " (" + budget.stopped + ")")
+            return []
+        if self.verbose:
+            self.log(Level.FINE, "Output from run is ==> " + out_text)
+        carves = []
+        auditLog = os.path.join(foremost_out, "audit.txt")
+        if os.path.exists(auditLog):
+            for imagejpg, offset in parse_audit(auditLog):
+                srcfile = os.path.join(foremost_out, imagejpg.rsplit(".", 1)[-1], imagejpg)
+                if os.path.exists(srcfile):
+                    carves.append((imagejpg, offset, srcfile))
+        return carves
+
+    # Wait for a carver process, checking the job's cancel flag and the time limit while it
+    # runs and killing the process if either says stop. Returns its output, or None if it
+    # was killed. The output is read on another thread so a full pipe can't block it.
+    def waitForProcess(self, pipe, budget):
+        output = []
+        reader = threading.Thread(target=lambda: output.append(pipe.communicate()[0]), name="FileCarver-process-output")
+        reader.setDaemon(True)
+        reader.start()
+        while True:
+            reader.join(PROCESS_POLL_SECONDS)
+            if not reader.isAlive():
+                return output[0] if output else ""
+            if budget.expired():
+                pipe.kill()
+                reader.join()
+                return None
+
+    # Move a carved image into the store and add it to the result as name, remembering the
+    # offset in the parent it was carved from. Names are made from the offset and type, so
+    # a second image of the same type at the same offset is left out.
+    def addCarve(self, result, srcfile, name, offset, md5=None):
+        if name in result.offsets:
+            return
+        with self.metrics.stage("output"):
+            result.paths[name], result.sizes[name] = self.store.put(srcfile, name.rsplit(".", 1)[-1], md5)
+        result.extractedfiles.append(name)
+        result.offsets[name] = offset
+
+    # Pack several small files into one batch file and run foremost over it once. The
+    # offsets in foremost's audit.txt say which file each image came from. A carve that
+    # crosses from one file into the next is thrown away, and as foremost skipped past
+    # everything it covered, the files it ran over are carved again one at a time.
+    # A batch that runs out of its budget is not carved at all; its files are then carved
+    # one at a time with a budget each, so only a file that overruns its own is partial.
+    def carveBatchForemost(self, entries):
+        batchName = "batch-" + str(entries[0].getId())
+        batchPath = os.path.join(self.tmp_dir, batchName)
+        batch_out = os.path.join(self.tmp_dir, batchName + "-out")
+        offsetMap = BatchOffsetMap()
+        results = {}
+        discarded = 0
+        recarve = []
+        # The files share one budget while they are carved together
+        budget = self.newBudget()
+        # The batch copy and foremost's output folder are removed however the run ends
+        try:
+            batchFile = open(batchPath, "wb")
+            try:
+                buffer = jarray.zeros(CHUNK_SIZE, "b")
+                for file in entries:
+                    result = CarveResult(file)
+                    result.budget = budget
+                    results[file.getId()] = result
+                    length, result.md5 = self.copyContent(file, batchFile, buffer, budget)
+                    if budget.stopped is not None:
+                        break
+                    if self.isKnown(file, result.md5):
+                        result.state = KNOWN
+                    elif self.isDuplicate(file, result.md5):
+                        result.state = DUPLICATE
+                    if result.state != COMPLETE:
+                        # Take the copy back out of the batch, it doesn't need carving
+                        batchFile.seek(offsetMap.size)
+                        batchFile.truncate()
+                        continue
+                    offsetMap.append(length, result)
+            finally:
+                batchFile.close()
+
+            carves = []
+            if budget.stopped is None:
+                if self.verbose:
+                    self.log(Level.FINE, "Carving batch " + batchName + " of " + str(len(offsetMap)) + " files")
+                carves = self.runForemost(batchPath, batch_out, budget)
+            located = []
+            for imagejpg, offset, srcfile in carves:
+                location = offsetMap.locate(offset, os.path.getsize(srcfile))
+                if location is None:
+                    discarded += 1
+                    for result in offsetMap.spanned(offset, os.path.getsize(srcfile)):
+                        if result not in recarve:
+                            recarve.append(result)
+                    continue
+                located.append((imagejpg, srcfile, location))
+            for imagejpg, srcfile, (result, localOffset) in located:
+                if result in recarve:
+                    continue
+                # foremost names images by their place in the batch, so name them by their place in the file
+                self.addCarve(result, srcfile, "%08d.%s" % (localOffset, imagejpg.rsplit(".", 1)[-1]), localOffset)
+        finally:
+            if os.path.exists(batchPath):
+                os.remove(batchPath)
+            if os.path.exists(batch_out):
+                shutil.rmtree(batch_out)
+        if budget.stopped is not None:
+            return self.carveBatchSeparately(entries, results, budget)
+        if discarded > 0:
+            self.log(Level.INFO, "Discarded " + str(discarded) + " images crossing file boundaries in " + batchName + ", carving " + str(len(recarve)) + " files again on their own")
+        for result in recarve:
+            results[result.file.getId()] = self.carveFile(result.file)
+        return [results[file.getId()] for file in entries]
+
+    # Carve the files of a batch stopped by 'budget' one at a time. Those already found to be
+    # known or duplicates keep that result; after a cancel none of them are carved.
+    def carveBatchSeparately(self, entries, results, budget):
+        if budget.stopped == CarveBudget.CANCELLED:
+            return [CarveResult(file, None) for file in entries]
+        self.log(Level.INFO, "Batch of " + str(len(entries)) + " files stopped at its " + budget.stopped + " limit, carving them one at a time")
+        separate = []
+        for file in entries:
+            result = results.get(file.getId())
+            if result is None or result.state == COMPLETE:
+                result = self.carveFile(file)
+            separate.append(result)
+        return separate
+
+    # Carve the file in process. The content is streamed from a ReadContentInputStream
+    # through a bounded read-ahead pipe straight into the carver, so nothing is staged in
+    # the temp directory and only the carved ranges are written, into the store's incoming
+    # folder. The carver hashes what it writes, so storing an image is just a rename.
+    def carveFileNative(self, file, result):
+        carver = StreamCarver(self.signatures, self.store.incoming_dir, CHUNK_SIZE, prefix=str(file.getId()) + "-")
+        inputStream = ReadContentInputStream(file)
+        buffer = jarray.zeros(CHUNK_SIZE, "b")
+        md5 = hashlib.md5()
+        bytesRead = [0]
+
+        # Cancelling the job or running out of budget ends the input, and the carver
+        # finishes what it has
+        def readChunk(size):
+            readSize = result.budget.allowedRead(bytesRead[0], file.getSize(), CHUNK_SIZE)
+            if readSize <= 0:
+                return ""
+            readLen = inputStream.read(buffer, 0, readSize)
+            if readLen <= 0:
+                return ""
+            data = buffer[:readLen].tostring()
+            md5.update(data)
+            bytesRead[0] += readLen
+            self.metrics.count("bytes_read", readLen)
+            return data
+
+        pipe = ReadAheadPipe(readChunk, CHUNK_SIZE, READ_AHEAD_CHUNKS)
+        try:
+            with self.metrics.stage("carve"):
+                carved = carver.carve_stream(pipe)
+        except:
+            for carve in carver.carved:
+                if os.path.exists(carve.path):
+                    os.remove(carve.path)
+            raise
+        finally:
+            pipe.close()
+            inputStream.close()
+        result.md5 = md5.hexdigest()
+        self.metrics.count("carves_rejected", carver.rejected)
+        # The MD5 is only known once the whole file has been read, so a file in the known hash
+        # list is still read and carved once, but its carves are dropped rather than stored
+        if result.budget.stopped is None and self.isKnown(file, result.md5):
+            result.state = KNOWN
+            for carve in carved:
+                os.remove(carve.path)
+            return []
+        # Carves still open where a time or size limit ended the input are cut short there, and
+        # are only carved whole by a run that reads further
+        if result.budget.stopped is not None:
+            for carve in [carve for carve in carved if carve.cut]:
+                carve.discard()
+                carved.remove(carve)
+        for carve in carved:
+            self.addCarve(result, carve.path, "%08d.%s" % (carve.start, carve.extension), carve.start, carve.md5.hexdigest())
+        return result.extractedfiles
+
+# Outcome of carving one parent file, handed from a worker to the committer. state is
+# None when the file was skipped because the job was cancelled. offsets, paths and sizes
+# map each carved image to the offset in the parent it was carved from, its path in the
+# store and its size.
+class CarveResult(object):
+
+    def __init__(self, file, state=COMPLETE):
+        self.file = file
+        self.state = state
+        self.extractedfiles = []
+        self.offsets = {}
+        self.paths = {}
+        self.sizes = {}
+        self.md5 = None
+        self.budget = None
+
+
+# Limits on how long one file may take and how much of it is read. Checked between
+# chunks while a file is read and while foremost runs, together with the job's cancel
+# flag. stopped says why work on the file stopped, or is None.
+class CarveBudget(object):
+
+    CANCELLED = "cancelled"
+    TIME = "time"
+    SIZE = "size"
+
+    def __init__(self, context, seconds, maxBytes):
+        self.context = context
+        self.deadline = time.time() + seconds if seconds > 0 else None
+        self.maxBytes = maxBytes
+        self.stopped = None
+
+    # True if the job was cancelled or the time limit has passed.
+    def expired(self):
+        if self.stopped in (None, CarveBudget.SIZE):
+            if self.context.isJobCancelled():
+                self.stopped = CarveBudget.CANCELLED
+            elif self.deadline is not None and time.time() > self.deadline:
+                self.stopped = CarveBudget.TIME
+        return self.stopped in (CarveBudget.CANCELLED, CarveBudget.TIME)
+
+    # How many bytes, up to 'chunk', may be read next from a file of 'size' bytes after the
+    # first 'done'. 0 means stop.
+    def allowedRead(self, done, size, chunk):
+        if self.expired():
+            return 0
+        if self.maxBytes > 0:
+            if done >= self.maxBytes:
+                if done < size:
+                    self.stopped = CarveBudget.SIZE
+                return 0
+            return min(chunk, self.maxBytes - done)
+        return chunk
+
+
+# Decides whether a file is known and counts what was skipped. Called from the ingest
+# thread and from the carving workers.
+class KnownFileFilter(object):
+
+    def __init__(self, knownHashes):
+        self.knownHashes = knownHashes
+        self.lock = threading.Lock()
+        self.skippedCount = 0
+        self.skippedBytes = 0
+
+    def isKnown(self, file, md5):
+        known = file.getKnown() == TskData.FileKnown.KNOWN
+        if not known and md5 is not None and self.knownHashes is not None:
+            known = md5 in self.knownHashes
+        if known:
+            with self.lock:
+                self.skippedCount += 1
+                self.skippedBytes += file.getSize()
+        return known
+
+    def close(self):
+        if self.knownHashes is not None:
+            self.knownHashes.close()
+
+
+# Files in this job that share a content hash. The first file claimed with a hash is the
+# one that gets carved, every later file with the same hash is given the same carved images.
+# sharedCount is the number of carved files that had later copies, avoidedCount the number
+# of copies.
+class DuplicateIndex(object):
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.sharedCount = 0
+        self.avoidedCount = 0
+        self.avoidedBytes = 0
+
+    # Returns True if file should be carved, False if a file with the same content already is.
+    def claim(self, file, md5):
+        if md5 is None:
+            return True
+        with self.lock:
+            entry = self.entries.get(md5)
+            if entry is None:
+                self.entries[md5] = DuplicateEntry(file.getId())
+                return True
+            if entry.leaderId == file.getId():
+                return True
+            if not entry.shared:
+                entry.shared = True
+                self.sharedCount += 1
+            self.avoidedCount += 1
+            self.avoidedBytes += file.getSize()
+            return False
+
+    def get(self, md5):
+        with self.lock:
+            return self.entries.get(md5)
+
+
+# The file being carved for one content hash and, once it is committed, its carved images
+# as (name, relative path, local path, offset). Followers wait here until then.
+class DuplicateEntry(object):
+
+    def __init__(self, leaderId):
+        self.leaderId = leaderId
+        self.shared = False
+        self.carved = None
+        self.failed = False
+        self.followers = []
+
+
+# Runs export and carving for several files at once. Work is handed over through a bounded
+# queue so the ingest thread never gets far ahead of the workers, and results come back on
+# a second queue to be committed by the ingest thread.
+class CarvingWorkerPool(object):
+
+    def __init__(self, module, numWorkers):
+        self.module = module
+        self.context = module.context
+        self.pending = 0
+        self.workQueue = Queue.Queue(numWorkers * 2)
+        self.resultQueue = Queue.Queue()
+        self.threads = []
+        for i in range(numWorkers):
+            thread = threading.Thread(target=self.run, name="FileCarver-worker-" + str(i))
+            thread.setDaemon(True)
+            thread.start()
+            self.threads.append(thread)
+
+    def run(self):
+        while True:
+            item = self.workQueue.get()
+            if item is None:
+                return
+            results = [CarveResult(file, None) for file in item]
+            if not self.context.isJobCancelled():
+                try:
+                    results = self.module.carveEntries(item)
+                except:
+                    self.module.log(Level.SEVERE, "Error carving file " + item[0].getName() + " ==> " + str(sys.exc_info()[1]))
+                    results = [CarveResult(file, FAILED) for file in item]
+            for result in results:
+                self.resultQueue.put(result)
+
+    # Queue a list of files to be carved together, waiting for room.
+    # Returns False if the job was cancelled while waiting.
+    def submit(self, entries):
+        while True:
+            try:
+                self.workQueue.put(entries, True, 0.5)
+                self.pending += len(entries)
+                return True
+            except Queue.Full:
+                if self.context.isJobCancelled():
+                    return False
+
+    # Results that are ready; with wait=True blocks briefly for at least one.
+    def completed(self, wait=False):
+        results = []
+        try:
+            if wait:
+                results.append(self.resultQueue.get(True, 0.5))
+            while True:
+                results.append(self.resultQueue.get_nowait())
+        except Queue.Empty:
+            pass
+        self.pending -= len(results)
+        return results
+
+    # Drop queued work, stop the workers once they finish what they are doing and wait for
+    # them. Returns the results they finished that completed() has not handed out yet.
+    def shutdown(self):
+        try:
+            while True:
+                self.workQueue.get_nowait()
+        except Queue.Empty:
+            pass
+        for thread in self.threads:
+            self.workQueue.put(None)
+        for thread in self.threads:
+            thread.join()
+        return self.completed()
+
+
+# Adds carved images to the case. Only ever called from the ingest thread, so all writes
+# to the case database and the blackboard are serialized. Parent files with images are
+# queued and written in batches of at least batchSize derived files; flush() must be
+# called at the end of the job.
+class CarvedFileCommitter(object):
+
+    log = _log
+
+    def __init__(self, skCase, moduleName, relativeModulepath, carverName, carverVersion, manifest, configFingerprint, duplicates, batchSize, metrics, store, limits):
+        self.skCase = skCase
+        self.moduleName = moduleName
+        self.relativeModulepath = relativeModulepath
+        self.carverName = carverName
+        self.carverVersion = carverVersion
+        self.manifest = manifest
+        self.configFingerprint = configFingerprint
+        self.duplicates = duplicates
+        self.batchSize = batchSize
+        self.metrics = metrics
+        self.store = store
+        self.limits = limits
+        self.verbose = _logger.isLoggable(Level.FINE)
+        self.useTransactions = True
+        self.queued = []
+        self.queuedCount = 0
+        self.extractCount = 0
+        self.partialCount = 0
+
+    def commit(self, result):
+        if result.state is None or result.state == KNOWN:
+            return
+        if result.state == DUPLICATE:
+            entry = self.duplicates.get(result.md5)
+            if entry.carved is None and not entry.failed:
+                entry.followers.append(result)
+            else:
+                self.commitDuplicate(result, entry)
+            return
+
+        file = result.file
+        carved = []
+        if result.state in (COMPLETE, PARTIAL):
+            # Images identical to one already stored point at the stored copy
+            for extractfile in result.extractedfiles:
+                stored = result.paths[extractfile]
+                carved.append((extractfile, os.path.join(self.relativeModulepath, stored), self.store.local_path(stored), result.offsets.get(extractfile)))
+            if result.state == PARTIAL:
+                self.partialCount += 1
+            self.addCarvedFiles(file, result.md5, carved, result.state)
+        else:
+            self.manifest.record(file.getId(), file.getSize(), result.md5 or file.getMd5Hash(), self.configFingerprint, result.state)
+
+        # Hand the same images to any files with identical content that were waiting on this one
+        entry = None
+        md5 = result.md5 or file.getMd5Hash()
+        if self.duplicates is not None and md5 is not None:
+            entry = self.duplicates.get(md5)
+        if entry is not None and entry.leaderId == file.getId():
+            entry.carved = carved
+            entry.failed = result.state != COMPLETE
+            for follower in entry.followers:
+                self.commitDuplicate(follower, entry)
+            entry.followers = []
+
+    def commitDuplicate(self, result, entry):
+        if entry.failed:
+            self.manifest.record(result.file.getId(), result.file.getSize(), result.md5, self.configFingerprint, FAILED)
+        else:
+            self.addCarvedFiles(result.file, result.md5, entry.carved)
+
+    # Add (name, relative path, local path, offset) images as derived files of file and record it
+    # in the manifest as complete, or as partial if it was cut short by a limit. Images an
+    # earlier run added before a limit stopped it are not added again.
+    def addCarvedFiles(self, file, md5, carved, state=COMPLETE):
+        md5 = md5 or file.getMd5Hash()
+        previous = self.manifest.partial_carves(file.getId(), file.getSize(), self.configFingerprint)
+        if len(previous[0]) > 0:
+            carved = [image for image in carved if image[0] not in previous[0]]
+        if len(carved) == 0:
+            self.recordCarved(file, md5, state, previous, [], [])
+            return
+        self.extractCount += len(carved)
+        self.queued.append((file, md5, carved, state, previous))
+        self.queuedCount += len(carved)
+        if self.queuedCount >= self.batchSize:
+            self.flush()
+
+    # Record the file in the manifest with the names and ids of its derived files, those
+    # from an earlier partial run included.
+    def recordCarved(self, file, md5, state, previous, carved, derivedFiles):
+        previousNames, previousIds = previous
+        self.manifest.record(file.getId(), file.getSize(), md5, self.configFingerprint, state,
+                             previousIds + [d.getId() for d in derivedFiles],
+                             previousNames + [image[0] for image in carved],
+                             self.limits if state == PARTIAL else None)
+
+    # Write everything queued: derived files in one case database transaction, then the
+    # artifacts, posted to the blackboard together, then one content event per parent file.
+    def flush(self):
+        if len(self.queued) == 0:
+            return
+        queued = self.queued
+        self.queued = []
+        self.queuedCount = 0
+
+        with self.metrics.stage("commit"):
+            derived = self.addDerivedFiles(queued)
+
+        with self.metrics.stage("artifacts"):
+            artifacts = []
+            for file, md5, carved, state, previous in queued:
+                # Make an artifact on the blackboard.  TSK_INTERESTING_FILE_HIT is a generic type of
+                # artfiact.  Refer to the developer docs for other examples.
+                art = file.newArtifact(BlackboardArtifact.ARTIFACT_TYPE.TSK_INTERESTING_FILE_HIT)
+                att = BlackboardAttribute(BlackboardAttribute.ATTRIBUTE_TYPE.TSK_SET_NAME, CarverFilesIngestModuleFactory.moduleName, "New Carved Data and Sqlite Files")
+                art.addAttribute(att)
+                artifacts.append(art)
+            try:
+                # index the artifacts for keyword search
+                self.skCase.getBlackboard().postArtifacts(artifacts, self.moduleName)
+            except Blackboard.BlackboardException as e:
+                self.log(Level.SEVERE, "Error indexing " + str(len(artifacts)) + " artifacts")
+
+        for (file, md5, carved, state, previous), derivedFiles in zip(queued, derived):
+            # One event per parent is enough for the tree to pick up all of its new children
+            IngestServices.getInstance().fireModuleContentEvent(ModuleContentEvent(derivedFiles[0]))
+            self.recordCarved(file, md5, state, previous, carved, derivedFiles)
+
+    # Add the derived files for every queued parent, returning a list of them per parent.
+    # Uses a single CaseDbTransaction where the Sleuth Kit version supports it.
+    def addDerivedFiles(self, queued):
+        if self.useTransactions:
+            transaction = self.skCase.beginTransaction()
+            try:
+                derived = []
+                for file, md5, carved, state, previous in queued:
+                    derived.append([self.addDerivedFile(file, extractfile, relativelocal_file, local_file, offset, transaction)
+                                    for extractfile, relativelocal_file, local_file, offset in carved])
+                transaction.commit()
+                return derived
+            except TypeError:
+                # No transaction overload of addDerivedFile in this Sleuth Kit version
+                transaction.rollback()
+                self.useTransactions = False
+                self.log(Level.INFO, "addDerivedFile does not take a transaction, adding derived files one at a time")
+            except:
+                transaction.rollback()
+                raise
+        return [[self.addDerivedFile(file, extractfile, relativelocal_file, local_file, offset)
+                 for extractfile, relativelocal_file, local_file, offset in carved]
+                for file, md5, carved, state, previous in queued]
+
+    # The offset an image was carved from is kept in the derived file's rederive details,
+    # along with its offset in the image when the parent maps onto it.
+    def addDerivedFile(self, file, extractfile, relativelocal_file, local_file, offset=None, transaction=None):
+        if self.verbose:
+            self.log(Level.FINE, " File Name is ==> " + extractfile)
+            self.log(Level.FINE, " Local File Name is ==> " + local_file)
+        details = ""
+        if offset is not None:
+            details = "offset=" + str(offset)
+            try:
+                details += " image_offset=" + str(file.convertToImgOffset(offset))
+            except:
+                pass
+        if transaction is None:
+            return self.skCase.addDerivedFile(extractfile, relativelocal_file, os.path.getsize(local_file), 0, 0, 0, 0, True, file, details, self.carverName, self.carverVersion, "", TskData.EncodingType.NONE)
+        return self.skCase.addDerivedFile(extractfile, relativelocal_file, os.path.getsize(local_file), 0, 0, 0, 0, True, file, details, self.carverName, self.carverVersion, "", TskData.EncodingType.NONE, transaction)
+
+# What the copies of the file-level module in one ingest job share. Autopsy runs a copy of
+# a file ingest module on each of its file ingest threads; they find this by job id. carver
+# is a CarverFilesIngestModule started up once for the job, whose carving methods are
+# already safe to call from several threads. The committer and the counts are only used
+# under lock. The first copy to start up creates the job, the last to shut down finishes it.
+class FileCarvingJob(object):
+
+    jobs = {}
+    jobsLock = threading.Lock()
+
+    def __init__(self, carver):
+        self.carver = carver
+        self.committer = carver.startOutput()
+        self.lock = threading.Lock()
+        self.modules = 0
+        self.fileCount = 0
+        self.skippedCount = 0
+
+    # The job for context, created and started up with settings by the first caller.
+    @classmethod
+    def join(cls, context, settings):
+        with cls.jobsLock:
+            job = cls.jobs.get(context.getJobId())
+            if job is None:
+                carver = CarverFilesIngestModule(settings)
+                carver.startUp(context)
+                job = FileCarvingJob(carver)
+                cls.jobs[context.getJobId()] = job
+            job.modules += 1
+            return job
+
+    # Called by each copy as it shuts down. The last one adds whatever is still queued to
+    # the case and posts the summary.
+    @classmethod
+    def leave(cls, context):
+        with cls.jobsLock:
+            job = cls.jobs[context.getJobId()]
+            job.modules -= 1
+            if job.modules > 0:
+                return
+            del cls.jobs[context.getJobId()]
+        with job.lock:
+            job.committer.flush()
+            job.carver.postSummary(context.getDataSource().getId(), job.committer, job.fileCount, job.skippedCount)
+        job.carver.shutDown()
+
+    def commit(self, results, skipped=False):
+        with self.lock:
+            for result in results:
+                self.committer.commit(result)
+            self.fileCount += 1
+            if skipped:
+                self.skippedCount += 1
+
+# File-level ingest module, used when the file pipeline option is on. Each qualifying file
+# is carved as it passes through Autopsy's file ingest pipeline, using the mime type found
+# for it earlier in the pipeline, so carving runs alongside the rest of ingest on
+# Autopsy's own file ingest threads instead of waiting for the whole data source.
+class CarverFilesFileIngestModule(FileIngestModule):
+
+    log = _log
+
+    def __init__(self, settings):
+        self.context = None
+        self.local_settings = settings
+        self.job = None
+        self.detector = None
+
+    def startUp(self, context):
+        self.context = context
+        if self.local_settings.getSetting('File_Pipeline') != 'true':
+            return
+        # With nothing selected the data source module reports the problem
+        if not [name for name in ('Default_Mime_Types', 'All_Mime_Types', 'Include_Slack_Space') if self.local_settings.getSetting(name) == 'true']:
+            return
+        self.job = FileCarvingJob.join(context, self.local_settings)
+        # Files reach this module before File Type Identification if it comes later in the
+        # pipeline; those are typed here
+        if self.local_settings.getSetting('All_Mime_Types') != 'true':
+            try:
+                self.detector = FileTypeDetector()
+            except:
+                self.log(Level.WARNING, "Unable to create a file type detector ==> " + str(sys.exc_info()[1]))
+
+    def process(self, file):
+        if self.job is None:
+            return IngestModule.ProcessResult.OK
+        carver = self.job.carver
+        if not carver.isCarvable(file, self.detector):
+            return IngestModule.ProcessResult.OK
+
+        if carver.manifest.is_complete(file.getId(), file.getSize(), file.getMd5Hash(), carver.configFingerprint, carver.limitsFingerprint):
+            self.job.commit([], True)
+            return IngestModule.ProcessResult.OK
+        if carver.isKnown(file, file.getMd5Hash()):
+            self.job.commit([])
+            return IngestModule.ProcessResult.OK
+        if carver.isDuplicate(file, file.getMd5Hash()):
+            result = CarveResult(file, DUPLICATE)
+            result.md5 = file.getMd5Hash()
+            self.job.commit([result])
+            return IngestModule.ProcessResult.OK
+        try:
+            results = carver.carveEntries([file])
+        except:
+            self.log(Level.SEVERE, "Error carving file " + file.getName() + " ==> " + str(sys.exc_info()[1]))
+            self.job.commit([CarveResult(file, FAILED)])
+            return IngestModule.ProcessResult.ERROR
+        self.job.commit(results)
+        return IngestModule.ProcessResult.OK
+
+    def shutDown(self):
+        if self.job is not None:
+            FileCarvingJob.leave(self.context)
+
 class NEWProcess_AmcacheWithUISettingsPanel(IngestModuleIngestJobSettingsPanel):
     # Note, we can't use a self.settings instance variable.
     # Rather, self.local_settings is used.
@@ -401,6 +1554,42 @@ class NEWProcess_AmcacheWithUISettingsPanel(IngestModuleIngestJobSettingsPanel):
             self.local_settings.setSetting('Include_Slack_Space', 'true')
         else:
             self.local_settings.setSetting('Include_Slack_Space', 'false')
+        if self.checkbox3.isSelected():
+            self.local_settings.setSetting('Native_Carver', 'true')
+        else:
+            self.local_settings.setSetting('Native_Carver', 'false')
+        if self.checkbox4.isSelected():
+            self.local_settings.setSetting('Batch_Small_Files', 'true')
+        else:
+            self.local_settings.setSetting('Batch_Small_Files', 'false')
+        if self.checkbox5.isSelected():
+            self.local_settings.setSetting('Deduplicate_Files', 'true')
+        else:
+            self.local_settings.setSetting('Deduplicate_Files', 'false')
+        if self.checkbox6.isSelected():
+            self.local_settings.setSetting('Skip_Known_Files', 'true')
+        else:
+            self.local_settings.setSetting('Skip_Known_Files', 'false')
+        if self.checkbox7.isSelected():
+            self.local_settings.setSetting('Carve_Unallocated', 'true')
+        else:
+            self.local_settings.setSetting('Carve_Unallocated', 'false')
+        if self.checkbox8.isSelected():
+            self.local_settings.setSetting('File_Pipeline', 'true')
+        else:
+            self.local_settings.setSetting('File_Pipeline', 'false')
+        self.local_settings.setSetting('Worker_Threads', self.workerCombo.getSelectedItem())
+        self.local_settings.setSetting('Commit_Batch_Size', self.commitCombo.getSelectedItem())
+        self.local_settings.setSetting('File_Time_Limit', self.timeLimitCombo.getSelectedItem())
+        self.local_settings.setSetting('File_MB_Limit', self.sizeLimitCombo.getSelectedItem())
+        self.local_settings.setSetting('Carve_Order', self.orderCombo.getSelectedItem())
+
+    def onClickHashList(self, event):
+        chooseFile = JFileChooser()
+        if chooseFile.showOpenDialog(self.panel1) == JFileChooser.APPROVE_OPTION:
+            hashListPath = chooseFile.getSelectedFile().getCanonicalPath()
+            self.local_settings.setSetting('Known_Hash_List', hashListPath)
+            self.hashListLabel.setText(hashListPath)
 
 
     # TODO: Update this for your UI
@@ -419,6 +1608,24 @@ class NEWProcess_AmcacheWithUISettingsPanel(IngestModuleIngestJobSettingsPanel):
         self.checkbox = JCheckBox("Default Mime Types Files", actionPerformed=self.checkBoxEvent)
         self.checkbox1 = JCheckBox("All Mime Types Files", actionPerformed=self.checkBoxEvent)
         self.checkbox2 = JCheckBox("Include Slack Space Of Files", actionPerformed=self.checkBoxEvent)
+        self.checkbox3 = JCheckBox("Use In-Process Carver Instead Of Foremost", actionPerformed=self.checkBoxEvent)
+        self.checkbox4 = JCheckBox("Batch Small Files Into One Foremost Run", actionPerformed=self.checkBoxEvent)
+        self.checkbox5 = JCheckBox("Carve Identical Files Only Once", actionPerformed=self.checkBoxEvent)
+        self.checkbox6 = JCheckBox("Skip Known Files (Hash Lookup / Known Hash List)", actionPerformed=self.checkBoxEvent)
+        self.checkbox7 = JCheckBox("Carve Unallocated And Unused Space", actionPerformed=self.checkBoxEvent)
+        self.checkbox8 = JCheckBox("Carve Files As They Are Ingested (File Pipeline)", actionPerformed=self.checkBoxEvent)
+        self.hashListButton = JButton("Known Hash List (NSRL or MD5 list)", actionPerformed=self.onClickHashList)
+        self.hashListLabel = JLabel(" ")
+        self.label6 = JLabel("Carving Worker Threads")
+        self.workerCombo = JComboBox(["1", "2", "4", "8", "16", "32"], actionPerformed=self.checkBoxEvent)
+        self.label7 = JLabel("Derived Files Per Database Transaction")
+        self.commitCombo = JComboBox(["1", "50", "200", "1000", "5000"], actionPerformed=self.checkBoxEvent)
+        self.label8 = JLabel("Time Limit Per File In Seconds (0 = None)")
+        self.timeLimitCombo = JComboBox(["0", "60", "300", "900", "3600", "14400"], actionPerformed=self.checkBoxEvent)
+        self.label9 = JLabel("MB Read Per File (0 = All)")
+        self.sizeLimitCombo = JComboBox(["0", "1024", "10240", "102400"], actionPerformed=self.checkBoxEvent)
+        self.label10 = JLabel("Carving Order")
+        self.orderCombo = JComboBox([ORDER_OBJECT_ID, ORDER_SMALL_FIRST, ORDER_INTERLEAVE], actionPerformed=self.checkBoxEvent)
         self.panel1.add(self.label1)
         self.panel1.add(self.label2)
         self.panel1.add(self.label3)
@@ -427,6 +1634,24 @@ class NEWProcess_AmcacheWithUISettingsPanel(IngestModuleIngestJobSettingsPanel):
         self.panel1.add(self.checkbox)
         self.panel1.add(self.checkbox1)
         self.panel1.add(self.checkbox2)
+        self.panel1.add(self.checkbox3)
+        self.panel1.add(self.checkbox4)
+        self.panel1.add(self.checkbox5)
+        self.panel1.add(self.checkbox6)
+        self.panel1.add(self.hashListButton)
+        self.panel1.add(self.hashListLabel)
+        self.panel1.add(self.checkbox7)
+        self.panel1.add(self.checkbox8)
+        self.panel1.add(self.label6)
+        self.panel1.add(self.workerCombo)
+        self.panel1.add(self.label7)
+        self.panel1.add(self.commitCombo)
+        self.panel1.add(self.label8)
+        self.panel1.add(self.timeLimitCombo)
+        self.panel1.add(self.label9)
+        self.panel1.add(self.sizeLimitCombo)
+        self.panel1.add(self.label10)
+        self.panel1.add(self.orderCombo)
         self.add(self.panel1)
 		
 
@@ -436,6 +1661,26 @@ class NEWProcess_AmcacheWithUISettingsPanel(IngestModuleIngestJobSettingsPanel):
         self.checkbox.setSelected(self.local_settings.getSetting('Default_Mime_Types') == 'true')
         self.checkbox1.setSelected(self.local_settings.getSetting('All_Mime_Types') == 'true')
         self.checkbox2.setSelected(self.local_settings.getSetting('Include_Slack_Space') == 'true')
+        self.checkbox3.setSelected(self.local_settings.getSetting('Native_Carver') == 'true')
+        self.checkbox4.setSelected(self.local_settings.getSetting('Batch_Small_Files') == 'true')
+        self.checkbox5.setSelected(self.local_settings.getSetting('Deduplicate_Files') == 'true')
+        self.checkbox6.setSelected(self.local_settings.getSetting('Skip_Known_Files') == 'true')
+        self.checkbox7.setSelected(self.local_settings.getSetting('Carve_Unallocated') == 'true')
+        self.checkbox8.setSelected(self.local_settings.getSetting('File_Pipeline') == 'true')
+        if self.local_settings.getSetting('Known_Hash_List'):
+            self.hashListLabel.setText(self.local_settings.getSetting('Known_Hash_List'))
+        if self.local_settings.getSetting('Worker_Threads') is not None:
+            self.workerCombo.setSelectedItem(self.local_settings.getSetting('Worker_Threads'))
+        if self.local_settings.getSetting('Commit_Batch_Size') is not None:
+            self.commitCombo.setSelectedItem(self.local_settings.getSetting('Commit_Batch_Size'))
+        else:
+            self.commitCombo.setSelectedItem(str(COMMIT_BATCH_SIZE))
+        if self.local_settings.getSetting('File_Time_Limit') is not None:
+            self.timeLimitCombo.setSelectedItem(self.local_settings.getSetting('File_Time_Limit'))
+        if self.local_settings.getSetting('File_MB_Limit') is not None:
+            self.sizeLimitCombo.setSelectedItem(self.local_settings.getSetting('File_MB_Limit'))
+        if self.local_settings.getSetting('Carve_Order') is not None:
+            self.orderCombo.setSelectedItem(self.local_settings.getSetting('Carve_Order'))
 
     # Return the settings used
     def getSettings(self):
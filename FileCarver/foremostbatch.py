@@ -0,0 +1,68 @@
+# Helpers for running foremost once over many small files.
+#
+# The files are packed back to back into one batch file. BatchOffsetMap remembers where
+# each one starts so that the offsets foremost writes to audit.txt can be mapped back to
+# the parent file and the offset inside it. A carve that starts in one file and runs into
+# the next is not an image of either, so it is discarded rather than attributed. foremost
+# carries on after the end of that carve, so spanned() says which files it ran over and
+# so were never fully looked at.
+#
+# This is free and unencumbered software released into the public domain.
+
+import bisect
+import re
+
+# 0:	00000012.jpg 	      12 KB 	       6144 	 (comment)
+_AUDIT_LINE = re.compile(r"^\s*(\d+):\s+(\S+)\s+(\d+(?:\.\d+)?\s+\S+)\s+(\d+)")
+
+
+class BatchOffsetMap(object):
+
+    def __init__(self):
+        self.size = 0
+        self._starts = []
+        self._ends = []
+        self._owners = []
+
+    def __len__(self):
+        return len(self._owners)
+
+    # Record that 'length' bytes belonging to 'owner' were appended to the batch.
+    def append(self, length, owner):
+        self._starts.append(self.size)
+        self._ends.append(self.size + length)
+        self._owners.append(owner)
+        self.size += length
+        return self._starts[-1]
+
+    # Map a carve of 'length' bytes at batch offset 'offset' to (owner, local offset).
+    # Returns None when the carve is not wholly inside one file.
+    def locate(self, offset, length):
+        i = bisect.bisect_right(self._starts, offset) - 1
+        if i < 0 or offset + length > self._ends[i]:
+            return None
+        return self._owners[i], offset - self._starts[i]
+
+    # The owners of every file a carve of 'length' bytes at batch offset 'offset' runs over.
+    def spanned(self, offset, length):
+        owners = []
+        for i in range(max(bisect.bisect_right(self._starts, offset) - 1, 0), len(self._owners)):
+            if self._starts[i] >= offset + length:
+                break
+            if self._ends[i] > max(offset, self._starts[i]):
+                owners.append(self._owners[i])
+        return owners
+
+    def owners(self):
+        return list(self._owners)
+
+
+# Return (file name, batch offset) for every file listed in a foremost audit.txt.
+def parse_audit(path):
+    carves = []
+    with open(path, "r") as audit:
+        for line in audit:
+            match = _AUDIT_LINE.match(line)
+            if match:
+                carves.append((match.group(2), int(match.group(4))))
+    return carves
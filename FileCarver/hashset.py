@@ -0,0 +1,162 @@
+# Known file hash set for the FileCarver module.
+#
+# A hash list (an NSRL style NSRLFile.txt, or any text file with one MD5 per line such as
+# md5sum output) is turned once into a sorted binary index of 16 byte MD5s. The index is
+# saved in a folder of the case rather than next to the list, which may be on read only
+# media, and named after the list's path so every list gets its own. Later jobs open the
+# index directly, rebuilding it when the list has changed since. Only the first MD5 of every block is held in
+# memory, so a lookup is a bisect plus one block read and memory use stays small even
+# for the full NSRL set.
+#
+# This is free and unencumbered software released into the public domain.
+
+import binascii
+import bisect
+import csv
+import hashlib
+import heapq
+import itertools
+import os
+import threading
+
+INDEX_SUFFIX = ".md5idx"
+
+_KEY_SIZE = 16
+_BLOCK_KEYS = 4096
+_RUN_KEYS = 1000000
+_HEX = set("0123456789abcdefABCDEF")
+
+# Jobs running in parallel that use the same list build its index only once
+_build_lock = threading.Lock()
+
+
+def _is_md5(text):
+    return len(text) == 32 and all(c in _HEX for c in text)
+
+
+# Yield the MD5s in a hash list as lower case hex. NSRL files are recognised by their
+# header line; anything else is read as one hash per line, first token only.
+def read_hash_list(path):
+    with open(path, "r") as hash_list:
+        first = hash_list.readline()
+        if "MD5" in first.upper() and "," in first:
+            header = next(csv.reader([first]))
+            column = [name.strip().upper() for name in header].index("MD5")
+            for row in csv.reader(hash_list):
+                if len(row) > column and _is_md5(row[column].strip()):
+                    yield row[column].strip().lower()
+            return
+        for line in itertools.chain([first], hash_list):
+            fields = line.split()
+            if fields and _is_md5(fields[0]):
+                yield fields[0].lower()
+
+
+def _write_run(keys, path):
+    keys.sort()
+    with open(path, "wb") as run:
+        for key in keys:
+            run.write(key)
+
+
+def _read_run(path):
+    with open(path, "rb") as run:
+        while True:
+            key = run.read(_KEY_SIZE)
+            if len(key) < _KEY_SIZE:
+                return
+            yield key
+
+
+# Build the sorted, de-duplicated binary index for a hash list. Hashes are sorted in runs
+# of a million and the runs merged, so building does not need the whole list in memory.
+def build_index(source_path, index_path):
+    runs = []
+    keys = []
+    try:
+        for md5 in read_hash_list(source_path):
+            keys.append(binascii.unhexlify(md5))
+            if len(keys) >= _RUN_KEYS:
+                runs.append(index_path + ".run%d" % len(runs))
+                _write_run(keys, runs[-1])
+                keys = []
+        temp_path = index_path + ".tmp"
+        with open(temp_path, "wb") as index:
+            previous = None
+            keys.sort()
+            for key in heapq.merge(keys, *[_read_run(run) for run in runs]):
+                if key != previous:
+                    index.write(key)
+                    previous = key
+        if os.path.exists(index_path):
+            os.remove(index_path)
+        os.rename(temp_path, index_path)
+    finally:
+        for run in runs:
+            if os.path.exists(run):
+                os.remove(run)
+
+
+# Where the index of the hash list at source_path is kept in index_dir: the list's name,
+# for whoever looks in the folder, and a hash of its full path, so lists with the same
+# name in different folders don't share an index.
+def index_path_for(source_path, index_dir):
+    full_path = os.path.normcase(os.path.abspath(source_path))
+    if not isinstance(full_path, bytes):
+        full_path = full_path.encode("utf-8")
+    key = hashlib.md5(full_path).hexdigest()[:12]
+    return os.path.join(index_dir, "%s-%s%s" % (os.path.basename(source_path), key, INDEX_SUFFIX))
+
+
+class KnownHashSet(object):
+
+    def __init__(self, index_path):
+        self.index_path = index_path
+        self._lock = threading.Lock()
+        self._file = open(index_path, "rb")
+        self.count = os.path.getsize(index_path) // _KEY_SIZE
+        self._fences = []
+        for block in range(0, self.count, _BLOCK_KEYS):
+            self._file.seek(block * _KEY_SIZE)
+            self._fences.append(self._file.read(_KEY_SIZE))
+
+    # Open the index for a hash list kept in index_dir, building it first if it is missing
+    # or older than the list.
+    @classmethod
+    def load(cls, source_path, index_dir):
+        index_path = index_path_for(source_path, index_dir)
+        with _build_lock:
+            if not os.path.exists(index_dir):
+                os.makedirs(index_dir)
+            if not os.path.exists(index_path) or os.path.getmtime(index_path) < os.path.getmtime(source_path):
+                build_index(source_path, index_path)
+        return cls(index_path)
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, md5):
+        if md5 is None or not _is_md5(md5):
+            return False
+        key = binascii.unhexlify(md5)
+        block = bisect.bisect_right(self._fences, key) - 1
+        if block < 0:
+            return False
+        with self._lock:
+            self._file.seek(block * _BLOCK_KEYS * _KEY_SIZE)
+            data = self._file.read(_BLOCK_KEYS * _KEY_SIZE)
+        low = 0
+        high = len(data) // _KEY_SIZE
+        while low < high:
+            middle = (low + high) // 2
+            probe = data[middle * _KEY_SIZE:(middle + 1) * _KEY_SIZE]
+            if probe < key:
+                low = middle + 1
+            elif probe > key:
+                high = middle
+            else:
+                return True
+        return False
+
+    def close(self):
+        self._file.close()
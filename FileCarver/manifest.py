@@ -0,0 +1,112 @@
+# Persistent record of which files the FileCarver module has already carved.
+#
+# The manifest lives in the Carved-Foremost folder of the case and holds one JSON record
+# per parent file: its size, content hash, a fingerprint of the carver configuration,
+# whether carving completed, and the ids and names of the derived files that were added.
+# On a rerun, a file whose record is complete and still matches is skipped with a
+# dictionary lookup. So is a file that was only partly carved because of a time or size
+# limit, as long as the limits are the same. When the limits have changed and the file is
+# carved again, the images it already has are not added a second time.
+#
+# Records are appended as JSON lines and the last record for a file wins, so an
+# interrupted job never loses what it had already finished. The file is compacted when
+# it is loaded.
+#
+# This is free and unencumbered software released into the public domain.
+
+import json
+import os
+import threading
+
+MANIFEST_NAME = "carve-manifest.jsonl"
+
+COMPLETE = "complete"
+PARTIAL = "partial"
+FAILED = "failed"
+
+_open_manifests = {}
+_open_lock = threading.Lock()
+
+
+# Return the manifest for 'directory', shared by every ingest job in this process so
+# parallel data source jobs append to the same file safely.
+def get_manifest(directory):
+    path = os.path.join(directory, MANIFEST_NAME)
+    with _open_lock:
+        manifest = _open_manifests.get(path)
+        if manifest is None:
+            manifest = CarveManifest(path)
+            _open_manifests[path] = manifest
+        return manifest
+
+
+class CarveManifest(object):
+
+    def __init__(self, path):
+        self.path = path
+        self.records = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        lines = 0
+        if os.path.exists(self.path):
+            with open(self.path, "r") as manifest:
+                for line in manifest:
+                    lines += 1
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # A line cut short by a crash; anything after it is still usable
+                        continue
+                    self.records[record["id"]] = record
+        if lines > len(self.records):
+            self._compact()
+
+    def _compact(self):
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w") as manifest:
+            for record in self.records.values():
+                manifest.write(json.dumps(record, sort_keys=True) + "\n")
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        os.rename(temp_path, self.path)
+
+    # True when the file was completely carved before with the same size, hash and
+    # configuration, or carved as far as the same per file 'limits' allowed. A missing hash
+    # on either side is not treated as a mismatch since Autopsy only has one once the hash
+    # lookup module has run.
+    def is_complete(self, file_id, size, md5, fingerprint, limits=None):
+        record = self.records.get(file_id)
+        if record is None:
+            return False
+        if record["state"] == PARTIAL:
+            if limits is None or record.get("limits") != limits:
+                return False
+        elif record["state"] != COMPLETE:
+            return False
+        if record["size"] != size or record["config"] != fingerprint:
+            return False
+        return md5 is None or record.get("md5") is None or record["md5"] == md5
+
+    def get(self, file_id):
+        return self.records.get(file_id)
+
+    # Names and derived file ids of the images already added for a file that an earlier run
+    # only partly carved, with the same size and configuration. Empty lists otherwise.
+    def partial_carves(self, file_id, size, fingerprint):
+        record = self.records.get(file_id)
+        if record is None or record["state"] != PARTIAL or record["size"] != size or record["config"] != fingerprint:
+            return [], []
+        return list(record.get("carved", [])), list(record["derived"])
+
+    def record(self, file_id, size, md5, fingerprint, state, derived_ids=None, carved=None, limits=None):
+        record = {"id": file_id, "size": size, "md5": md5, "config": fingerprint,
+                  "state": state, "derived": list(derived_ids or []), "carved": list(carved or []),
+                  "limits": limits}
+        line = json.dumps(record, sort_keys=True) + "\n"
+        with self._lock:
+            self.records[file_id] = record
+            with open(self.path, "a") as manifest:
+                manifest.write(line)
+        return record
@@ -0,0 +1,117 @@
+# Timing and throughput figures for the FileCarver module.
+#
+# Each stage of a job (database query, export to the temp folder, foremost, in-process
+# carving, moving output, database commit) is timed with
+#
+#   with metrics.stage("export"):
+#       ...
+#
+# and byte counters, carves per type and the slowest files are gathered alongside. The
+# carving workers update the same object as the ingest thread, so every update is made
+# under a lock. summary() gives lines for the ingest inbox and write_report() saves all
+# the figures as JSON.
+#
+# This is free and unencumbered software released into the public domain.
+
+import heapq
+import json
+import threading
+import time
+
+# Number of slowest files kept for the report
+SLOWEST_FILES = 10
+
+_MB = 1024.0 * 1024.0
+
+
+class _StageTimer(object):
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.time()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.metrics.add_time(self.name, time.time() - self.started)
+        return False
+
+
+class CarveMetrics(object):
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.finished = None
+        self.stages = {}
+        self.counters = {}
+        self.carves = {}
+        self._slowest = []
+
+    def stage(self, name):
+        return _StageTimer(self, name)
+
+    def add_time(self, name, seconds):
+        with self._lock:
+            stage = self.stages.setdefault(name, {"count": 0, "seconds": 0.0})
+            stage["count"] += 1
+            stage["seconds"] += seconds
+
+    def count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def carved(self, extension, size):
+        with self._lock:
+            carves = self.carves.setdefault(extension, {"count": 0, "bytes": 0})
+            carves["count"] += 1
+            carves["bytes"] += size
+            self.counters["bytes_carved"] = self.counters.get("bytes_carved", 0) + size
+
+    # Note how long one file (or one batch of files) took, keeping the slowest few.
+    def file_done(self, file_id, name, size, seconds):
+        entry = (seconds, file_id, name, size)
+        with self._lock:
+            if len(self._slowest) < SLOWEST_FILES:
+                heapq.heappush(self._slowest, entry)
+            elif entry > self._slowest[0]:
+                heapq.heapreplace(self._slowest, entry)
+
+    def finish(self):
+        self.finished = time.time()
+
+    def elapsed(self):
+        return (self.finished or time.time()) - self.started
+
+    def to_dict(self):
+        with self._lock:
+            elapsed = self.elapsed()
+            bytes_read = self.counters.get("bytes_read", 0)
+            return {"elapsed_seconds": elapsed,
+                    "files_per_second": self.counters.get("files", 0) / elapsed if elapsed > 0 else 0.0,
+                    "mb_per_second": bytes_read / _MB / elapsed if elapsed > 0 else 0.0,
+                    "stages": dict((name, dict(stage)) for name, stage in self.stages.items()),
+                    "counters": dict(self.counters),
+                    "carves": dict((extension, dict(carves)) for extension, carves in self.carves.items()),
+                    "slowest_files": [{"id": file_id, "name": name, "size": size, "seconds": seconds}
+                                      for seconds, file_id, name, size in sorted(self._slowest, reverse=True)]}
+
+    # Human readable lines for the ingest inbox.
+    def summary(self):
+        report = self.to_dict()
+        lines = ["%d files, %.1f MB read in %.1f s (%.1f files/s, %.2f MB/s)" % (
+            report["counters"].get("files", 0), report["counters"].get("bytes_read", 0) / _MB,
+            report["elapsed_seconds"], report["files_per_second"], report["mb_per_second"])]
+        for name, stage in sorted(report["stages"].items(), key=lambda item: -item[1]["seconds"]):
+            lines.append("%s: %.1f s over %d calls" % (name, stage["seconds"], stage["count"]))
+        for extension, carves in sorted(report["carves"].items()):
+            lines.append("%s: %d images, %.1f MB" % (extension, carves["count"], carves["bytes"] / _MB))
+        for slow in report["slowest_files"][:3]:
+            lines.append("slow: %s (%d bytes) %.1f s" % (slow["name"], slow["size"], slow["seconds"]))
+        return lines
+
+    def write_report(self, path):
+        with open(path, "w") as report:
+            json.dump(self.to_dict(), report, indent=2, sort_keys=True)
@@ -0,0 +1,228 @@
+# Signature loading and matching for the FileCarver Autopsy module.
+#
+# foremost.conf is parsed into Signature objects and every header and footer of every
+# signature is compiled into one automaton, so a buffer is scanned once no matter how
+# many rules are enabled. Wildcards ('?' by default) are handled by building the
+# automaton lazily as a DFA over sets of partial matches: a state is the set of
+# (pattern, bytes matched so far) pairs that are still alive, and each transition is
+# worked out the first time it is needed and then cached.
+#
+# The matcher keeps its state between calls to feed(), so matches that straddle two
+# buffers are found without rescanning any overlap.
+#
+# Standalone use:
+#
+#   matcher = SignatureMatcher(load_foremost_conf("foremost.conf", ["jpg", "png"]))
+#   for offset, extension, kind, signature in matcher.feed(data):
+#       ...
+#
+# This is free and unencumbered software released into the public domain.
+
+HEADER = "header"
+FOOTER = "footer"
+
+# Foremost names its carvers by extension while the -t switch uses "jpeg"
+FOREMOST_TYPE_ALIASES = {"jpeg": "jpg"}
+
+_ESCAPES = {"n": 0x0a, "t": 0x09, "r": 0x0d, "a": 0x07, "b": 0x08,
+            "f": 0x0c, "v": 0x0b, "s": 0x20, "\\": 0x5c}
+
+# Longest run of a repeated byte skipped in one go when the automaton loops on itself
+_RUN_WINDOW = 64 * 1024
+
+
+# One header/footer rule from foremost.conf. header and footer are lists of byte
+# values where None is a wildcard position.
+class Signature(object):
+
+    def __init__(self, extension, case_sensitive, max_size, header, footer=None, action=None):
+        self.extension = extension
+        self.case_sensitive = case_sensitive
+        self.max_size = max_size
+        self.header = header
+        self.footer = footer or []
+        self.action = action
+
+    def __repr__(self):
+        return "Signature(%s, max_size=%d)" % (self.extension, self.max_size)
+
+
+# Turn a foremost.conf pattern such as \xff\xd8 or BM??\x00 into a list of byte
+# values, using None for every unescaped wildcard character.
+def decode_pattern(token, wildcard="?"):
+    values = []
+    i = 0
+    while i < len(token):
+        c = token[i]
+        if c == "\\" and i + 1 < len(token):
+            n = token[i + 1]
+            if n in "xX" and i + 4 <= len(token):
+                values.append(int(token[i + 2:i + 4], 16))
+                i += 4
+                continue
+            if n in _ESCAPES:
+                values.append(_ESCAPES[n])
+            else:
+                values.append(ord(n))
+            i += 2
+            continue
+        if c == wildcard:
+            values.append(None)
+        else:
+            values.append(ord(c))
+        i += 1
+    return values
+
+
+# Parse foremost.conf. Only the uncommented rules are returned, optionally limited to
+# the extensions in 'types' (foremost -t style names such as "jpeg" are accepted).
+def load_foremost_conf(path, types=None):
+    if types is not None:
+        types = set(FOREMOST_TYPE_ALIASES.get(t, t) for t in types)
+    wildcard = "?"
+    signatures = []
+    with open(path, "r") as conf:
+        for line in conf:
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            fields = line.split()
+            if fields[0] == "wildcard" and len(fields) > 1:
+                wildcard = fields[1]
+                continue
+            if len(fields) < 4:
+                continue
+            extension = fields[0]
+            if types is not None and extension not in types:
+                continue
+            footer = None
+            action = None
+            if len(fields) > 4:
+                if fields[4] in ("REVERSE", "NEXT", "ASCII"):
+                    action = fields[4]
+                else:
+                    footer = decode_pattern(fields[4], wildcard)
+                    if len(fields) > 5:
+                        action = fields[5]
+            signatures.append(Signature(extension, fields[1].lower() == "y", int(fields[2]),
+                                        decode_pattern(fields[3], wildcard), footer, action))
+    return signatures
+
+
+def _lower(value):
+    if value is not None and 0x41 <= value <= 0x5a:
+        return value + 0x20
+    return value
+
+
+# Multi-pattern matcher over all headers and footers of a list of signatures.
+class SignatureMatcher(object):
+
+    def __init__(self, signatures):
+        self.signatures = signatures
+        # Identical patterns (the three jpg rules share a footer) are compiled once
+        self._patterns = []
+        self._owners = []
+        seen = {}
+        for signature in signatures:
+            for kind, values in ((HEADER, signature.header), (FOOTER, signature.footer)):
+                if not values:
+                    continue
+                if not signature.case_sensitive:
+                    values = [_lower(value) for value in values]
+                key = (tuple(values), signature.case_sensitive)
+                if key not in seen:
+                    seen[key] = len(self._patterns)
+                    self._patterns.append(key)
+                    self._owners.append([])
+                self._owners[seen[key]].append((signature.extension, kind, signature))
+        self.max_length = max([len(values) for values, _ in self._patterns] or [0])
+
+        # Bytes that can start a pattern; anything else leaves the start state unchanged
+        first = bytearray(256)
+        for values, case_sensitive in self._patterns:
+            if values[0] is None:
+                first = bytearray(b"\x01" * 256)
+                break
+            first[values[0]] = 1
+            if not case_sensitive and 0x61 <= values[0] <= 0x7a:
+                first[values[0] - 0x20] = 1
+        self._first = bytes(first)
+
+        self._states = [()]
+        self._index = {(): 0}
+        self._delta = [[None] * 256]
+        self._output = [()]
+        self.reset()
+
+    # Forget any partial match and restart offsets at 'offset'.
+    def reset(self, offset=0):
+        self._state = 0
+        self._offset = offset
+
+    def _accepts(self, pattern, position, byte):
+        values, case_sensitive = self._patterns[pattern]
+        value = values[position]
+        if value is None:
+            return True
+        if case_sensitive:
+            return value == byte
+        return value == _lower(byte)
+
+    def _build(self, state, byte):
+        alive = []
+        for pattern, position in self._states[state]:
+            if position < len(self._patterns[pattern][0]) and self._accepts(pattern, position, byte):
+                alive.append((pattern, position + 1))
+        for pattern in range(len(self._patterns)):
+            if self._accepts(pattern, 0, byte):
+                alive.append((pattern, 1))
+        key = tuple(sorted(alive))
+        target = self._index.get(key)
+        if target is None:
+            target = len(self._states)
+            self._index[key] = target
+            self._states.append(key)
+            self._delta.append([None] * 256)
+            self._output.append(tuple(pattern for pattern, position in key
+                                      if position == len(self._patterns[pattern][0])))
+        self._delta[state][byte] = target
+        return target
+
+    # Scan the next piece of input. Returns (offset, extension, kind, signature) for every
+    # match that ends inside 'data', in the order the matches end; offset is the absolute
+    # position of the first byte of the match.
+    def feed(self, data):
+        buf = bytearray(data)
+        length = len(buf)
+        mask = buf.translate(self._first)
+        base = self._offset
+        state = self._state
+        delta = self._delta
+        output = self._output
+        hits = []
+        i = 0
+        while i < length:
+            if state == 0:
+                i = mask.find(b"\x01", i)
+                if i < 0:
+                    break
+            byte = buf[i]
+            target = delta[state][byte]
+            if target is None:
+                target = self._build(state, byte)
+            i += 1
+            if target == state and not output[state]:
+                # Self loop, e.g. a run of zeros inside a partial gif footer
+                window = buf[i:i + _RUN_WINDOW]
+                i += len(window) - len(window.lstrip(buf[i - 1:i]))
+            state = target
+            if output[state]:
+                end = base + i
+                for pattern in output[state]:
+                    start = end - len(self._patterns[pattern][0])
+                    for extension, kind, signature in self._owners[pattern]:
+                        hits.append((start, extension, kind, signature))
+        self._state = state
+        self._offset = base + length
+        return hits
@@ -0,0 +1,293 @@
+# Streaming signature carver for the FileCarver Autopsy module.
+#
+# Instead of exporting a whole file to the temp directory and running foremost over
+# the copy, content is fed to the carver in fixed size chunks. The last few bytes of
+# every chunk are kept and prepended to the next one so headers and footers that
+# straddle a chunk boundary are still found, and only the carved byte ranges are
+# ever written to disk.
+#
+# The signatures come from the same foremost.conf that ships with the module so the
+# two carving backends can be compared like for like. Matching is done by the single
+# pass automaton in sigmatch.py, which carries partial matches from one chunk to the
+# next; the tail is only needed so a carve can include header bytes from the
+# previous chunk.
+#
+# For the formats structure.py knows, a carve ends where the image's own structure
+# says it does rather than at the first footer or the max size. A carve is held in
+# memory until its header has been checked and dropped without touching the disk if
+# the check fails. An image whose structure is still going at MAX_WALKED_SIZE is
+# taken for a false match and dropped too.
+#
+# This is free and unencumbered software released into the public domain.
+
+import hashlib
+import os
+import sys
+import threading
+
+try:
+    import Queue as queue
+except ImportError:
+    import queue
+
+from sigmatch import FOOTER, SignatureMatcher
+from structure import DONE, INVALID, LEADS, new_walker
+
+DEFAULT_CHUNK_SIZE = 4 * 1024 * 1024
+
+# Chunks a ReadAheadPipe may hold before its reader thread waits for the carver
+DEFAULT_READ_AHEAD = 2
+
+# Where a carve whose structure is being followed gives up, unless the signature's own
+# max size is larger
+MAX_WALKED_SIZE = 64 * 1024 * 1024
+
+
+# A carve in progress or completed. 'end' is exclusive. 'complete' is True when the
+# carve was closed by its footer or the end of its structure rather than by the max
+# size or the end of input. With a walker, data is held until the walker has validated
+# the header, and the carve runs to the end of the structure instead of stopping at the
+# signature's max size. md5 is the hash of what has been written so far. 'cut' is True
+# when the carve was still open at the end of input, so it stops wherever the input did.
+class CarvedFile(object):
+
+    def __init__(self, signature, start, path, walker=None):
+        self.signature = signature
+        self.extension = signature.extension
+        self.start = start
+        self.end = start
+        if walker is not None:
+            self.limit = start + max(signature.max_size, MAX_WALKED_SIZE)
+        else:
+            self.limit = start + signature.max_size
+        self.path = path
+        self.complete = False
+        self.cut = False
+        self.walker = walker
+        self._held = [] if walker is not None else None
+        self._handle = None
+        self.md5 = hashlib.md5()
+
+    def size(self):
+        return self.end - self.start
+
+    def write(self, data):
+        self.end += len(data)
+        if self._held is not None:
+            self._held.append(data)
+            if not self.walker.validated:
+                return
+            data = b"".join(self._held)
+            self._held = None
+        if self._handle is None:
+            self._handle = open(self.path, "wb")
+        self._handle.write(data)
+        self.md5.update(data)
+
+    def close(self):
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+
+    # Throw the carve away, removing anything already written.
+    def discard(self):
+        self.close()
+        self._held = None
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+# Incremental carver. Call feed() with consecutive pieces of content and finish() at the
+# end of input; carved files are written to out_dir as <prefix><offset>.<extension>.
+class StreamCarver(object):
+
+    def __init__(self, signatures, out_dir, chunk_size=DEFAULT_CHUNK_SIZE, validate=True, prefix=""):
+        self.signatures = signatures
+        self.out_dir = out_dir
+        self.prefix = prefix
+        self.chunk_size = chunk_size
+        self.validate = validate
+        self.rejected = 0
+        self._matcher = SignatureMatcher(signatures)
+        self.overlap = max(self._matcher.max_length - 1, 0)
+        if validate:
+            # Keep enough of the previous chunk to step back over a lead byte
+            self.overlap += max([len(lead) for lead in LEADS.values()] or [0])
+        self._tail = b""
+        self._position = 0
+        self._active = []
+        self._started = set()
+        self.carved = []
+
+    def _open(self, signature, start, buf, buf_start):
+        lead = LEADS.get(signature.extension) if self.validate else None
+        if lead and start - len(lead) >= buf_start and buf[start - len(lead) - buf_start:start - buf_start] == lead:
+            start -= len(lead)
+        key = (signature.extension, start)
+        if key in self._started:
+            return
+        self._started.add(key)
+        if not os.path.exists(self.out_dir):
+            os.makedirs(self.out_dir)
+        path = os.path.join(self.out_dir, "%s%08d.%s" % (self.prefix, start, signature.extension))
+        walker = new_walker(signature.extension) if self.validate else None
+        self._active.append(CarvedFile(signature, start, path, walker))
+
+    def _close_on_footer(self, signature, start):
+        end = start + len(signature.footer)
+        for carve in self._active:
+            if carve.extension != signature.extension or carve.complete or carve.walker is not None:
+                continue
+            if carve.start + len(carve.signature.header) <= start and end <= carve.limit:
+                carve.limit = end
+                carve.complete = True
+
+    def _finalize(self, carve):
+        if carve.walker is not None and not carve.walker.validated:
+            # Input ended before the header could be checked
+            self.rejected += 1
+            carve.discard()
+            return
+        carve.close()
+        self.carved.append(carve)
+
+    # Walk the next piece of a carve, returning the part of it that belongs to the image,
+    # or None if the header failed its checks and the carve has been dropped.
+    def _walk(self, carve, data):
+        walker = carve.walker
+        walked = carve.end - carve.start
+        walker.feed(data)
+        if walker.state == INVALID and not walker.validated:
+            self.rejected += 1
+            carve.discard()
+            return None
+        if walker.state in (DONE, INVALID):
+            carve.limit = min(carve.limit, carve.start + walker.end)
+            carve.complete = walker.state == DONE
+            data = data[:walker.end - walked]
+        return data
+
+    def feed(self, data):
+        if not data:
+            return
+        buf = self._tail + data
+        buf_start = self._position - len(self._tail)
+        self._position += len(data)
+
+        # Footers before headers at the same offset, then the most specific header first
+        hits = [(start, kind != FOOTER, -len(signature.header), signature)
+                for start, _, kind, signature in self._matcher.feed(data)]
+        hits.sort(key=lambda hit: hit[:3])
+        for start, is_header, _, signature in hits:
+            if is_header:
+                self._open(signature, start, buf, buf_start)
+            else:
+                self._close_on_footer(signature, start)
+
+        still_active = []
+        for carve in self._active:
+            target = min(carve.limit, self._position)
+            if target > carve.end:
+                data = buf[carve.end - buf_start:target - buf_start]
+                if carve.walker is not None and carve.walker.state not in (DONE, INVALID):
+                    data = self._walk(carve, data)
+                    if data is None:
+                        continue
+                carve.write(data)
+            if carve.end >= carve.limit:
+                if carve.walker is not None and carve.walker.state not in (DONE, INVALID):
+                    # No image of this type is that large, the structure must be a false match
+                    self.rejected += 1
+                    carve.discard()
+                    continue
+                self._finalize(carve)
+            else:
+                still_active.append(carve)
+        self._active = still_active
+
+        if self.overlap:
+            self._tail = buf[-self.overlap:]
+        horizon = self._position - self.overlap
+        self._started = set(key for key in self._started if key[1] >= horizon)
+
+    # Flush carves still waiting for a footer; they run to the end of the input.
+    def finish(self):
+        for carve in self._active:
+            carve.cut = True
+            self._finalize(carve)
+        self._active = []
+        self._tail = b""
+        return self.carved
+
+    # Convenience for callers with a file-like object or a read(n) function.
+    def carve_stream(self, read):
+        if hasattr(read, "read"):
+            read = read.read
+        try:
+            while True:
+                data = read(self.chunk_size)
+                if not data:
+                    break
+                self.feed(data)
+        except:
+            # Close any carves left open before passing the error on
+            self.finish()
+            raise
+        return self.finish()
+
+
+# Reads ahead from a read(n) function on a background thread so the next chunk is being
+# fetched while the current one is carved. At most 'depth' chunks are queued, so memory
+# use stays at depth + 1 chunks however large the source is.
+class ReadAheadPipe(object):
+
+    def __init__(self, read, chunk_size=DEFAULT_CHUNK_SIZE, depth=DEFAULT_READ_AHEAD):
+        self._queue = queue.Queue(depth)
+        self._error = None
+        self._closed = False
+        self._eof = False
+        self._thread = threading.Thread(target=self._run, args=(read, chunk_size), name="FileCarver-read-ahead")
+        self._thread.setDaemon(True)
+        self._thread.start()
+
+    def _run(self, read, chunk_size):
+        try:
+            while not self._closed:
+                data = read(chunk_size)
+                if not data:
+                    break
+                self._put(data)
+        except:
+            self._error = sys.exc_info()[1]
+        self._put(None)
+
+    def _put(self, item):
+        while not self._closed:
+            try:
+                self._queue.put(item, True, 0.5)
+                return
+            except queue.Full:
+                pass
+
+    # Return the next chunk, or an empty string at the end of the source. The size
+    # argument is ignored; chunks come in the size the pipe was created with.
+    def read(self, size=None):
+        if self._eof:
+            return b""
+        data = self._queue.get()
+        if data is None:
+            self._eof = True
+            if self._error is not None:
+                raise self._error
+            return b""
+        return data
+
+    # Stop the reader thread and wait for it, so the source can be closed safely.
+    def close(self):
+        self._closed = True
+        try:
+            while True:
+                self._queue.get_nowait()
+        except queue.Empty:
+            pass
+        self._thread.join()
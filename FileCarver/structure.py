@@ -0,0 +1,236 @@
+# Structure checks that decide where a carved image really ends.
+#
+# Header/footer carving stops at the first footer or at the signature's max size, so a
+# BMP with no footer is always carved to 100KB and a GIF can run on for 155MB. A walker
+# follows the image's own structure instead: the size field of a BMP header, the
+# segments of a JPEG up to the EOI after its last scan, the chunks of a PNG up to IEND,
+# and the blocks of a GIF up to its trailer. It also checks the header, so a signature
+# hit that is not really an image is rejected before any of it is written.
+#
+# Walkers are fed the carve's bytes in order, in pieces of any size:
+#
+#   walker = new_walker("png")
+#   walker.feed(data)
+#   if walker.state == DONE: image is walker.end bytes long
+#
+# Each format is written as a generator that asks for bytes with (READ, n), passes over
+# them with (SKIP, n) or (FIND, byte), and yields (VALID, None) once the header has
+# checked out. StructureWalker drives it over whatever pieces arrive.
+#
+# This is free and unencumbered software released into the public domain.
+
+import struct
+import zlib
+
+READ = "read"
+SKIP = "skip"
+FIND = "find"
+VALID = "valid"
+
+WALKING = "walking"
+DONE = "done"
+INVALID = "invalid"
+
+
+class Invalid(Exception):
+    pass
+
+
+class StructureWalker(object):
+
+    def __init__(self, generator):
+        self._generator = generator
+        self._held = []
+        self._held_length = 0
+        self.position = 0
+        self.validated = False
+        self.state = WALKING
+        self.end = None
+        self._request = None
+        self._resume(None)
+
+    def _resume(self, value):
+        try:
+            request = self._generator.send(value)
+            while request[0] == VALID or (request[0] in (READ, SKIP) and request[1] == 0):
+                if request[0] == VALID:
+                    self.validated = True
+                request = self._generator.send(b"" if request[0] == READ else None)
+        except StopIteration:
+            self.state = DONE
+            self.end = self.position
+            return
+        except (Invalid, struct.error):
+            self.state = INVALID
+            self.end = self.position
+            return
+        self._request = request
+
+    # Walk the next piece of the carve. Stops early once the walker is DONE or INVALID;
+    # 'end' is then the length of the image, or how far it got before it failed.
+    def feed(self, data):
+        i = 0
+        length = len(data)
+        while self.state == WALKING and i < length:
+            kind, argument = self._request
+            if kind == READ:
+                piece = data[i:i + argument - self._held_length]
+                i += len(piece)
+                self.position += len(piece)
+                self._held.append(piece)
+                self._held_length += len(piece)
+                if self._held_length == argument:
+                    value = b"".join(self._held)
+                    self._held = []
+                    self._held_length = 0
+                    self._resume(value)
+            elif kind == SKIP:
+                step = min(argument, length - i)
+                i += step
+                self.position += step
+                if step == argument:
+                    self._resume(None)
+                else:
+                    self._request = (SKIP, argument - step)
+            else:
+                found = data.find(argument, i)
+                if found < 0:
+                    self.position += length - i
+                    i = length
+                else:
+                    self.position += found + 1 - i
+                    i = found + 1
+                    self._resume(None)
+        return self.state
+
+
+def walk_jpeg():
+    if (yield (READ, 2)) != b"\xff\xd8":
+        raise Invalid()
+    validated = False
+    code = None
+    while True:
+        if code is None:
+            if (yield (READ, 1)) != b"\xff":
+                raise Invalid()
+            following = yield (READ, 1)
+            while following == b"\xff":
+                following = yield (READ, 1)
+            code = ord(following)
+        if code == 0xd9:
+            return
+        if code == 0x01 or 0xd0 <= code <= 0xd7:
+            code = None
+            continue
+        if code < 0xc0 or code == 0xd8:
+            raise Invalid()
+        length = struct.unpack(">H", (yield (READ, 2)))[0]
+        if length < 2:
+            raise Invalid()
+        if not validated:
+            # An image starts with an application segment or with its tables
+            if not (0xe0 <= code <= 0xef or 0xc0 <= code <= 0xcf or code in (0xdb, 0xdd, 0xfe)):
+                raise Invalid()
+            validated = True
+            yield (VALID, None)
+        yield (SKIP, length - 2)
+        segment = code
+        code = None
+        if segment == 0xda:
+            # Entropy coded data runs to the next marker that is not a stuffed zero or a restart
+            while code is None:
+                yield (FIND, b"\xff")
+                following = yield (READ, 1)
+                while following == b"\xff":
+                    following = yield (READ, 1)
+                value = ord(following)
+                if value != 0 and not 0xd0 <= value <= 0xd7:
+                    code = value
+
+
+def walk_png():
+    if (yield (READ, 8)) != b"\x89PNG\r\n\x1a\n":
+        raise Invalid()
+    length, kind = struct.unpack(">I4s", (yield (READ, 8)))
+    if kind != b"IHDR" or length != 13:
+        raise Invalid()
+    ihdr = yield (READ, 13)
+    crc = struct.unpack(">I", (yield (READ, 4)))[0]
+    width, height = struct.unpack(">II", ihdr[:8])
+    if width == 0 or height == 0 or zlib.crc32(kind + ihdr) & 0xffffffff != crc:
+        raise Invalid()
+    yield (VALID, None)
+    while True:
+        length, kind = struct.unpack(">I4s", (yield (READ, 8)))
+        if length > 0x7fffffff or not kind.isalpha():
+            raise Invalid()
+        yield (SKIP, length + 4)
+        if kind == b"IEND":
+            return
+
+
+_BMP_HEADER_SIZES = (12, 40, 52, 56, 64, 108, 124)
+
+
+_BMP_BIT_COUNTS = (1, 4, 8, 16, 24, 32)
+
+
+def walk_bmp():
+    magic, size, reserved1, reserved2, offset, header_size = struct.unpack("<2sIHHII", (yield (READ, 18)))
+    if magic != b"BM" or header_size not in _BMP_HEADER_SIZES or offset < 14 + header_size or offset >= size:
+        raise Invalid()
+    # The carve runs to the size field, so the rest of the header has to be believable too
+    if header_size == 12:
+        width, height, planes, bit_count = struct.unpack("<HHHH", (yield (READ, 8)))
+    else:
+        width, height, planes, bit_count = struct.unpack("<iiHH", (yield (READ, 12)))
+    if width <= 0 or height == 0 or planes != 1 or bit_count not in _BMP_BIT_COUNTS:
+        raise Invalid()
+    yield (VALID, None)
+    yield (SKIP, size - 18 - (8 if header_size == 12 else 12))
+
+
+def walk_gif():
+    header = yield (READ, 13)
+    if header[:6] not in (b"GIF87a", b"GIF89a"):
+        raise Invalid()
+    width, height, flags = struct.unpack("<HHB", header[6:11])
+    if width == 0 or height == 0:
+        raise Invalid()
+    yield (VALID, None)
+    if flags & 0x80:
+        yield (SKIP, 3 * (2 << (flags & 7)))
+    while True:
+        block = yield (READ, 1)
+        if block == b";":
+            return
+        if block == b"!":
+            yield (READ, 1)
+        elif block == b",":
+            descriptor = yield (READ, 9)
+            flags = ord(descriptor[8:9])
+            if flags & 0x80:
+                yield (SKIP, 3 * (2 << (flags & 7)))
+            yield (READ, 1)
+        else:
+            raise Invalid()
+        while True:
+            size = ord((yield (READ, 1)))
+            if size == 0:
+                break
+            yield (SKIP, size)
+
+
+WALKERS = {"jpg": walk_jpeg, "png": walk_png, "bmp": walk_bmp, "gif": walk_gif}
+
+# Bytes an image starts with that come before the header of its foremost.conf rule. The
+# bundled png rule matches "PNG?", one byte into the real signature.
+LEADS = {"png": b"\x89"}
+
+
+# A walker for a carve of the given extension, or None if its structure isn't known.
+def new_walker(extension):
+    walk = WALKERS.get(extension)
+    if walk is None:
+        return None
+    return StructureWalker(walk())
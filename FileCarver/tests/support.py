@@ -0,0 +1,140 @@
+# Shared set up for the FileCarver unit tests.
+#
+# Puts the module folder on the path so the helper modules import the way Autopsy
+# imports them, and builds small images whose structure is real: segment, chunk and
+# block lengths all add up, so the walkers see what they would see in an actual file.
+# The pixel data is seeded noise rather than anything that decodes to a picture.
+#
+# The ingest module itself is imported against the stand-ins for the Java and Autopsy
+# classes in benchmark/fakes.py.
+#
+# The tests run under Python 2.7, which is what Jython implements:
+#
+#   python2.7 -m unittest discover -s FileCarver/tests
+#
+# This is free and unencumbered software released into the public domain.
+
+import os
+import random
+import struct
+import sys
+import zlib
+
+MODULE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+CONF_PATH = os.path.join(MODULE_DIR, "foremost.conf")
+BENCHMARK_DIR = os.path.join(os.path.dirname(MODULE_DIR), "benchmark")
+
+if MODULE_DIR not in sys.path:
+    sys.path.insert(0, MODULE_DIR)
+
+
+# Install the fakes and import filecarver, returning both modules.
+def import_filecarver():
+    if BENCHMARK_DIR not in sys.path:
+        sys.path.insert(0, BENCHMARK_DIR)
+    import fakes
+    fakes.install()
+    import filecarver
+    return fakes, filecarver
+
+
+def noise(length, seed=1, excluded=()):
+    rng = random.Random(seed)
+    values = bytearray(rng.randrange(0, 256) for i in range(length))
+    for i, value in enumerate(values):
+        while value in excluded:
+            value = rng.randrange(0, 256)
+        values[i] = value
+    return bytes(values)
+
+
+def segment(marker, payload):
+    return struct.pack(">BBH", 0xff, marker, len(payload) + 2) + payload
+
+
+# Entropy coded data as it appears in a scan: noise with every 0xff stuffed with a zero
+# and a restart marker after every 'restart' bytes.
+def scan_data(length, seed=1, restart=0):
+    data = noise(length, seed)
+    pieces = []
+    for i in range(0, length, restart or length):
+        pieces.append(data[i:i + (restart or length)].replace(b"\xff", b"\xff\x00"))
+    joined = []
+    for i, piece in enumerate(pieces):
+        joined.append(piece)
+        if restart and i < len(pieces) - 1:
+            joined.append(struct.pack("BB", 0xff, 0xd0 + i % 8))
+    return b"".join(joined)
+
+
+def make_jpeg(width=16, height=16, scan=600, seed=1, restart=0):
+    return b"".join([b"\xff\xd8",
+                     segment(0xe0, b"JFIF\x00\x01\x01\x00\x00\x01\x00\x01\x00\x00"),
+                     segment(0xdb, b"\x00" + b"\x01" * 64),
+                     segment(0xc0, struct.pack(">BHHBBBB", 8, height, width, 1, 1, 0x11, 0)),
+                     segment(0xc4, b"\x00" + noise(28, seed)),
+                     segment(0xda, b"\x01\x01\x00\x00\x3f\x00"),
+                     scan_data(scan, seed, restart),
+                     b"\xff\xd9"])
+
+
+# A camera style JPEG: an APP1 Exif segment whose second IFD points at a complete JPEG
+# thumbnail, start and end of image markers included, inside the segment.
+def make_exif_jpeg(seed=1):
+    thumbnail = make_jpeg(8, 8, scan=200, seed=seed + 1)
+    entries = (struct.pack("<HHII", 0x0201, 4, 1, 44) +
+               struct.pack("<HHII", 0x0202, 4, 1, len(thumbnail)))
+    tiff = (b"II*\x00" + struct.pack("<I", 8) +
+            struct.pack("<HI", 0, 14) +
+            struct.pack("<H", 2) + entries + struct.pack("<I", 0) +
+            thumbnail)
+    image = make_jpeg(64, 48, seed=seed)
+    return image[:2] + segment(0xe1, b"Exif\x00\x00" + tiff) + image[2:]
+
+
+# A progressive JPEG: SOF2, then several scans, each with its own Huffman table segment
+# in front of it.
+def make_progressive_jpeg(seed=1):
+    parts = [b"\xff\xd8",
+             segment(0xe0, b"JFIF\x00\x01\x01\x00\x00\x01\x00\x01\x00\x00"),
+             segment(0xdb, b"\x00" + b"\x01" * 64),
+             segment(0xc2, struct.pack(">BHHBBBB", 8, 32, 32, 1, 1, 0x11, 0))]
+    for scan, (start, end) in enumerate(((0, 0), (1, 5), (6, 63), (1, 63))):
+        parts.append(segment(0xc4, b"\x00" + noise(28, seed + scan)))
+        parts.append(segment(0xda, struct.pack(">BBBBBB", 1, 1, 0, start, end, 0)))
+        parts.append(scan_data(300, seed + scan, restart=100))
+    parts.append(b"\xff\xd9")
+    return b"".join(parts)
+
+
+def png_chunk(kind, data, crc=None):
+    if crc is None:
+        crc = zlib.crc32(kind + data) & 0xffffffff
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", crc)
+
+
+def make_png(width=8, height=8, seed=1):
+    rows = b"".join(b"\x00" + noise(width * 3, seed + row) for row in range(height))
+    return (b"\x89PNG\r\n\x1a\n" +
+            png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)) +
+            png_chunk(b"IDAT", zlib.compress(rows)) +
+            png_chunk(b"IEND", b""))
+
+
+def make_gif(width=8, height=8, seed=1):
+    data = noise(40, seed)
+    return (b"GIF89a" + struct.pack("<HHBBB", width, height, 0x80, 0, 0) +
+            b"\x00\x00\x00\xff\xff\xff" +
+            b"!\xf9" + b"\x04\x00\x00\x00\x00" + b"\x00" +
+            b"," + struct.pack("<HHHHB", 0, 0, width, height, 0) +
+            b"\x02" + b"\x20" + data[:32] + b"\x08" + data[32:] + b"\x00;")
+
+
+def make_bmp(width=8, height=8, seed=1):
+    stride = (width * 3 + 3) & ~3
+    pixels = noise(stride * height, seed)
+    size = 54 + len(pixels)
+    return (b"BM" + struct.pack("<IHHI", size, 0, 0, 54) +
+            struct.pack("<IiiHHIIiiII", 40, width, height, 1, 24, 0, len(pixels), 2835, 2835, 0, 0) +
+            pixels)
@@ -0,0 +1,63 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import unittest
+
+import support
+from carvestore import CarveStore
+
+
+class CarveStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.store = CarveStore(self.directory)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def carved(self, content, name="carve.jpg"):
+        path = os.path.join(self.store.incoming_dir, name)
+        with open(path, "wb") as out:
+            out.write(content)
+        return path
+
+    def test_stored_by_content(self):
+        image = support.make_jpeg()
+        md5 = hashlib.md5(image).hexdigest()
+        path = self.carved(image)
+        relative, size = self.store.put(path, "jpg")
+        self.assertEqual(relative, os.path.join("images", md5[:2], md5 + ".jpg"))
+        self.assertEqual(size, len(image))
+        self.assertFalse(os.path.exists(path))
+        with open(self.store.local_path(relative), "rb") as stored:
+            self.assertEqual(stored.read(), image)
+        self.assertEqual((self.store.stored_count, self.store.stored_bytes), (1, len(image)))
+        self.assertEqual((self.store.shared_count, self.store.saved_bytes), (0, 0))
+
+    def test_same_content_shared(self):
+        image = support.make_jpeg()
+        first = self.store.put(self.carved(image, "a.jpg"), "jpg")
+        second = self.carved(image, "b.jpg")
+        self.assertEqual(self.store.put(second, "jpg"), first)
+        self.assertFalse(os.path.exists(second))
+        other = support.make_png()
+        self.store.put(self.carved(other, "c.png"), "png")
+        self.assertEqual((self.store.stored_count, self.store.stored_bytes), (2, len(image) + len(other)))
+        self.assertEqual((self.store.shared_count, self.store.saved_bytes), (1, len(image)))
+
+    def test_md5_given_by_the_carver(self):
+        relative, size = self.store.put(self.carved(b"content"), "gif", "ab" * 16)
+        self.assertEqual(relative, os.path.join("images", "ab", "ab" * 16 + ".gif"))
+
+    def test_shared_with_an_earlier_job(self):
+        image = support.make_gif()
+        relative, size = self.store.put(self.carved(image), "gif")
+        store = CarveStore(self.directory)
+        self.assertEqual(store.put(self.carved(image), "gif"), (relative, size))
+        self.assertEqual((store.stored_count, store.shared_count, store.saved_bytes), (0, 1, len(image)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,316 @@
+import io
+import os
+import shutil
+import stat
+import subprocess
+import tempfile
+import time
+import unittest
+
+import support
+
+fakes, filecarver = support.import_filecarver()
+
+FILLER = support.noise(4000, seed=7, excluded=(0xff,))
+
+
+# Runs parts of the ingest module against a fake case in a temp folder.
+class CarverModuleTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.work = tempfile.mkdtemp()
+        self.files = []
+
+    def tearDown(self):
+        fakes.FakeCase.current = None
+        shutil.rmtree(self.work)
+
+    def add_file(self, content, name=None, **columns):
+        file_id = len(self.files) + 1
+        path = os.path.join(self.work, "file%d" % file_id)
+        with open(path, "wb") as out:
+            out.write(content)
+        self.files.append(fakes.FakeFile(file_id, name or "file%d" % file_id, path, **columns))
+        return self.files[-1]
+
+    # A file whose second image runs over the 1MB limit, with the first whole before it.
+    def add_file_over_limit(self):
+        first = support.make_jpeg(scan=3000)
+        second = support.make_jpeg(scan=3000, seed=2)
+        content = FILLER[:500] + first + FILLER
+        content += support.noise(1024 * 1024 - 1000 - len(content), seed=3, excluded=(0xff,)) + second + FILLER
+        return self.add_file(content)
+
+    def start(self, settings):
+        fakes.FakeCase.current = fakes.FakeCase(os.path.join(self.work, "case"), fakes.FakeSleuthkitCase(self.files))
+        module = filecarver.CarverFilesIngestModule(fakes.GenericIngestModuleJobSettings(settings))
+        module.startUp(fakes.FakeContext())
+        module.startOutput()
+        return module
+
+    # A module that carves with an executable copy of the bundled foremost.
+    def start_foremost(self, settings):
+        foremost = os.path.join(self.work, "foremost")
+        shutil.copy(os.path.join(support.MODULE_DIR, "foremost"), foremost)
+        os.chmod(foremost, os.stat(foremost).st_mode | stat.S_IXUSR)
+        try:
+            subprocess.call([foremost, "-V"], stdout=open(os.devnull, "w"), stderr=subprocess.STDOUT)
+        except OSError:
+            self.skipTest("foremost can't be run here")
+        module = self.start(settings)
+        module.path_to_exe_foremost = foremost
+        return module
+
+
+class DataSource(object):
+
+    def getId(self):
+        return 1
+
+
+class FakeDirectory(fakes.FakeFile):
+
+    def getMetaType(self):
+        return fakes.TskData.TSK_FS_META_TYPE_ENUM.TSK_FS_META_TYPE_DIR
+
+    def columns(self):
+        columns = fakes.FakeFile.columns(self)
+        columns["meta_type"] = self.getMetaType().value
+        return columns
+
+
+# A data source with one file of each kind the selection options decide on.
+class FileSelectionTestCase(CarverModuleTestCase):
+
+    def setUp(self):
+        CarverModuleTestCase.setUp(self)
+        types = fakes.TskData.TSK_DB_FILES_TYPE_ENUM
+        self.add_file(FILLER, "document.doc", mimeType="application/msword")
+        self.add_file(FILLER[:filecarver.MIN_FILE_SIZE], "tiny.doc", mimeType="application/msword")
+        self.add_file(FILLER, "picture.jpg", mimeType="image/jpeg")
+        self.add_file(FILLER, "document.doc-slack")
+        self.add_file(FILLER, "Unalloc_1_0_4000", mimeType=None, fileType=types.UNALLOC_BLOCKS)
+        self.add_file(FILLER, "Unused_1_0_4000", mimeType="image/jpeg", fileType=types.UNUSED_BLOCKS)
+        self.add_file(FILLER, "other-source.doc", dataSourceId=2)
+        self.add_file(FILLER, "untyped.doc", mimeType=None)
+        path = os.path.join(self.work, "folder")
+        with open(path, "wb") as out:
+            out.write(FILLER)
+        self.files.append(FakeDirectory(len(self.files) + 1, "folder", path))
+        self.add_file(FILLER, "added-later.doc")
+
+    def selected(self, settings, lastFileId=None):
+        module = self.start(settings)
+        skCase = fakes.FakeCase.current.getSleuthkitCase()
+        return sorted([file.getName() for file in skCase.findAllFilesWhere(module.buildFileQuery(DataSource(), lastFileId))])
+
+
+class FileQueryTest(FileSelectionTestCase):
+
+    def test_default_mime_types(self):
+        self.assertEqual(self.selected({"Default_Mime_Types": "true"}), ["added-later.doc", "document.doc"])
+
+    def test_slack_and_all_mime_types(self):
+        self.assertEqual(self.selected({"All_Mime_Types": "true", "Include_Slack_Space": "true"}),
+                         ["added-later.doc", "document.doc", "document.doc-slack", "picture.jpg", "untyped.doc"])
+
+    def test_unallocated_space_whatever_its_mime_type(self):
+        self.assertEqual(self.selected({"Default_Mime_Types": "true", "Carve_Unallocated": "true"}),
+                         ["Unalloc_1_0_4000", "Unused_1_0_4000", "added-later.doc", "document.doc"])
+
+    def test_files_added_after_the_last_file(self):
+        self.assertEqual(self.selected({"Default_Mime_Types": "true"}, len(self.files) - 1), ["document.doc"])
+
+
+class Detector(object):
+
+    def getMIMEType(self, file):
+        return "application/msword"
+
+
+class IsCarvableTest(FileSelectionTestCase):
+
+    def carvable(self, settings, detector=None):
+        module = self.start(settings)
+        return sorted([file.getName() for file in self.files if module.isCarvable(file, detector)])
+
+    def test_same_selection_as_the_query(self):
+        for settings in ({"Default_Mime_Types": "true"},
+                         {"All_Mime_Types": "true", "Include_Slack_Space": "true"},
+                         {"Default_Mime_Types": "true", "Carve_Unallocated": "true"}):
+            # The file pipeline only sees files of its own data source
+            expected = self.selected(settings)
+            self.assertEqual([name for name in self.carvable(settings) if name != "other-source.doc"], expected, settings)
+
+    def test_untyped_file_typed_by_detector(self):
+        self.assertNotIn("untyped.doc", self.carvable({"Default_Mime_Types": "true"}))
+        self.assertIn("untyped.doc", self.carvable({"Default_Mime_Types": "true"}, Detector()))
+        # A file that already has a mime type isn't typed again
+        self.assertNotIn("picture.jpg", self.carvable({"Default_Mime_Types": "true"}, Detector()))
+
+
+class LogTest(CarverModuleTestCase):
+
+    def test_class_and_method(self):
+        stream = fakes.FakeLogger.stream
+        fakes.FakeLogger.stream = io.BytesIO() if str is bytes else io.StringIO()
+        try:
+            module = self.start({})
+            committer = module.startOutput()
+            committer.log(fakes.Level.WARNING, "from the committer")
+            logged = fakes.FakeLogger.stream.getvalue().splitlines()
+        finally:
+            fakes.FakeLogger.stream = stream
+        self.assertIn("WARNING CarvedFileCommitter.test_class_and_method: from the committer", logged)
+
+
+class ConfigFingerprintTest(CarverModuleTestCase):
+
+    def fingerprint(self, settings):
+        return self.start(settings).configFingerprint
+
+    def test_engine_changes_fingerprint(self):
+        self.assertNotEqual(self.fingerprint({"Native_Carver": "true"}), self.fingerprint({}))
+
+    def test_batching_and_version_do_not(self):
+        self.assertEqual(self.fingerprint({}), self.fingerprint({"Batch_Small_Files": "true"}))
+        native = self.fingerprint({"Native_Carver": "true"})
+        version = filecarver.CarverFilesIngestModuleFactory.getModuleVersionNumber
+        filecarver.CarverFilesIngestModuleFactory.getModuleVersionNumber = lambda self: "0.0"
+        try:
+            self.assertEqual(self.fingerprint({"Native_Carver": "true"}), native)
+        finally:
+            filecarver.CarverFilesIngestModuleFactory.getModuleVersionNumber = version
+
+
+class CarveBudgetTest(unittest.TestCase):
+
+    def setUp(self):
+        self.context = fakes.FakeContext()
+
+    def test_no_limits(self):
+        budget = filecarver.CarveBudget(self.context, 0, 0)
+        self.assertEqual(budget.allowedRead(10 ** 12, 10 ** 13, 4096), 4096)
+        self.assertFalse(budget.expired())
+        self.assertIsNone(budget.stopped)
+
+    def test_size_limit(self):
+        budget = filecarver.CarveBudget(self.context, 0, 1000)
+        self.assertEqual(budget.allowedRead(0, 5000, 4096), 1000)
+        self.assertEqual(budget.allowedRead(600, 5000, 4096), 400)
+        self.assertIsNone(budget.stopped)
+        self.assertEqual(budget.allowedRead(1000, 5000, 4096), 0)
+        self.assertEqual(budget.stopped, filecarver.CarveBudget.SIZE)
+        # Cut short, but what was read is still carved
+        self.assertFalse(budget.expired())
+
+    def test_file_no_larger_than_size_limit(self):
+        budget = filecarver.CarveBudget(self.context, 0, 1000)
+        self.assertEqual(budget.allowedRead(1000, 1000, 4096), 0)
+        self.assertIsNone(budget.stopped)
+
+    def test_time_limit(self):
+        budget = filecarver.CarveBudget(self.context, 60, 0)
+        self.assertFalse(budget.expired())
+        budget.deadline = time.time() - 1
+        self.assertTrue(budget.expired())
+        self.assertEqual(budget.stopped, filecarver.CarveBudget.TIME)
+        self.assertEqual(budget.allowedRead(0, 5000, 4096), 0)
+
+    def test_cancel(self):
+        budget = filecarver.CarveBudget(self.context, 0, 1000)
+        budget.allowedRead(1000, 5000, 4096)
+        self.context.cancelled = True
+        self.assertTrue(budget.expired())
+        self.assertEqual(budget.stopped, filecarver.CarveBudget.CANCELLED)
+        # A cancel isn't turned into a time limit later
+        budget.deadline = time.time() - 1
+        budget.expired()
+        self.assertEqual(budget.stopped, filecarver.CarveBudget.CANCELLED)
+
+
+class FileLimitsTest(CarverModuleTestCase):
+
+    def test_image_cut_by_size_limit_is_dropped(self):
+        file = self.add_file_over_limit()
+        module = self.start({"Native_Carver": "true", "File_MB_Limit": "1"})
+        result = module.carveFile(file)
+        self.assertEqual(result.state, filecarver.PARTIAL)
+        self.assertEqual(list(result.offsets.values()), [500])
+        self.assertEqual(os.listdir(module.store.incoming_dir), [])
+
+    def test_image_cut_by_size_limit_is_dropped_by_foremost(self):
+        file = self.add_file_over_limit()
+        module = self.start_foremost({"File_MB_Limit": "1"})
+        result = module.carveFile(file)
+        self.assertEqual(result.state, filecarver.PARTIAL)
+        self.assertEqual(result.extractedfiles, ["00000500.jpg"])
+        self.assertEqual(result.offsets["00000500.jpg"], 500)
+
+
+class DuplicateIndexTest(CarverModuleTestCase):
+
+    def test_claims(self):
+        a, b, c, d = [self.add_file(content) for content in (FILLER, FILLER, FILLER, FILLER[:100])]
+        duplicates = filecarver.DuplicateIndex()
+        self.assertTrue(duplicates.claim(a, "aa"))
+        self.assertFalse(duplicates.claim(b, "aa"))
+        self.assertFalse(duplicates.claim(c, "aa"))
+        # The file that claimed a hash may claim it again, as a batch file carved on its own does
+        self.assertTrue(duplicates.claim(a, "aa"))
+        self.assertTrue(duplicates.claim(d, "dd"))
+        self.assertTrue(duplicates.claim(b, None))
+        self.assertEqual(duplicates.get("aa").leaderId, a.getId())
+        self.assertIsNone(duplicates.get("bb"))
+        self.assertEqual((duplicates.sharedCount, duplicates.avoidedCount, duplicates.avoidedBytes),
+                         (1, 2, 2 * len(FILLER)))
+
+
+class BatchForemostTest(CarverModuleTestCase):
+
+    def test_carve_across_files(self):
+        # a ends in a JPEG with no end of image marker, so foremost carves on into b and
+        # skips past the whole image in b
+        image = support.make_jpeg(scan=3000)
+        a = self.add_file(FILLER[:1000] + image[:-2])
+        b = self.add_file(FILLER[:1500] + image + FILLER[:500])
+        module = self.start_foremost({"Batch_Small_Files": "true"})
+        resultA, resultB = module.carveBatchForemost([a, b])
+        self.assertEqual(resultA.state, filecarver.COMPLETE)
+        self.assertEqual(resultB.state, filecarver.COMPLETE)
+        self.assertEqual(resultB.extractedfiles, ["00001500.jpg"])
+        self.assertEqual(resultB.sizes["00001500.jpg"], len(image))
+
+    def test_batch_over_its_budget(self):
+        # b is over the 1MB limit, which used to stop the whole batch with nothing carved
+        image = support.make_jpeg(scan=3000)
+        a = self.add_file(FILLER[:1000] + image + FILLER[:200])
+        b = self.add_file_over_limit()
+        c = self.add_file(FILLER[:1500] + image + FILLER[:500])
+        module = self.start_foremost({"Batch_Small_Files": "true", "File_MB_Limit": "1"})
+        resultA, resultB, resultC = module.carveBatchForemost([a, b, c])
+        self.assertEqual([result.state for result in (resultA, resultB, resultC)],
+                         [filecarver.COMPLETE, filecarver.PARTIAL, filecarver.COMPLETE])
+        self.assertEqual(list(resultA.offsets.values()), [1000])
+        self.assertEqual(list(resultB.offsets.values()), [500])
+        self.assertEqual(list(resultC.offsets.values()), [1500])
+
+    def test_cancelled_batch(self):
+        a = self.add_file(FILLER)
+        b = self.add_file(FILLER[:1000])
+        module = self.start_foremost({"Batch_Small_Files": "true"})
+        module.context.cancelled = True
+        self.assertEqual([result.state for result in module.carveBatchForemost([a, b])], [None, None])
+
+    def test_carves_inside_files(self):
+        image = support.make_jpeg(scan=3000)
+        a = self.add_file(FILLER[:1000] + image + FILLER[:200])
+        b = self.add_file(FILLER[:1500] + image + FILLER[:500])
+        module = self.start_foremost({"Batch_Small_Files": "true"})
+        resultA, resultB = module.carveBatchForemost([a, b])
+        self.assertEqual(resultA.extractedfiles, ["00001000.jpg"])
+        self.assertEqual(resultB.extractedfiles, ["00001500.jpg"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import os
+import unittest
+
+import support
+from foremostbatch import BatchOffsetMap, parse_audit
+
+
+class BatchOffsetMapTest(unittest.TestCase):
+
+    def setUp(self):
+        # a: 0-10, b: empty at 10, c: 10-15, d: 15-35
+        self.batch = BatchOffsetMap()
+        for length, owner in ((10, "a"), (0, "b"), (5, "c"), (20, "d")):
+            self.batch.append(length, owner)
+
+    def test_offsets(self):
+        self.assertEqual(len(self.batch), 4)
+        self.assertEqual(self.batch.size, 35)
+        self.assertEqual(self.batch.owners(), ["a", "b", "c", "d"])
+        self.assertEqual(BatchOffsetMap().append(7, "x"), 0)
+
+    def test_inside_one_file(self):
+        self.assertEqual(self.batch.locate(0, 10), ("a", 0))
+        self.assertEqual(self.batch.locate(3, 4), ("a", 3))
+        self.assertEqual(self.batch.locate(15, 20), ("d", 0))
+        self.assertEqual(self.batch.locate(34, 1), ("d", 19))
+
+    def test_file_boundaries(self):
+        # The last byte of a, the first byte of c after the empty b, and either side of
+        # the c/d boundary
+        self.assertEqual(self.batch.locate(9, 1), ("a", 9))
+        self.assertEqual(self.batch.locate(10, 1), ("c", 0))
+        self.assertEqual(self.batch.locate(10, 5), ("c", 0))
+        self.assertEqual(self.batch.locate(14, 1), ("c", 4))
+        self.assertEqual(self.batch.locate(15, 1), ("d", 0))
+
+    def test_carves_across_files(self):
+        self.assertIsNone(self.batch.locate(9, 2))
+        self.assertIsNone(self.batch.locate(0, 11))
+        self.assertIsNone(self.batch.locate(10, 6))
+        self.assertIsNone(self.batch.locate(34, 2))
+
+    def test_files_a_carve_runs_over(self):
+        self.assertEqual(self.batch.spanned(9, 2), ["a", "c"])
+        self.assertEqual(self.batch.spanned(0, 35), ["a", "c", "d"])
+        self.assertEqual(self.batch.spanned(12, 10), ["c", "d"])
+        self.assertEqual(self.batch.spanned(34, 2), ["d"])
+        self.assertEqual(self.batch.spanned(35, 1), [])
+
+    def test_outside_the_batch(self):
+        self.assertIsNone(self.batch.locate(-1, 1))
+        self.assertIsNone(self.batch.locate(35, 1))
+        self.assertIsNone(BatchOffsetMap().locate(0, 1))
+
+
+class ParseAuditTest(unittest.TestCase):
+
+    def test_foremost_audit(self):
+        carves = parse_audit(os.path.join(support.DATA_DIR, "foremost-audit.txt"))
+        self.assertEqual(carves, [("00000365.jpg", 187037), ("00000706.gif", 361774), ("00000706_1.gif", 361774),
+                                  ("00000365_1.jpg", 187037), ("00000365_2.jpg", 187037)])
+
+
+if __name__ == "__main__":
+    unittest.main()
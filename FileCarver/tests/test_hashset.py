@@ -0,0 +1,109 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import support
+import hashset
+from hashset import KnownHashSet, index_path_for, read_hash_list
+
+
+def md5_of(number):
+    return hashlib.md5(("hash %d" % number).encode("ascii")).hexdigest()
+
+
+class KnownHashSetTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.index_dir = os.path.join(self.directory, "index")
+        self.known = None
+
+    def tearDown(self):
+        if self.known is not None:
+            self.known.close()
+        shutil.rmtree(self.directory)
+
+    def write_list(self, name, lines):
+        path = os.path.join(self.directory, name)
+        with open(path, "w") as hash_list:
+            hash_list.write("".join(line + "\n" for line in lines))
+        return path
+
+    def test_lookups_at_block_fences(self):
+        blocks = 3
+        hashes = sorted(md5_of(number) for number in range(blocks * hashset._BLOCK_KEYS + 5))
+        path = self.write_list("known.txt", [md5 + "  file%d" % i for i, md5 in enumerate(reversed(hashes))])
+        self.known = KnownHashSet.load(path, self.index_dir)
+        self.assertEqual(len(self.known), len(hashes))
+        self.assertEqual(len(self.known._fences), blocks + 1)
+
+        for block in range(blocks + 1):
+            fence = block * hashset._BLOCK_KEYS
+            for i in (fence - 1, fence, fence + 1):
+                if 0 <= i < len(hashes):
+                    self.assertIn(hashes[i], self.known)
+                    self.assertIn(hashes[i].upper(), self.known)
+        self.assertIn(hashes[-1], self.known)
+
+        # Absent hashes just either side of every fence, and either side of the whole index
+        for block in range(1, blocks + 1):
+            fence = hashes[block * hashset._BLOCK_KEYS]
+            below = "%032x" % (int(fence, 16) - 1)
+            above = "%032x" % (int(fence, 16) + 1)
+            for md5 in (below, above):
+                if md5 not in hashes:
+                    self.assertNotIn(md5, self.known)
+        self.assertNotIn("0" * 32, self.known)
+        self.assertNotIn("f" * 32, self.known)
+        self.assertNotIn(None, self.known)
+        self.assertNotIn("not a hash", self.known)
+
+    def test_runs_are_merged_without_duplicates(self):
+        runs = hashset._RUN_KEYS
+        hashset._RUN_KEYS = 100
+        try:
+            hashes = [md5_of(number % 150) for number in range(450)]
+            self.known = KnownHashSet.load(self.write_list("known.txt", hashes), self.index_dir)
+        finally:
+            hashset._RUN_KEYS = runs
+        self.assertEqual(len(self.known), 150)
+        self.assertEqual(os.listdir(self.index_dir), [os.path.basename(self.known.index_path)])
+        for number in range(150):
+            self.assertIn(md5_of(number), self.known)
+
+    def test_nsrl_list(self):
+        path = self.write_list("NSRLFile.txt", [
+            '"SHA-1","MD5","CRC32","FileName","FileSize","ProductCode","OpSystemCode","SpecialCode"',
+            '"0000002D9D62AEBE1E0E9DB6C4C4C7C16A163D2C","1D6EBB5A789ABD108FF578263E1F40F3","FFFFFFFF","_sfx_0024._p","4109","21000","358",""',
+            '"00000142988AFA836117B1B572FAE4713F200567","9B3702B0E788C6D62996392FE3C9786A","05E566DF","J0180794.JPG","32768","16848","358",""',
+            '"broken line'])
+        self.assertEqual(list(read_hash_list(path)), ["1d6ebb5a789abd108ff578263e1f40f3", "9b3702b0e788c6d62996392fe3c9786a"])
+
+    def test_index_is_kept_out_of_the_list_folder(self):
+        path = self.write_list("known.txt", [md5_of(1)])
+        other = os.path.join(self.directory, "other")
+        os.mkdir(other)
+        other_path = os.path.join(other, "known.txt")
+        shutil.copy(path, other_path)
+        self.assertNotEqual(index_path_for(path, self.index_dir), index_path_for(other_path, self.index_dir))
+
+        self.known = KnownHashSet.load(path, self.index_dir)
+        self.assertEqual(sorted(os.listdir(self.directory)), ["index", "known.txt", "other"])
+        self.assertEqual(self.known.index_path, index_path_for(path, self.index_dir))
+
+    def test_index_is_rebuilt_when_the_list_changes(self):
+        path = self.write_list("known.txt", [md5_of(1)])
+        self.known = KnownHashSet.load(path, self.index_dir)
+        self.known.close()
+        self.write_list("known.txt", [md5_of(1), md5_of(2)])
+        later = time.time() + 10
+        os.utime(path, (later, later))
+        self.known = KnownHashSet.load(path, self.index_dir)
+        self.assertIn(md5_of(2), self.known)
+
+
+if __name__ == "__main__":
+    unittest.main()
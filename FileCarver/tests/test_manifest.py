@@ -0,0 +1,99 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import support
+from manifest import COMPLETE, FAILED, PARTIAL, CarveManifest
+
+
+class CarveManifestTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "carve-manifest.jsonl")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def lines(self):
+        with open(self.path, "r") as manifest:
+            return manifest.readlines()
+
+    def test_reload(self):
+        manifest = CarveManifest(self.path)
+        manifest.record(1, 100, "a" * 32, "conf", COMPLETE, [11, 12], ["1.jpg", "2.png"])
+        manifest.record(2, 200, None, "conf", PARTIAL, [21], ["3.gif"], "time=0 size=1")
+        manifest = CarveManifest(self.path)
+        self.assertTrue(manifest.is_complete(1, 100, "a" * 32, "conf"))
+        self.assertTrue(manifest.is_complete(1, 100, None, "conf"))
+        self.assertFalse(manifest.is_complete(1, 100, "b" * 32, "conf"))
+        self.assertFalse(manifest.is_complete(1, 101, None, "conf"))
+        self.assertFalse(manifest.is_complete(1, 100, None, "other"))
+        self.assertTrue(manifest.is_complete(2, 200, None, "conf", "time=0 size=1"))
+        self.assertFalse(manifest.is_complete(2, 200, None, "conf", "time=0 size=2"))
+        self.assertEqual(manifest.partial_carves(2, 200, "conf"), (["3.gif"], [21]))
+        self.assertEqual(manifest.partial_carves(1, 100, "conf"), ([], []))
+
+    def test_partial_needs_the_same_limits(self):
+        manifest = CarveManifest(self.path)
+        manifest.record(1, 100, None, "conf", PARTIAL, [11], ["00000000.jpg"], "time=30 size=0")
+        self.assertTrue(manifest.is_complete(1, 100, None, "conf", "time=30 size=0"))
+        # A rerun with other limits, or one that asks for complete records only
+        self.assertFalse(manifest.is_complete(1, 100, None, "conf", "time=60 size=0"))
+        self.assertFalse(manifest.is_complete(1, 100, None, "conf"))
+        self.assertFalse(manifest.is_complete(1, 101, None, "conf", "time=30 size=0"))
+        self.assertFalse(manifest.is_complete(1, 100, None, "other", "time=30 size=0"))
+        # Limits don't matter to a file that was carved completely
+        manifest.record(2, 200, None, "conf", COMPLETE, [21], ["00000000.png"], "time=30 size=0")
+        self.assertTrue(manifest.is_complete(2, 200, None, "conf", "time=60 size=0"))
+        manifest.record(3, 300, None, "conf", FAILED)
+        self.assertFalse(manifest.is_complete(3, 300, None, "conf", None))
+
+    def test_partial_carves(self):
+        manifest = CarveManifest(self.path)
+        manifest.record(1, 100, None, "conf", PARTIAL, [11, 12], ["00000000.jpg", "00000500.gif"], "time=30 size=0")
+        manifest.record(2, 200, None, "conf", COMPLETE, [21], ["00000000.png"])
+        manifest.record(3, 300, None, "conf", FAILED)
+        names, ids = manifest.partial_carves(1, 100, "conf")
+        self.assertEqual((names, ids), (["00000000.jpg", "00000500.gif"], [11, 12]))
+        # Copies, so the caller can add to them
+        names.append("00001000.bmp")
+        self.assertEqual(manifest.partial_carves(1, 100, "conf")[0], ["00000000.jpg", "00000500.gif"])
+        # The file changed, or the configuration did
+        self.assertEqual(manifest.partial_carves(1, 101, "conf"), ([], []))
+        self.assertEqual(manifest.partial_carves(1, 100, "other"), ([], []))
+        for file_id, size in ((2, 200), (3, 300), (4, 400)):
+            self.assertEqual(manifest.partial_carves(file_id, size, "conf"), ([], []))
+
+    def test_last_record_wins_and_is_compacted(self):
+        manifest = CarveManifest(self.path)
+        manifest.record(1, 100, None, "conf", PARTIAL, [11], ["1.jpg"], "time=0 size=1")
+        manifest.record(1, 100, None, "conf", COMPLETE, [11, 12], ["1.jpg", "2.jpg"])
+        self.assertEqual(len(self.lines()), 2)
+        manifest = CarveManifest(self.path)
+        self.assertEqual(manifest.get(1)["state"], COMPLETE)
+        self.assertEqual(len(self.lines()), 1)
+
+    def test_truncated_last_line(self):
+        manifest = CarveManifest(self.path)
+        manifest.record(1, 100, None, "conf", COMPLETE, [11])
+        manifest.record(2, 200, None, "conf", COMPLETE, [21])
+        # A crash part way through writing the third record
+        with open(self.path, "a") as handle:
+            handle.write('{"carved": [], "config": "conf", "derived": [3')
+
+        manifest = CarveManifest(self.path)
+        self.assertEqual(sorted(manifest.records), [1, 2])
+        self.assertEqual(len(self.lines()), 2)
+        self.assertTrue(all(line.endswith("\n") for line in self.lines()))
+
+        # Records appended after the compaction start on a line of their own
+        manifest.record(3, 300, None, "conf", COMPLETE, [31])
+        manifest = CarveManifest(self.path)
+        self.assertEqual(sorted(manifest.records), [1, 2, 3])
+        self.assertEqual(len(self.lines()), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+import random
+import unittest
+
+import support
+from sigmatch import FOOTER, HEADER, Signature, SignatureMatcher, decode_pattern, load_foremost_conf
+
+
+def _accepts(value, byte, case_sensitive):
+    if value is None:
+        return True
+    if not case_sensitive and 0x41 <= byte <= 0x5a:
+        byte += 0x20
+    if not case_sensitive and 0x41 <= value <= 0x5a:
+        value += 0x20
+    return value == byte
+
+
+# Every match, found by trying every pattern at every offset.
+def brute_force(signatures, data):
+    data = bytearray(data)
+    hits = []
+    for signature in signatures:
+        for kind, values in ((HEADER, signature.header), (FOOTER, signature.footer)):
+            if not values:
+                continue
+            first = values[0]
+            for start in range(len(data) - len(values) + 1):
+                if not _accepts(first, data[start], signature.case_sensitive):
+                    continue
+                if all(_accepts(value, data[start + i], signature.case_sensitive) for i, value in enumerate(values)):
+                    hits.append((start, signature.extension, kind, id(signature)))
+    return sorted(hits)
+
+
+def matched(signatures, data, chunk_size):
+    matcher = SignatureMatcher(signatures)
+    hits = []
+    for i in range(0, len(data), chunk_size):
+        for start, extension, kind, signature in matcher.feed(data[i:i + chunk_size]):
+            hits.append((start, extension, kind, id(signature)))
+    return sorted(hits)
+
+
+CHUNK_SIZES = (1, 2, 3, 5, 7, 16, 255, 4096)
+
+# Extra rules with wildcards, case insensitive letters and repeated bytes, the cases the
+# bundled rules don't cover
+EXTRA_RULES = [
+    Signature("zip", True, 1000, decode_pattern("PK\\x03\\x04"), decode_pattern("PK\\x05\\x06")),
+    Signature("htm", False, 1000, decode_pattern("<html"), decode_pattern("</html>")),
+    Signature("run", True, 1000, decode_pattern("\\x00\\x00\\x00\\x01"), decode_pattern("\\x00\\x00?\\x02")),
+    Signature("any", True, 1000, decode_pattern("?A?A")),
+]
+
+
+class SignatureMatcherTest(unittest.TestCase):
+
+    def setUp(self):
+        self.signatures = load_foremost_conf(support.CONF_PATH, ["jpeg", "png", "gif", "bmp"]) + EXTRA_RULES
+
+    def sample(self, seed):
+        rng = random.Random(seed)
+        fragments = [b"\xff\xd8\xff\xe0\x00\x10", b"\xff\xd8\xff\xe1", b"\xff\xd9", b"\x89PNG",
+                     b"\xff\xfc\xfd\xfe", b"GIF87a", b"GIF89a", b"\x00\x3b", b"\x00\x00\x3b", b"BM\x10\x20\x00\x00\x00",
+                     b"PK\x03\x04", b"PK\x05\x06", b"<HtMl", b"</HTML>", b"\x00\x00\x00\x01", b"\x00\x00\x07\x02",
+                     b"xAyA", b"AAAA"]
+        pieces = []
+        for i in range(200):
+            pieces.append(support.noise(rng.randrange(0, 40), seed * 1000 + i))
+            fragment = rng.choice(fragments)
+            # Some fragments are cut short so the matcher has partial matches to drop
+            if rng.random() < 0.2:
+                fragment = fragment[:rng.randrange(1, len(fragment))]
+            pieces.append(fragment)
+        return b"".join(pieces)
+
+    def assertMatchesBruteForce(self, data, chunk_sizes=CHUNK_SIZES):
+        expected = brute_force(self.signatures, data)
+        self.assertTrue(expected)
+        for chunk_size in chunk_sizes + (len(data),):
+            self.assertEqual(matched(self.signatures, data, chunk_size), expected, "chunk size %d" % chunk_size)
+
+    def test_random_data(self):
+        for seed in range(1, 4):
+            self.assertMatchesBruteForce(self.sample(seed))
+
+    def test_repeated_byte_runs(self):
+        runs = []
+        for value, length in ((0x00, 300), (0xff, 257), (0x41, 50), (0x00, 3), (0xff, 2)):
+            runs.append(bytes(bytearray([value])) * length)
+            runs.append(b"\xd8\xff\xe0\x00\x10\x3b\x01\x02BM\x00\x00\x00\x00")
+        self.assertMatchesBruteForce(b"".join(runs))
+
+    def test_run_longer_than_skip_window(self):
+        # Runs are skipped up to 64KB at a time; a footer right after a longer one must
+        # still be found at its real offset
+        data = (b"GIF89a" + b"\x00" * 70000 + b"\x3b" + b"\xff" * 70000 + b"\xd9" +
+                b"\x00" * 65536 + b"\x00\x01" + b"\x00" * 65535 + b"\x07\x02")
+        self.assertMatchesBruteForce(data, (1000, 65536, 65537))
+
+    def test_offsets_continue_across_feeds(self):
+        matcher = SignatureMatcher(self.signatures)
+        self.assertEqual(matcher.feed(b"\x00" * 10 + b"\xff"), [])
+        hits = matcher.feed(b"\xd8")
+        self.assertEqual([(start, extension, kind) for start, extension, kind, signature in hits], [(10, "jpg", HEADER)])
+        matcher.reset(100)
+        hits = matcher.feed(b"\xd8\xff\xd9")
+        self.assertEqual([(start, kind) for start, extension, kind, signature in hits], [(101, FOOTER)] * 3)
+
+
+class DecodePatternTest(unittest.TestCase):
+
+    def test_escapes_and_wildcards(self):
+        self.assertEqual(decode_pattern("BM??\\x00\\s\\n\\\\?"), [0x42, 0x4d, None, None, 0x00, 0x20, 0x0a, 0x5c, None])
+        self.assertEqual(decode_pattern("a*b", "*"), [0x61, None, 0x62])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,161 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+import support
+import streamcarver
+from sigmatch import Signature, decode_pattern, load_foremost_conf
+from streamcarver import ReadAheadPipe, StreamCarver
+
+# Filler with none of the bytes the bundled rules start with, so only the images match
+FILLER = support.noise(3000, seed=7, excluded=(0xff, 0x50, 0x47, 0x42))
+
+# The bundled bmp rule wants the top two bytes of the size field to be zero, so it only
+# matches BMPs under 64KB. This one only wants the reserved fields to be zero.
+LARGE_BMP = Signature("bmp", True, 100000, decode_pattern("BM????\\x00\\x00\\x00\\x00"))
+
+
+class StreamCarverTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.signatures = load_foremost_conf(support.CONF_PATH, ["jpeg", "png", "gif", "bmp"])
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    # Carve data in pieces of chunk_size; returns (start, length, complete, content) of
+    # every carve and the carver.
+    def carve(self, data, chunk_size):
+        out_dir = os.path.join(self.directory, "out-%d" % chunk_size)
+        carver = StreamCarver(self.signatures, out_dir, chunk_size)
+        for i in range(0, len(data), chunk_size):
+            carver.feed(data[i:i + chunk_size])
+        carves = []
+        for carve in carver.finish():
+            with open(carve.path, "rb") as carved:
+                carves.append((carve.start, carve.size(), carve.complete, carved.read()))
+        return sorted(carves), carver
+
+    def assertCarved(self, data, expected, chunk_sizes=(4096, 65536, 1 << 20)):
+        for chunk_size in chunk_sizes:
+            carves, carver = self.carve(data, chunk_size)
+            self.assertEqual([carve[:3] for carve in carves], [(start, len(image), True) for start, image in expected],
+                             "chunk size %d" % chunk_size)
+            self.assertEqual([carve[3] for carve in carves], [image for start, image in expected])
+
+    def test_bmp_larger_than_max_size(self):
+        self.signatures = [LARGE_BMP]
+        image = support.make_bmp(200, 200)
+        self.assertGreater(len(image), LARGE_BMP.max_size)
+        self.assertCarved(FILLER + image + FILLER, [(len(FILLER), image)])
+
+    def test_structure_running_on_is_dropped(self):
+        self.signatures = [LARGE_BMP]
+        image = support.make_bmp(200, 200)
+        walked = streamcarver.MAX_WALKED_SIZE
+        streamcarver.MAX_WALKED_SIZE = 1000
+        try:
+            # Now the rule's own 100000 byte max size is the limit, and the image is larger
+            carves, carver = self.carve(FILLER + image + FILLER, 65536)
+        finally:
+            streamcarver.MAX_WALKED_SIZE = walked
+        self.assertEqual(carves, [])
+        self.assertEqual(carver.rejected, 1)
+        self.assertEqual(os.listdir(carver.out_dir), [])
+
+    def test_exif_jpeg_and_its_thumbnail(self):
+        image = support.make_exif_jpeg()
+        start = image.index(b"\xff\xd8", 2)
+        thumbnail = image[start:image.index(b"\xff\xd9", start) + 2]
+        self.assertCarved(FILLER + image + FILLER, [(len(FILLER), image), (len(FILLER) + start, thumbnail)])
+
+    def test_progressive_jpeg(self):
+        image = support.make_progressive_jpeg()
+        self.assertCarved(FILLER + image + FILLER, [(len(FILLER), image)])
+
+    def test_carves_open_at_end_of_input(self):
+        image = support.make_jpeg()
+        gif = support.make_gif()
+        carver = StreamCarver(self.signatures, os.path.join(self.directory, "out"))
+        carver.feed(FILLER + image + FILLER + gif[:-10])
+        carves = carver.finish()
+        self.assertEqual([(carve.start, carve.complete, carve.cut) for carve in carves],
+                         [(len(FILLER), True, False), (2 * len(FILLER) + len(image), False, True)])
+
+    def test_png_with_bad_ihdr_crc(self):
+        image = support.make_png()
+        bad = image[:29] + b"\x00\x00\x00\x00" + image[33:]
+        carves, carver = self.carve(FILLER + bad + FILLER + image + FILLER, 4096)
+        self.assertEqual([carve[:3] for carve in carves], [(2 * len(FILLER) + len(bad), len(image), True)])
+        self.assertEqual(carver.rejected, 1)
+
+
+
+# A read(n) function over 'chunks', raising 'error' once they run out if one is given, or
+# going on for ever if 'chunks' is None.
+class Source(object):
+
+    def __init__(self, chunks=None, error=None):
+        self.chunks = chunks
+        self.error = error
+        self.calls = 0
+
+    def __call__(self, size):
+        self.calls += 1
+        if self.chunks is None:
+            return b"x" * size
+        if self.chunks:
+            return self.chunks.pop(0)
+        if self.error is not None:
+            raise self.error
+        return b""
+
+
+class ReadAheadPipeTest(unittest.TestCase):
+
+    def test_chunks_in_order(self):
+        chunks = [support.noise(100, seed) for seed in range(10)]
+        pipe = ReadAheadPipe(Source(list(chunks)), 100, 2)
+        self.assertEqual([pipe.read() for i in range(10)], chunks)
+        self.assertEqual(pipe.read(), b"")
+        self.assertEqual(pipe.read(), b"")
+        pipe.close()
+
+    def test_reader_error_after_its_data(self):
+        pipe = ReadAheadPipe(Source([b"a", b"b"], IOError("disk gone")), 1, 2)
+        self.assertEqual(pipe.read(), b"a")
+        self.assertEqual(pipe.read(), b"b")
+        self.assertRaises(IOError, pipe.read)
+        self.assertEqual(pipe.read(), b"")
+        pipe.close()
+
+    def test_reads_ahead_at_most_depth_chunks(self):
+        source = Source()
+        pipe = ReadAheadPipe(source, 10, 3)
+        deadline = time.time() + 5
+        while source.calls < 4 and time.time() < deadline:
+            time.sleep(0.01)
+        time.sleep(0.1)
+        # 'depth' chunks queued and one more waiting to go in
+        self.assertEqual(source.calls, 4)
+        self.assertEqual(pipe.read(), b"x" * 10)
+        pipe.close()
+
+    def test_close_stops_the_reader(self):
+        source = Source()
+        pipe = ReadAheadPipe(source, 10, 2)
+        pipe.read()
+        threads = threading.active_count()
+        pipe.close()
+        self.assertEqual(threading.active_count(), threads - 1)
+        calls = source.calls
+        time.sleep(0.2)
+        self.assertEqual(source.calls, calls)
+
+
+if __name__ == "__main__":
+    unittest.main()
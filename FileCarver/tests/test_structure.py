@@ -0,0 +1,188 @@
+import struct
+import unittest
+
+import support
+from structure import DONE, INVALID, WALKING, new_walker
+
+TRAILER = support.noise(300, seed=99)
+
+
+# Feed data to a new walker in pieces of 'step' bytes, stopping once it has finished.
+def walk(extension, data, step=None):
+    walker = new_walker(extension)
+    step = step or len(data) or 1
+    for i in range(0, len(data), step):
+        if walker.feed(data[i:i + step]) != WALKING:
+            break
+    return walker
+
+
+class WalkerTestCase(unittest.TestCase):
+
+    extension = None
+
+    def assertEnds(self, data, steps=(None, 1, 2, 3, 7, 64)):
+        for step in steps:
+            walker = walk(self.extension, data + TRAILER, step)
+            self.assertEqual(walker.state, DONE, "step %s" % step)
+            self.assertTrue(walker.validated)
+            self.assertEqual(walker.end, len(data), "step %s" % step)
+
+    def assertTruncated(self, data):
+        for cut in sorted(set([len(data) // 2, len(data) - 1])):
+            walker = walk(self.extension, data[:cut])
+            self.assertEqual(walker.state, WALKING, "cut at %d" % cut)
+            self.assertTrue(walker.validated)
+
+    def assertRejected(self, data):
+        walker = walk(self.extension, data)
+        self.assertEqual(walker.state, INVALID)
+        self.assertFalse(walker.validated)
+
+    def assertBroken(self, data, at):
+        walker = walk(self.extension, data)
+        self.assertEqual(walker.state, INVALID)
+        self.assertTrue(walker.validated)
+        self.assertEqual(walker.end, at)
+
+
+class JpegWalkerTest(WalkerTestCase):
+
+    extension = "jpg"
+
+    def test_valid(self):
+        self.assertEnds(support.make_jpeg())
+
+    def test_restart_markers_and_stuffed_bytes(self):
+        image = support.make_jpeg(scan=3000, restart=200)
+        self.assertIn(b"\xff\xd3", image)
+        self.assertIn(b"\xff\x00", image)
+        self.assertEnds(image)
+
+    def test_exif_thumbnail(self):
+        # The thumbnail's own end of image marker is inside the APP1 segment and must not
+        # end the outer image
+        image = support.make_exif_jpeg()
+        thumbnail = image.index(b"\xff\xd8", 2)
+        self.assertLess(image.index(b"\xff\xd9"), len(image) - 2)
+        self.assertEnds(image)
+        self.assertEnds(image[thumbnail:image.index(b"\xff\xd9", thumbnail) + 2])
+
+    def test_progressive(self):
+        image = support.make_progressive_jpeg()
+        self.assertEqual(image.count(b"\xff\xda"), 4)
+        self.assertEnds(image)
+
+    def test_progressive_truncated_between_scans(self):
+        image = support.make_progressive_jpeg()
+        self.assertTruncated(image[:image.rindex(b"\xff\xc4")])
+
+    def test_fill_bytes_before_marker(self):
+        image = support.make_jpeg()
+        self.assertEnds(image[:-2] + b"\xff\xff\xff\xd9")
+
+    def test_truncated(self):
+        self.assertTruncated(support.make_jpeg())
+
+    def test_not_a_jpeg(self):
+        self.assertRejected(b"\xff\xd9" + support.make_jpeg()[2:])
+        # A start of image followed by a marker no image starts with
+        self.assertRejected(b"\xff\xd8\xff\xda\x00\x08" + support.noise(64))
+        self.assertRejected(b"\xff\xd8\x00\x00" + support.noise(64))
+
+    def test_corrupt_segment(self):
+        image = support.make_jpeg()
+        # The marker after the APP0 segment replaced by data
+        app0_end = 2 + 2 + 16
+        self.assertBroken(image[:app0_end] + b"\x00" + image[app0_end + 1:], app0_end + 1)
+
+
+class PngWalkerTest(WalkerTestCase):
+
+    extension = "png"
+
+    def test_valid(self):
+        self.assertEnds(support.make_png())
+
+    def test_truncated(self):
+        self.assertTruncated(support.make_png())
+
+    def test_not_a_png(self):
+        image = support.make_png()
+        self.assertRejected(b"\x89PNX" + image[4:])
+        self.assertRejected(image[:12] + b"IDAT" + image[16:])
+
+    def test_bad_ihdr_crc(self):
+        image = support.make_png()
+        bad = image[:29] + b"\x00\x00\x00\x00" + image[33:]
+        self.assertNotEqual(image, bad)
+        self.assertRejected(bad)
+
+    def test_zero_size(self):
+        self.assertRejected(b"\x89PNG\r\n\x1a\n" + support.png_chunk(b"IHDR", b"\x00" * 13))
+
+    def test_corrupt_chunk(self):
+        image = support.make_png()
+        idat = image.index(b"IDAT")
+        self.assertBroken(image[:idat] + b"ID\x00T" + image[idat + 4:], idat + 4)
+
+
+class GifWalkerTest(WalkerTestCase):
+
+    extension = "gif"
+
+    def test_valid(self):
+        self.assertEnds(support.make_gif())
+
+    def test_gif87a(self):
+        self.assertEnds(b"GIF87a" + support.make_gif()[6:])
+
+    def test_truncated(self):
+        self.assertTruncated(support.make_gif())
+
+    def test_not_a_gif(self):
+        image = support.make_gif()
+        self.assertRejected(b"GIF88a" + image[6:])
+        self.assertRejected(image[:6] + b"\x00\x00" + image[8:])
+
+    def test_corrupt_block(self):
+        image = support.make_gif()
+        descriptor = image.index(b",")
+        self.assertBroken(image[:descriptor] + b"x" + image[descriptor + 1:], descriptor + 1)
+
+
+class BmpWalkerTest(WalkerTestCase):
+
+    extension = "bmp"
+
+    def test_valid(self):
+        self.assertEnds(support.make_bmp())
+
+    def test_larger_than_max_size(self):
+        # Bigger than the 100000 byte max size of the bundled bmp rule
+        image = support.make_bmp(200, 200)
+        self.assertGreater(len(image), 100000)
+        self.assertEnds(image, (None, 4096))
+
+    def test_os2_header(self):
+        image = support.make_bmp()
+        pixels = image[54:]
+        core = (b"BM" + struct.pack("<IHHI", 26 + len(pixels), 0, 0, 26) +
+                struct.pack("<IHHHH", 12, 8, 8, 1, 24) + pixels)
+        self.assertEnds(core)
+
+    def test_truncated(self):
+        self.assertTruncated(support.make_bmp())
+
+    def test_not_a_bmp(self):
+        image = support.make_bmp()
+        # Unknown info header size, and pixel data offset past the end of the file
+        self.assertRejected(image[:14] + b"\x11\x00\x00\x00" + image[18:])
+        self.assertRejected(image[:10] + b"\xff\xff\x00\x00" + image[14:])
+        # Two planes, and 7 bits per pixel
+        self.assertRejected(image[:26] + b"\x02\x00" + image[28:])
+        self.assertRejected(image[:28] + b"\x07\x00" + image[30:])
+
+
+if __name__ == "__main__":
+    unittest.main()
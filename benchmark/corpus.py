@@ -0,0 +1,330 @@
+# Synthetic corpus for benchmarking the FileCarver module.
+#
+# Builds container files of a chosen size and count. Each one holds real, decodable
+# JPEG, PNG, GIF and BMP images at known offsets, with noise between them (random bytes,
+# zero runs and text). Some containers also get a "-slack" companion like the slack
+# files Autopsy creates: mostly zeros, a fragment of an image and sometimes a whole
+# one. With a shared ratio, some of the images are drawn from a few that appear in many
+# files, as logos and icons do. Everything is generated from one seed, so the same arguments always give the
+# same bytes. The ground truth (file, offset, type, length and MD5 of every complete
+# image) is written to ground-truth.json next to the files.
+#
+# The images are built here rather than read from disk: a baseline JPEG with a DC only
+# Huffman encoder, PNG through zlib, GIF with a code stream that never grows past three
+# bit codes, and uncompressed 24 bit BMP.
+#
+#   python corpus.py --out /tmp/corpus --files 50 --size 8MB --seed 1
+#
+# This is free and unencumbered software released into the public domain.
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import struct
+import zlib
+
+GROUND_TRUTH_NAME = "ground-truth.json"
+IMAGE_TYPES = ["jpg", "png", "gif", "bmp"]
+
+# Number of images repeated across containers when a shared ratio is given
+SHARED_IMAGES = 8
+
+_TEXT = (b"Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor "
+         b"incididunt ut labore et dolore magna aliqua. <xml><record id=\"17\"/></xml>\r\n")
+
+
+# Parse sizes such as 4096, 64KB, 8MB or 1GB.
+def parse_size(text):
+    text = text.strip().upper()
+    for suffix, scale in (("GB", 1 << 30), ("MB", 1 << 20), ("KB", 1 << 10), ("B", 1)):
+        if text.endswith(suffix):
+            return int(float(text[:-len(suffix)]) * scale)
+    return int(text)
+
+
+# Seeded pseudo-random bytes, much faster than one random.getrandbits call per byte.
+class NoiseSource(object):
+
+    def __init__(self, seed, pool_size=4 * 1024 * 1024):
+        pool = []
+        counter = 0
+        while len(pool) * 64 < pool_size:
+            pool.append(hashlib.sha512(("%s:%d" % (seed, counter)).encode("ascii")).digest())
+            counter += 1
+        self.pool = b"".join(pool)
+        self.rng = random.Random(seed)
+
+    def random_bytes(self, length):
+        chunks = []
+        while length > 0:
+            start = self.rng.randrange(0, len(self.pool) - 1)
+            piece = self.pool[start:start + length]
+            chunks.append(piece)
+            length -= len(piece)
+        return b"".join(chunks)
+
+    # Bytes without the values in 'excluded', for payload areas that must not contain markers.
+    def bytes_without(self, length, excluded):
+        data = bytearray(self.random_bytes(length))
+        for i in range(len(data)):
+            while data[i] in excluded:
+                data[i] = (data[i] + 1) & 0xff
+        return bytes(data)
+
+    def filler(self, length):
+        kind = self.rng.random()
+        if kind < 0.5:
+            return self.random_bytes(length)
+        if kind < 0.8:
+            return b"\x00" * length
+        return (_TEXT * (length // len(_TEXT) + 1))[:length]
+
+
+class _BitWriter(object):
+
+    def __init__(self):
+        self.out = bytearray()
+        self.acc = 0
+        self.count = 0
+
+    def write(self, code, length):
+        for i in range(length - 1, -1, -1):
+            self.acc = (self.acc << 1) | ((code >> i) & 1)
+            self.count += 1
+            if self.count == 8:
+                self.out.append(self.acc)
+                if self.acc == 0xff:
+                    self.out.append(0)
+                self.acc = 0
+                self.count = 0
+
+    def flush(self):
+        while self.count:
+            self.write(1, 1)
+        return bytes(self.out)
+
+
+def _huffman_codes(bits, values):
+    codes = {}
+    code = 0
+    k = 0
+    for length in range(1, 17):
+        for i in range(bits[length - 1]):
+            codes[values[k]] = (code, length)
+            code += 1
+            k += 1
+        code <<= 1
+    return codes
+
+
+# Standard luminance DC table (ITU T.81 K.3) and an AC table holding only end of block
+_DC_BITS = [0, 1, 5, 1, 1, 1, 1, 1, 1, 0, 0, 0, 0, 0, 0, 0]
+_DC_VALUES = list(range(12))
+_AC_BITS = [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0]
+_AC_VALUES = [0x00]
+
+
+def _segment(marker, payload):
+    return struct.pack(">BBH", 0xff, marker, len(payload) + 2) + payload
+
+
+# Greyscale baseline JPEG made of flat 8x8 blocks, padded out with comment segments.
+def make_jpeg(noise, width, height, padding=0):
+    dc_codes = _huffman_codes(_DC_BITS, _DC_VALUES)
+    ac_codes = _huffman_codes(_AC_BITS, _AC_VALUES)
+    writer = _BitWriter()
+    previous = 0
+    for block in range(((width + 7) // 8) * ((height + 7) // 8)):
+        dc = (noise.rng.randrange(0, 256) - 128) * 8
+        diff = dc - previous
+        previous = dc
+        magnitude = abs(diff)
+        category = 0
+        while magnitude >> category:
+            category += 1
+        code, length = dc_codes[category]
+        writer.write(code, length)
+        if category:
+            writer.write(diff if diff > 0 else diff + (1 << category) - 1, category)
+        code, length = ac_codes[0x00]
+        writer.write(code, length)
+    scan = writer.flush()
+
+    parts = [b"\xff\xd8",
+             _segment(0xe0, b"JFIF\x00\x01\x01\x00\x00\x01\x00\x01\x00\x00"),
+             _segment(0xdb, b"\x00" + b"\x01" * 64),
+             _segment(0xc0, struct.pack(">BHHBBBB", 8, height, width, 1, 1, 0x11, 0))]
+    while padding > 0:
+        length = min(padding, 65000)
+        parts.append(_segment(0xfe, noise.bytes_without(length, (0xff,))))
+        padding -= length
+    parts.append(_segment(0xc4, b"\x00" + bytes(bytearray(_DC_BITS + _DC_VALUES))))
+    parts.append(_segment(0xc4, b"\x10" + bytes(bytearray(_AC_BITS + _AC_VALUES))))
+    parts.append(_segment(0xda, b"\x01\x01\x00\x00\x3f\x00"))
+    parts.append(scan)
+    parts.append(b"\xff\xd9")
+    return b"".join(parts)
+
+
+def _png_chunk(kind, data):
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xffffffff)
+
+
+def make_png(noise, width, height):
+    rows = b"".join(b"\x00" + noise.random_bytes(width * 3) for row in range(height))
+    return (b"\x89PNG\r\n\x1a\n" +
+            _png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)) +
+            _png_chunk(b"IDAT", zlib.compress(rows)) +
+            _png_chunk(b"IEND", b""))
+
+
+# Two colour GIF. A clear code is sent before every pair of pixels so the LZW table never
+# reaches eight entries and every code stays three bits wide.
+def make_gif(noise, width, height):
+    codes = []
+    for i in range(width * height):
+        if i % 2 == 0:
+            codes.append(4)
+        codes.append(noise.rng.randrange(0, 2))
+    codes.append(5)
+    data = bytearray()
+    acc = 0
+    count = 0
+    for code in codes:
+        acc |= code << count
+        count += 3
+        while count >= 8:
+            data.append(acc & 0xff)
+            acc >>= 8
+            count -= 8
+    if count:
+        data.append(acc & 0xff)
+    blocks = bytearray()
+    for i in range(0, len(data), 255):
+        piece = data[i:i + 255]
+        blocks.append(len(piece))
+        blocks.extend(piece)
+    return (b"GIF89a" + struct.pack("<HHBBB", width, height, 0x80, 0, 0) +
+            b"\x00\x00\x00\xff\xff\xff" +
+            b"," + struct.pack("<HHHHB", 0, 0, width, height, 0) +
+            b"\x02" + bytes(blocks) + b"\x00;")
+
+
+def make_bmp(noise, width, height):
+    stride = (width * 3 + 3) & ~3
+    pixels = b"".join(noise.random_bytes(width * 3) + b"\x00" * (stride - width * 3) for row in range(height))
+    size = 54 + len(pixels)
+    return (b"BM" + struct.pack("<IHHI", size, 0, 0, 54) +
+            struct.pack("<IiiHHIIiiII", 40, width, height, 1, 24, 0, len(pixels), 2835, 2835, 0, 0) +
+            pixels)
+
+
+def make_image(noise, kind):
+    rng = noise.rng
+    if kind == "jpg":
+        return make_jpeg(noise, rng.randrange(16, 257), rng.randrange(16, 257), rng.choice([0, 0, 2000, 40000, 200000]))
+    if kind == "png":
+        return make_png(noise, rng.randrange(8, 129), rng.randrange(8, 129))
+    if kind == "gif":
+        return make_gif(noise, rng.randrange(8, 129), rng.randrange(8, 129))
+    return make_bmp(noise, rng.randrange(8, 97), rng.randrange(8, 97))
+
+
+def _truth(name, offset, kind, image):
+    return {"file": name, "offset": offset, "type": kind, "length": len(image),
+            "md5": hashlib.md5(image).hexdigest()}
+
+
+# Write one container of 'size' bytes holding images spread out between noise. A share of
+# the images, 'shared_ratio', are picked from 'shared', the same few images in every file.
+def _write_container(noise, path, name, size, images_per_mb, types, truth, shared=None, shared_ratio=0.0):
+    position = 0
+    count = max(1, int(size / (1024.0 * 1024.0) * images_per_mb))
+    gap = max(512, size // (count + 1))
+    with open(path, "wb") as container:
+        while position < size:
+            if shared and noise.rng.random() < shared_ratio:
+                image = noise.rng.choice(shared)
+            else:
+                image = make_image(noise, noise.rng.choice(types))
+            filler = noise.rng.randrange(gap // 2, gap + 1)
+            if position + filler + len(image) > size:
+                container.write(noise.filler(size - position))
+                break
+            container.write(noise.filler(filler))
+            position += filler
+            truth.append(_truth(name, position, _kind(image), image))
+            container.write(image)
+            position += len(image)
+
+
+def _kind(image):
+    if image.startswith(b"\x89PNG"):
+        return "png"
+    if image.startswith(b"GIF8"):
+        return "gif"
+    if image.startswith(b"BM"):
+        return "bmp"
+    return "jpg"
+
+
+# Slack companion: the end of an image that was overwritten, zeros, and sometimes a whole image.
+def _write_slack(noise, path, name, types, truth):
+    fragment = make_image(noise, noise.rng.choice(types))
+    data = fragment[len(fragment) // 2:] + b"\x00" * noise.rng.randrange(512, 8192)
+    if noise.rng.random() < 0.5:
+        image = make_image(noise, noise.rng.choice(types))
+        truth.append(_truth(name, len(data), _kind(image), image))
+        data += image + b"\x00" * noise.rng.randrange(0, 4096)
+    with open(path, "wb") as slack:
+        slack.write(data)
+
+
+# Build the corpus and return the ground truth, which is also saved as ground-truth.json.
+def build_corpus(out_dir, files, size, seed=1, images_per_mb=4, slack_ratio=0.25, types=None, shared_ratio=0.0):
+    types = types or IMAGE_TYPES
+    if not os.path.exists(out_dir):
+        os.makedirs(out_dir)
+    noise = NoiseSource(seed)
+    # Images embedded in many files, like a logo in every document made from one template
+    shared = [make_image(noise, noise.rng.choice(types)) for i in range(SHARED_IMAGES)] if shared_ratio > 0 else None
+    truth = []
+    names = []
+    for i in range(files):
+        name = "container-%05d.bin" % i
+        _write_container(noise, os.path.join(out_dir, name), name, size, images_per_mb, types, truth, shared, shared_ratio)
+        names.append(name)
+        if noise.rng.random() < slack_ratio:
+            slack_name = name + "-slack"
+            _write_slack(noise, os.path.join(out_dir, slack_name), slack_name, types, truth)
+            names.append(slack_name)
+    ground_truth = {"seed": seed, "files": names, "images": truth}
+    with open(os.path.join(out_dir, GROUND_TRUTH_NAME), "w") as out:
+        json.dump(ground_truth, out, indent=1, sort_keys=True)
+    return ground_truth
+
+
+def load_ground_truth(corpus_dir):
+    with open(os.path.join(corpus_dir, GROUND_TRUTH_NAME), "r") as ground_truth:
+        return json.load(ground_truth)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a synthetic carving corpus with known image offsets")
+    parser.add_argument("--out", required=True, help="folder to write the corpus to")
+    parser.add_argument("--files", type=int, default=20, help="number of container files")
+    parser.add_argument("--size", default="4MB", help="size of each container, e.g. 512KB, 8MB")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--images-per-mb", type=float, default=4)
+    parser.add_argument("--slack-ratio", type=float, default=0.25, help="share of containers given a -slack file")
+    parser.add_argument("--shared-ratio", type=float, default=0.0, help="share of images repeated across containers")
+    args = parser.parse_args()
+    truth = build_corpus(args.out, args.files, parse_size(args.size), args.seed, args.images_per_mb, args.slack_ratio,
+                         shared_ratio=args.shared_ratio)
+    print("%d files, %d images written to %s" % (len(truth["files"]), len(truth["images"]), args.out))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,584 @@
+# Stand-ins for the Java, Autopsy and Sleuth Kit classes used by the FileCarver module.
+#
+# install() puts fake modules under the Java package names (org.sleuthkit..., javax.swing,
+# java.util.logging, jarray and so on) into sys.modules, so filecarver.py can be
+# imported and CarverFilesIngestModule.process() run by a plain Python 2.7
+# interpreter, the language level of Jython 2.7. Only what the module actually calls is
+# implemented. Anything else it imports (Swing widgets, unused services) is an inert
+# placeholder class.
+#
+# The case is a folder on disk: FakeCase keeps ModuleOutput and Temp under it, and
+# FakeSleuthkitCase serves FakeFiles backed by ordinary files. It evaluates the
+# module's SQL where clauses itself and records every derived file and artifact, so a
+# run can be checked afterwards.
+#
+# This is free and unencumbered software released into the public domain.
+
+import os
+import re
+import sys
+import threading
+import types
+
+
+class _Placeholder(object):
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+
+class _FakeModule(types.ModuleType):
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        placeholder = type(name, (_Placeholder,), {})
+        setattr(self, name, placeholder)
+        return placeholder
+
+
+class _Constant(object):
+
+    def __init__(self, name, value):
+        self.name = name
+        self.value = value
+
+    def getValue(self):
+        return self.value
+
+    def getFileType(self):
+        return self.value
+
+    def intValue(self):
+        return self.value
+
+    def __repr__(self):
+        return self.name
+
+
+# java.util.logging
+
+class Level(object):
+    pass
+
+
+for _name, _value in (("SEVERE", 1000), ("WARNING", 900), ("INFO", 800), ("CONFIG", 700),
+                      ("FINE", 500), ("FINER", 400), ("FINEST", 300)):
+    setattr(Level, _name, _Constant(_name, _value))
+
+
+class FakeLogger(object):
+
+    level = Level.WARNING
+    stream = sys.stderr
+    _lock = threading.Lock()
+
+    def __init__(self, name):
+        self.name = name
+
+    @classmethod
+    def getLogger(cls, name):
+        return cls(name)
+
+    def isLoggable(self, level):
+        return level.value >= FakeLogger.level.value
+
+    def logp(self, level, className, methodName, msg):
+        if self.isLoggable(level):
+            with FakeLogger._lock:
+                FakeLogger.stream.write("%s %s.%s: %s\n" % (level.name, className, methodName, msg))
+
+
+# jarray
+
+class FakeByteArray(object):
+
+    def __init__(self, size):
+        self.data = bytearray(size)
+
+    def __len__(self):
+        return len(self.data)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return _Slice(self.data[index])
+        return self.data[index]
+
+
+class _Slice(object):
+
+    def __init__(self, data):
+        self.data = data
+
+    def tostring(self):
+        return bytes(self.data)
+
+
+def zeros(size, typecode):
+    return FakeByteArray(size)
+
+
+# Sleuth Kit data model
+
+class TskData(object):
+
+    class TSK_FS_META_TYPE_ENUM(object):
+        TSK_FS_META_TYPE_REG = _Constant("TSK_FS_META_TYPE_REG", 1)
+        TSK_FS_META_TYPE_DIR = _Constant("TSK_FS_META_TYPE_DIR", 2)
+
+    class TSK_DB_FILES_TYPE_ENUM(object):
+        FS = _Constant("FS", 0)
+        UNALLOC_BLOCKS = _Constant("UNALLOC_BLOCKS", 4)
+        UNUSED_BLOCKS = _Constant("UNUSED_BLOCKS", 5)
+        DERIVED = _Constant("DERIVED", 7)
+
+    class FileKnown(object):
+        UNKNOWN = _Constant("UNKNOWN", 0)
+        KNOWN = _Constant("KNOWN", 1)
+        BAD = _Constant("BAD", 2)
+
+    class EncodingType(object):
+        NONE = _Constant("NONE", 0)
+
+
+class BlackboardArtifact(object):
+
+    class ARTIFACT_TYPE(object):
+        TSK_INTERESTING_FILE_HIT = _Constant("TSK_INTERESTING_FILE_HIT", 12)
+
+
+class BlackboardAttribute(object):
+
+    class ATTRIBUTE_TYPE(object):
+        TSK_SET_NAME = _Constant("TSK_SET_NAME", 10)
+
+    def __init__(self, attributeType, source, value):
+        self.attributeType = attributeType
+        self.source = source
+        self.value = value
+
+
+class FakeArtifact(object):
+
+    def __init__(self, parent, artifactType):
+        self.parent = parent
+        self.artifactType = artifactType
+        self.attributes = []
+
+    def addAttribute(self, attribute):
+        self.attributes.append(attribute)
+
+
+# A file in the fake case, with its content in an ordinary file on disk. image_offset is
+# where the content would start in the disk image, for convertToImgOffset.
+class FakeFile(object):
+
+    def __init__(self, objId, name, path, mimeType="application/octet-stream",
+                 fileType=TskData.TSK_DB_FILES_TYPE_ENUM.FS, known=TskData.FileKnown.UNKNOWN,
+                 md5=None, image_offset=None, dataSourceId=1):
+        self.objId = objId
+        self.name = name
+        self.path = path
+        self.mimeType = mimeType
+        self.fileType = fileType
+        self.known = known
+        self.md5 = md5
+        self.image_offset = image_offset
+        self.dataSourceId = dataSourceId
+        self.size = os.path.getsize(path)
+        self.artifacts = []
+
+    def getId(self):
+        return self.objId
+
+    def getName(self):
+        return self.name
+
+    def getSize(self):
+        return self.size
+
+    def getMd5Hash(self):
+        return self.md5
+
+    def getKnown(self):
+        return self.known
+
+    def getMIMEType(self):
+        return self.mimeType
+
+    def getType(self):
+        return self.fileType
+
+    def getMetaType(self):
+        return TskData.TSK_FS_META_TYPE_ENUM.TSK_FS_META_TYPE_REG
+
+    def getDataSourceObjectId(self):
+        return self.dataSourceId
+
+    def read(self, buffer, offset, length):
+        with open(self.path, "rb") as content:
+            content.seek(offset)
+            data = content.read(min(length, len(buffer)))
+        buffer.data[:len(data)] = data
+        return len(data)
+
+    def convertToImgOffset(self, offset):
+        if self.image_offset is None:
+            raise ValueError("no image offset for " + self.name)
+        return self.image_offset + offset
+
+    def newArtifact(self, artifactType):
+        artifact = FakeArtifact(self, artifactType)
+        self.artifacts.append(artifact)
+        return artifact
+
+    # Values the where clauses built by the module can refer to
+    def columns(self):
+        return {"obj_id": self.objId, "name": self.name, "size": self.size,
+                "data_source_obj_id": self.dataSourceId, "mime_type": self.mimeType,
+                "type": self.fileType.value,
+                "meta_type": TskData.TSK_FS_META_TYPE_ENUM.TSK_FS_META_TYPE_REG.value}
+
+
+class ReadContentInputStream(object):
+
+    def __init__(self, file):
+        self._file = open(file.path, "rb")
+
+    def read(self, buffer, offset=0, length=None):
+        if length is None:
+            length = len(buffer) - offset
+        data = self._file.read(length)
+        if not data:
+            return -1
+        buffer.data[offset:offset + len(data)] = data
+        return len(data)
+
+    def close(self):
+        self._file.close()
+
+
+# A derived file. As in tsk_files it is a regular file of its parent's data source, of type
+# DERIVED and with no mime type, so the module's file queries can select it.
+class FakeDerivedFile(FakeFile):
+
+    def __init__(self, objId, name, localPath, size, parent, rederiveDetails, toolName, toolVersion):
+        FakeFile.__init__(self, objId, name, os.path.join(FakeCase.current.getCaseDirectory(), localPath), mimeType=None,
+                          fileType=TskData.TSK_DB_FILES_TYPE_ENUM.DERIVED, dataSourceId=parent.getDataSourceObjectId())
+        self.localPath = localPath
+        self.size = size
+        self.parent = parent
+        self.rederiveDetails = rederiveDetails
+        self.toolName = toolName
+        self.toolVersion = toolVersion
+
+
+class FakeTransaction(object):
+
+    def __init__(self, case):
+        self.case = case
+        self.pending = []
+
+    def commit(self):
+        self.case.added(self.pending)
+        self.pending = []
+
+    def rollback(self):
+        self.pending = []
+
+
+class FakeBlackboard(object):
+
+    class BlackboardException(Exception):
+        pass
+
+    def __init__(self):
+        self.posted = []
+
+    def postArtifacts(self, artifacts, moduleName):
+        self.posted.extend(artifacts)
+
+
+_IN_LIST = re.compile(r"(\w+) (NOT )?IN \(([^)]*)\)")
+_ORDER = re.compile(r"\s+ORDER BY (.+?)(?:\s+LIMIT (\d+))?\s*$")
+
+
+# Turn the where clauses FileCarver builds into a Python expression over FakeFile.columns().
+def _compile_where(where):
+    order = []
+    limit = None
+    match = _ORDER.search(where)
+    if match:
+        for term in match.group(1).split(","):
+            fields = term.split()
+            order.append((fields[0], len(fields) > 1 and fields[1].upper() == "DESC"))
+        if match.group(2):
+            limit = int(match.group(2))
+        where = where[:match.start()]
+    expression = where.replace("name NOT LIKE '%-slack'", "not name.endswith('-slack')")
+    expression = _IN_LIST.sub(lambda m: "(%s %sin [%s])" % (m.group(1), "not " if m.group(2) else "", m.group(3)), expression)
+    expression = re.sub(r"(?<![<>!=])=(?!=)", "==", expression)
+    expression = expression.replace(" AND ", " and ").replace(" OR ", " or ")
+    return compile(expression, "<where>", "eval"), order, limit
+
+
+class FakeSleuthkitCase(object):
+
+    def __init__(self, files):
+        self.files = sorted(files, key=lambda f: f.getId())
+        self.nextId = max([f.getId() for f in files] + [0]) + 1000
+        self.derivedFiles = []
+        self.blackboard = FakeBlackboard()
+        self.queries = 0
+        self._lock = threading.Lock()
+
+    def _select(self, where):
+        code, order, limit = _compile_where(where)
+        self.queries += 1
+        selected = [f for f in self.files if eval(code, {}, f.columns())]
+        for column, descending in reversed(order):
+            selected.sort(key=lambda f: f.columns()[column], reverse=descending)
+        return selected[:limit] if limit is not None else selected
+
+    def findAllFilesWhere(self, where):
+        return self._select(where)
+
+    def countFilesWhere(self, where):
+        return len(self._select(where))
+
+    def beginTransaction(self):
+        return FakeTransaction(self)
+
+    def getBlackboard(self):
+        return self.blackboard
+
+    def addDerivedFile(self, fileName, localPath, size, ctime, crtime, atime, mtime, isFile, parentObj,
+                       rederiveDetails, toolName, toolVersion, otherDetails, encodingType, transaction=None):
+        with self._lock:
+            derived = FakeDerivedFile(self.nextId, fileName, localPath, size, parentObj, rederiveDetails, toolName, toolVersion)
+            self.nextId += 1
+        if transaction is None:
+            self.added([derived])
+        else:
+            transaction.pending.append(derived)
+        return derived
+
+    # Derived files become rows of tsk_files once they are committed
+    def added(self, derivedFiles):
+        with self._lock:
+            self.derivedFiles.extend(derivedFiles)
+            self.files.extend(derivedFiles)
+
+
+# The file manager lookup the module used before it queried the case database directly
+class FakeFileManager(object):
+
+    def __init__(self, skCase):
+        self.skCase = skCase
+
+    def findFiles(self, dataSource, fileName, parentPath=None):
+        pattern = re.compile("^" + re.escape(fileName).replace("\\%", ".*") + "$", re.IGNORECASE)
+        return [f for f in self.skCase.files if f.getDataSourceObjectId() == dataSource.getId() and pattern.match(f.getName())]
+
+
+class _Services(object):
+
+    def __init__(self, skCase):
+        self.skCase = skCase
+
+    def getBlackboard(self):
+        return self.skCase.getBlackboard()
+
+    def getFileManager(self):
+        return FakeFileManager(self.skCase)
+
+
+class FakeCase(object):
+
+    current = None
+
+    def __init__(self, caseDir, skCase):
+        self.caseDir = caseDir
+        self.skCase = skCase
+        for folder in ("ModuleOutput", "Temp"):
+            if not os.path.exists(os.path.join(caseDir, folder)):
+                os.makedirs(os.path.join(caseDir, folder))
+
+    @classmethod
+    def getCurrentCase(cls):
+        return cls.current
+
+    def getSleuthkitCase(self):
+        return self.skCase
+
+    def getServices(self):
+        return _Services(self.skCase)
+
+    def getModulesOutputDirAbsPath(self):
+        return os.path.join(self.caseDir, "ModuleOutput")
+
+    def getModuleOutputDirectoryRelativePath(self):
+        return "ModuleOutput"
+
+    def getTempDirectory(self):
+        return os.path.join(self.caseDir, "Temp")
+
+    def getCaseDirectory(self):
+        return self.caseDir
+
+
+class IngestMessage(object):
+
+    class MessageType(object):
+        DATA = _Constant("DATA", 0)
+        INFO = _Constant("INFO", 1)
+        WARNING = _Constant("WARNING", 2)
+        ERROR = _Constant("ERROR", 3)
+
+    def __init__(self, messageType, source, subject, details):
+        self.messageType = messageType
+        self.source = source
+        self.subject = subject
+        self.details = details
+
+    @classmethod
+    def createMessage(cls, messageType, source, subject, details=None):
+        return cls(messageType, source, subject, details)
+
+
+class IngestServices(object):
+
+    _instance = None
+
+    def __init__(self):
+        self.messages = []
+        self.contentEvents = 0
+
+    @classmethod
+    def getInstance(cls):
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def postMessage(self, message):
+        self.messages.append(message)
+
+    def fireModuleContentEvent(self, event):
+        self.contentEvents += 1
+
+
+class ModuleContentEvent(object):
+
+    def __init__(self, content):
+        self.content = content
+
+
+class IngestModule(object):
+
+    class ProcessResult(object):
+        OK = _Constant("OK", 0)
+        ERROR = _Constant("ERROR", 1)
+
+    class IngestModuleException(Exception):
+        pass
+
+
+class GenericIngestModuleJobSettings(object):
+
+    def __init__(self, settings=None):
+        self.settings = dict(settings or {})
+
+    def getSetting(self, name):
+        return self.settings.get(name)
+
+    def setSetting(self, name, value):
+        self.settings[name] = value
+
+
+class PlatformUtil(object):
+
+    @staticmethod
+    def isWindowsOS():
+        return sys.platform.startswith("win")
+
+    @staticmethod
+    def getOSName():
+        return "Linux" if sys.platform.startswith("linux") else sys.platform
+
+
+class FakeProgressBar(object):
+
+    def __init__(self):
+        self.total = None
+        self.done = 0
+
+    def switchToIndeterminate(self):
+        self.total = None
+
+    def switchToDeterminate(self, total):
+        self.total = total
+
+    def progress(self, done):
+        self.done = done
+
+
+class FakeContext(object):
+
+    def __init__(self, dataSource=None, jobId=1):
+        self.cancelled = False
+        self.dataSource = dataSource
+        self.jobId = jobId
+
+    def isJobCancelled(self):
+        return self.cancelled
+
+    def getJobId(self):
+        return self.jobId
+
+    def getDataSource(self):
+        return self.dataSource
+
+
+# Types files by the mime type they were created with.
+class FileTypeDetector(object):
+
+    def getMIMEType(self, file):
+        return file.mimeType
+
+
+def _module(name, **members):
+    module = sys.modules.get(name)
+    if not isinstance(module, _FakeModule):
+        module = _FakeModule(name)
+        sys.modules[name] = module
+    for key, value in members.items():
+        setattr(module, key, value)
+    parent, _, child = name.rpartition(".")
+    if parent:
+        # A class of the same name (IngestModule) wins over the module it is imported from
+        parentModule = _module(parent)
+        if child not in vars(parentModule):
+            setattr(parentModule, child, module)
+    return module
+
+
+# Register the fake modules. Call before importing filecarver.
+def install():
+    _module("jarray", zeros=zeros)
+    _module("java.util.logging", Level=Level)
+    _module("org.sleuthkit.autopsy.coreutils", Logger=FakeLogger, PlatformUtil=PlatformUtil)
+    _module("org.sleuthkit.datamodel", TskData=TskData, ReadContentInputStream=ReadContentInputStream,
+            BlackboardArtifact=BlackboardArtifact, BlackboardAttribute=BlackboardAttribute,
+            SleuthkitCase=FakeSleuthkitCase, AbstractFile=FakeFile)
+    _module("org.sleuthkit.autopsy.ingest", IngestModule=IngestModule, IngestMessage=IngestMessage,
+            IngestServices=IngestServices, ModuleContentEvent=ModuleContentEvent,
+            GenericIngestModuleJobSettings=GenericIngestModuleJobSettings,
+            DataSourceIngestModule=object, FileIngestModule=object,
+            IngestModuleFactoryAdapter=object, IngestModuleIngestJobSettingsPanel=object)
+    _module("org.sleuthkit.autopsy.ingest.IngestModule", IngestModuleException=IngestModule.IngestModuleException)
+    _module("org.sleuthkit.autopsy.casemodule", Case=FakeCase)
+    _module("org.sleuthkit.autopsy.modules.filetypeid", FileTypeDetector=FileTypeDetector)
+    _module("org.sleuthkit.autopsy.casemodule.services", Blackboard=FakeBlackboard, FileManager=FakeFileManager)
+    for name in ("javax.swing", "javax.swing.event", "java.awt", "java.awt.event", "java.lang",
+                 "java.sql", "java.io", "org.sleuthkit.autopsy.datamodel"):
+        _module(name)
@@ -0,0 +1,323 @@
+# Benchmark the FileCarver module on a synthetic corpus, outside Autopsy.
+#
+# Builds (or reuses) a corpus from corpus.py, then for each carving engine runs
+# CarverFilesIngestModule.startUp/process/shutDown against the stand-ins in fakes.py in
+# a fresh child process, so peak memory is measured per run. The module is copied into
+# the run's work folder first so the checkout is never written to. Reported per run:
+#
+#   files/s and MB/s        over the wall clock time of process()
+#   peak memory             maximum RSS of the run, plus foremost child processes
+#   temp high-water mark    largest size of the case temp folder, sampled every 50ms
+#   recall / precision      carves whose parent, offset and MD5 match the ground truth
+#   bytes carved per image  everything added as derived files / images recovered
+#   bytes on disk           size of the distinct files the derived files point at
+#
+# Runs with Python 2.7, the language level of Jython 2.7:
+#
+#   python2.7 run_benchmark.py --work /tmp/bench --files 20 --size 8MB --engine native --engine foremost
+#
+# This is free and unencumbered software released into the public domain.
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import resource
+import shutil
+import stat
+import subprocess
+import sys
+import threading
+import time
+
+try:
+    import Queue as queue
+except ImportError:
+    import queue
+
+import corpus
+import fakes
+
+MODULE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "FileCarver")
+MODULE_FILES = ["foremost", "foremost.exe", "foremost.conf"]
+
+_OFFSET = re.compile(r"offset=(\d+)")
+
+
+# Largest total size of the files under 'path', sampled on a background thread.
+class DiskSampler(object):
+
+    def __init__(self, path, interval=0.05):
+        self.path = path
+        self.interval = interval
+        self.high_water = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.setDaemon(True)
+
+    def _size(self):
+        total = 0
+        for root, dirs, files in os.walk(self.path):
+            for name in files:
+                try:
+                    total += os.path.getsize(os.path.join(root, name))
+                except OSError:
+                    pass
+        return total
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.high_water = max(self.high_water, self._size())
+            self._stop.wait(self.interval)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.high_water = max(self.high_water, self._size())
+
+
+class _DataSource(object):
+
+    def getId(self):
+        return 1
+
+    def getName(self):
+        return "benchmark"
+
+
+def _copy_module(target):
+    os.makedirs(target)
+    for name in os.listdir(MODULE_DIR):
+        if name.endswith(".py") or name in MODULE_FILES:
+            shutil.copy(os.path.join(MODULE_DIR, name), os.path.join(target, name))
+    foremost = os.path.join(target, "foremost")
+    if os.path.exists(foremost):
+        os.chmod(foremost, os.stat(foremost).st_mode | stat.S_IXUSR)
+
+
+def _settings(args, engine):
+    return {"Default_Mime_Types": "true",
+            "All_Mime_Types": "true" if args.all_mime_types else "false",
+            "Include_Slack_Space": "true" if args.slack else "false",
+            "Native_Carver": "true" if engine == "native" else "false",
+            "Batch_Small_Files": "true" if args.batch else "false",
+            "Deduplicate_Files": "true" if args.dedup else "false",
+            "Worker_Threads": str(args.workers),
+            "File_Time_Limit": str(args.time_limit),
+            "File_MB_Limit": str(args.mb_limit),
+            "Carve_Order": args.order,
+            "File_Pipeline": "true" if args.pipeline else "false"}
+
+
+def _md5(path):
+    md5 = hashlib.md5()
+    with open(path, "rb") as content:
+        for data in iter(lambda: content.read(1024 * 1024), b""):
+            md5.update(data)
+    return md5.hexdigest()
+
+
+# Compare the derived files the run added with the ground truth for the files it was given.
+def score(skCase, caseDir, truth, fileNames):
+    expected = dict(((image["file"], image["offset"]), image) for image in truth["images"] if image["file"] in fileNames)
+    found = set()
+    located = set()
+    exact = 0
+    carvedBytes = 0
+    localPaths = set()
+    for derived in skCase.derivedFiles:
+        carvedBytes += derived.size
+        localPaths.add(derived.localPath)
+        match = _OFFSET.search(derived.rederiveDetails or "")
+        if match is None:
+            continue
+        key = (derived.parent.getName(), int(match.group(1)))
+        image = expected.get(key)
+        if image is None:
+            continue
+        located.add(key)
+        if _md5(os.path.join(caseDir, derived.localPath)) == image["md5"]:
+            exact += 1
+            found.add(key)
+    carves = len(skCase.derivedFiles)
+    return {"carves": carves,
+            "expected_images": len(expected),
+            "exact_matches": exact,
+            "located_images": len(located),
+            "recall": len(found) / float(len(expected)) if expected else 0.0,
+            "located_recall": len(located) / float(len(expected)) if expected else 0.0,
+            "precision": exact / float(carves) if carves else 0.0,
+            "bytes_carved": carvedBytes,
+            "bytes_on_disk": sum([os.path.getsize(os.path.join(caseDir, path)) for path in localPaths]),
+            "bytes_carved_per_image": carvedBytes / float(len(found)) if found else 0.0}
+
+
+# Stand in for Autopsy's file ingest pipeline: one copy of the file-level module per
+# worker thread, each taking files from a shared queue, then shut down together.
+def run_pipeline(args, engine, filecarver, files):
+    settings = fakes.GenericIngestModuleJobSettings(_settings(args, engine))
+    factory = filecarver.CarverFilesIngestModuleFactory()
+    factory.settings = settings
+    context = fakes.FakeContext(_DataSource())
+    modules = [factory.createFileIngestModule(settings) for i in range(args.workers)]
+    for module in modules:
+        module.startUp(context)
+    pending = queue.Queue()
+    for file in files:
+        pending.put(file)
+    results = []
+
+    def work(module):
+        while True:
+            try:
+                file = pending.get_nowait()
+            except queue.Empty:
+                return
+            results.append(module.process(file))
+
+    threads = [threading.Thread(target=work, args=(module,)) for module in modules]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for module in modules:
+        module.shutDown()
+    if fakes.IngestModule.ProcessResult.ERROR in results:
+        return fakes.IngestModule.ProcessResult.ERROR
+    return fakes.IngestModule.ProcessResult.OK
+
+
+# One benchmark run in this process; the child side of run().
+def run_once(args, engine):
+    truth = corpus.load_ground_truth(args.corpus)
+    runDir = os.path.join(args.work, "run-" + engine)
+    if os.path.exists(runDir):
+        shutil.rmtree(runDir)
+    moduleDir = os.path.join(runDir, "module")
+    caseDir = os.path.join(runDir, "case")
+    _copy_module(moduleDir)
+
+    fakes.install()
+    fakes.FakeLogger.level = getattr(fakes.Level, args.log_level)
+    sys.path.insert(0, moduleDir)
+    import filecarver
+
+    files = []
+    for i, name in enumerate(truth["files"]):
+        files.append(fakes.FakeFile(i + 1, name, os.path.join(args.corpus, name), image_offset=(i + 1) * 1024 * 1024 * 1024))
+    skCase = fakes.FakeSleuthkitCase(files)
+    fakes.FakeCase.current = fakes.FakeCase(caseDir, skCase)
+
+    module = filecarver.CarverFilesIngestModule(fakes.GenericIngestModuleJobSettings(_settings(args, engine)))
+    module.startUp(fakes.FakeContext(_DataSource()))
+    # The files the run is given, before it adds any derived files to the case
+    selected = set(f.getName() for f in skCase.findAllFilesWhere(module.buildFileQuery(_DataSource())))
+    sampler = DiskSampler(fakes.FakeCase.current.getTempDirectory())
+    sampler.start()
+    started = time.time()
+    try:
+        if args.pipeline:
+            result = run_pipeline(args, engine, filecarver, files)
+        else:
+            result = module.process(_DataSource(), fakes.FakeProgressBar())
+    finally:
+        elapsed = time.time() - started
+        sampler.stop()
+        module.shutDown()
+
+    totalBytes = sum([f.getSize() for f in files if f.getName() in selected])
+    report = {"engine": engine,
+              "result": repr(result),
+              "files": len(selected),
+              "bytes": totalBytes,
+              "seconds": elapsed,
+              "files_per_second": len(selected) / elapsed if elapsed > 0 else 0.0,
+              "mb_per_second": totalBytes / 1048576.0 / elapsed if elapsed > 0 else 0.0,
+              "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+              "peak_child_rss_kb": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+              "temp_high_water_bytes": sampler.high_water,
+              "messages": [m.subject for m in fakes.IngestServices.getInstance().messages]}
+    report.update(score(skCase, caseDir, truth, selected))
+    if not args.keep:
+        shutil.rmtree(runDir)
+    return report
+
+
+# Run one engine in a child process and return its report.
+def run(args, engine):
+    command = [sys.executable, os.path.abspath(__file__), "--child", engine, "--corpus", args.corpus,
+               "--work", args.work, "--workers", str(args.workers), "--log-level", args.log_level,
+               "--time-limit", str(args.time_limit), "--mb-limit", str(args.mb_limit), "--order", args.order]
+    for flag in ("batch", "dedup", "slack", "all_mime_types", "keep", "pipeline"):
+        if getattr(args, flag):
+            command.append("--" + flag.replace("_", "-"))
+    output = subprocess.check_output(command)
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def print_report(report):
+    print("%-8s %6d files %8.1f MB %7.2f s %8.1f files/s %7.2f MB/s" % (
+        report["engine"], report["files"], report["bytes"] / 1048576.0, report["seconds"],
+        report["files_per_second"], report["mb_per_second"]))
+    print("         peak RSS %d KB (foremost %d KB), temp high-water %.1f MB" % (
+        report["peak_rss_kb"], report["peak_child_rss_kb"], report["temp_high_water_bytes"] / 1048576.0))
+    print("         %d carves, %d of %d images exact (recall %.3f, located %.3f), precision %.3f" % (
+        report["carves"], report["exact_matches"], report["expected_images"], report["recall"],
+        report["located_recall"], report["precision"]))
+    print("         %.1f MB carved, %.0f bytes per recovered image, %.1f MB on disk" % (
+        report["bytes_carved"] / 1048576.0, report["bytes_carved_per_image"], report["bytes_on_disk"] / 1048576.0))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the FileCarver module on a synthetic corpus")
+    parser.add_argument("--work", required=True, help="scratch folder for the corpus, cases and module copies")
+    parser.add_argument("--corpus", help="existing corpus folder (default: build one in <work>/corpus)")
+    parser.add_argument("--files", type=int, default=20)
+    parser.add_argument("--size", default="4MB")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--shared-ratio", type=float, default=0.0, help="share of images repeated across files in a new corpus")
+    parser.add_argument("--engine", action="append", choices=["native", "foremost"],
+                        help="carving engine to run, may be repeated (default: both)")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--batch", action="store_true", help="batch small files into one foremost run")
+    parser.add_argument("--dedup", action="store_true", help="carve identical files only once")
+    parser.add_argument("--slack", action="store_true", help="include -slack files")
+    parser.add_argument("--all-mime-types", action="store_true", help="carve files of any mime type")
+    parser.add_argument("--time-limit", type=int, default=0, help="seconds allowed per file, 0 for no limit")
+    parser.add_argument("--mb-limit", type=int, default=0, help="MB read per file, 0 for all")
+    parser.add_argument("--order", default="Object Id",
+                        choices=["Object Id", "Smallest First", "Interleave Small And Large"])
+    parser.add_argument("--pipeline", action="store_true",
+                        help="carve with the file-level module, one copy per worker, as Autopsy's file pipeline would")
+    parser.add_argument("--keep", action="store_true", help="keep each run's case folder")
+    parser.add_argument("--log-level", default="WARNING", choices=["SEVERE", "WARNING", "INFO", "FINE"])
+    parser.add_argument("--json", help="also write the reports to this file")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_once(args, args.child)))
+        return
+
+    if args.corpus is None:
+        args.corpus = os.path.join(args.work, "corpus")
+        if os.path.exists(args.corpus):
+            shutil.rmtree(args.corpus)
+        truth = corpus.build_corpus(args.corpus, args.files, corpus.parse_size(args.size), args.seed,
+                                    shared_ratio=args.shared_ratio)
+        print("corpus: %d files, %d images in %s" % (len(truth["files"]), len(truth["images"]), args.corpus))
+    reports = []
+    for engine in args.engine or ["native", "foremost"]:
+        reports.append(run(args, engine))
+        print_report(reports[-1])
+    if args.json:
+        with open(args.json, "w") as out:
+            json.dump(reports, out, indent=2, sort_keys=True)
+
+
+if __name__ == "__main__":
+    main()